@@ -0,0 +1,69 @@
+"""
+Output benchmark: JSON stream vs. YAML emission of the same processed documents.
+
+The documents of a synthetic app are collected and processed once, then
+written with every candidate to a temp file. "dump_all" is the original
+print(yaml.dump_all(...)) path.
+
+Usage:
+    uv run python benchmarks/bench_output.py [--resources 10000] [--payload-bytes 256] [--repeat 5]
+"""
+
+import argparse
+import logging
+import tempfile
+import timeit
+from pathlib import Path
+
+import yaml
+from synthetic import add_spec_arguments, generate_app, spec_from_args
+from yaml import CDumper as Dumper
+
+from dependency_cmp.discovery import collect_manifests_recursive
+from dependency_cmp.graph import process_dag
+from dependency_cmp.output import write_json_stream, write_yaml_stream
+
+
+def dump_all(docs, out):
+    out.write((yaml.dump_all(docs, Dumper=Dumper) + "\n").encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_spec_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger("dependency_cmp").setLevel(logging.ERROR)
+    candidates = {
+        "dump_all": dump_all,
+        "write_yaml_stream": write_yaml_stream,
+        "write_json_stream": write_json_stream,
+    }
+
+    with tempfile.TemporaryDirectory(prefix="bench-output-") as tmp:
+        app = Path(tmp) / "app"
+        generate_app(app, spec_from_args(args))
+        docs = process_dag(collect_manifests_recursive(app, recurse=True, include=[], exclude=[]))
+
+        print(f"{len(docs)} documents, best of {args.repeat}")
+        baseline = None
+        with open(Path(tmp) / "output", "wb") as out:
+            for name, write in candidates.items():
+
+                def run():
+                    out.seek(0)
+                    out.truncate()
+                    write(docs, out)
+                    out.flush()
+
+                best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+                baseline = baseline or best
+                print(
+                    f"  {name:<20} {best * 1000:9.2f} ms {baseline / best:6.2f}x"
+                    f" {out.tell() / 1024 / 1024:8.2f} MiB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Parse benchmark: serial vs. process-pool parsing of the manifest files of a synthetic app.
+
+Every candidate collects the documents of the same app, without kustomize.
+"serial" is the in-process parse, the others use a process pool of that
+many workers (threshold 0). --docs-per-file 0 writes one big file instead.
+
+Usage:
+    uv run python benchmarks/bench_parse.py [--resources 50000] [--workers 2,4,8] [--passthrough]
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import timeit
+from pathlib import Path
+
+from synthetic import add_spec_arguments, generate_app, spec_from_args
+
+from dependency_cmp.discovery import collect_manifests_recursive
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_spec_arguments(parser)
+    parser.add_argument("--workers", default=f"2,4,{os.cpu_count() or 1}")
+    parser.add_argument("--passthrough", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.set_defaults(resources=50_000)
+    args = parser.parse_args()
+
+    logging.getLogger("dependency_cmp").setLevel(logging.ERROR)
+    candidates = {"serial": 1, **{f"{n} workers": int(n) for n in args.workers.split(",")}}
+
+    with tempfile.TemporaryDirectory(prefix="bench-parse-") as tmp:
+        app = Path(tmp) / "app"
+        spec = spec_from_args(args)
+        if spec.docs_per_file == 0:
+            generate_app(Path(tmp) / "gen", spec_from_args(args, docs_per_file=spec.resources, depth=0))
+            app.mkdir()
+            parts = sorted((Path(tmp) / "gen").rglob("*.yaml"))
+            (app / "all.yaml").write_text("---\n".join(p.read_text() for p in parts))
+        else:
+            generate_app(app, spec)
+        size = sum(p.stat().st_size for p in app.rglob("*.yaml"))
+
+        print(f"{size / 1024 / 1024:.1f} MiB of manifests, best of {args.repeat}")
+        baseline = expected = None
+        for name, workers in candidates.items():
+
+            def run():
+                return collect_manifests_recursive(
+                    app,
+                    recurse=True,
+                    include=[],
+                    exclude=[],
+                    passthrough=args.passthrough,
+                    parse_workers=workers,
+                    parse_parallel_min_bytes=0,
+                )
+
+            docs = run()
+            expected = expected or docs
+            assert docs == expected, f"{name} parsed different documents"
+            best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+            baseline = baseline or best
+            print(f"  {name:<12} {best * 1000:9.2f} ms {baseline / best:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Microbenchmark: compiled GlobMatcher vs. the previous Path.match loop.
+
+Usage:
+    uv run python benchmarks/bench_patterns.py [--patterns 60] [--paths 5000]
+"""
+
+import argparse
+import random
+import timeit
+from pathlib import Path
+
+from dependency_cmp.patterns import GlobMatcher
+
+
+def path_match_loop(path: Path, patterns: list[str]) -> bool:
+    """The original discovery.match_pattern implementation."""
+    if not patterns:
+        return False
+    return any(path.match(p) for p in patterns)
+
+
+def make_patterns(count: int) -> list[str]:
+    base = [
+        ".git",
+        "node_modules",
+        "charts/*/tests",
+        "*.md",
+        "*.txt",
+        "docs/*",
+        "**/values-*.yaml",
+        "/repo/apps/*/secrets/*",
+        "[!a-z]*.json",
+        "tmp-???.yaml",
+    ]
+    patterns = list(base)
+    i = 0
+    while len(patterns) < count:
+        patterns.append(f"generated-{i}/*.yaml" if i % 2 else f"*-{i}.yml")
+        i += 1
+    return patterns[:count]
+
+
+def make_paths(count: int) -> list[Path]:
+    rng = random.Random(0)
+    dirs = ["apps", "base", "overlays/prod", "charts/db/tests", "docs", ".git/objects"]
+    names = ["deployment.yaml", "service.yml", "README.md", "values-prod.yaml", "kustomization.yaml"]
+    return [
+        Path("/repo") / rng.choice(dirs) / f"{i}-{rng.choice(names)}" for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patterns", type=int, default=60)
+    parser.add_argument("--paths", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    patterns = make_patterns(args.patterns)
+    paths = make_paths(args.paths)
+    matcher = GlobMatcher(patterns)
+
+    # Both implementations must agree before timing them
+    assert [matcher.match(p) for p in paths] == [path_match_loop(p, patterns) for p in paths]
+
+    candidates = {
+        "Path.match loop": lambda: [path_match_loop(p, patterns) for p in paths],
+        "GlobMatcher": lambda: [matcher.match(p) for p in paths],
+        "GlobMatcher compile (once)": lambda: GlobMatcher(patterns),
+    }
+
+    print(f"{len(patterns)} patterns, {len(paths)} paths, best of {args.repeat}")
+    for name, func in candidates.items():
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f"  {name:<30} {best * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
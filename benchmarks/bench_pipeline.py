@@ -0,0 +1,193 @@
+"""
+Pipeline benchmark: collect, process_dag and YAML emit on synthetic app trees.
+
+Every stage is timed separately (best and mean of --repeat runs), followed by
+one run under tracemalloc for the per-stage peak memory. Results are written
+as JSON; pass an earlier result file with --compare to print the change per
+case and stage.
+
+Usage:
+    uv run python benchmarks/bench_pipeline.py [--resources 1000,10000] [--output result.json]
+    uv run python benchmarks/bench_pipeline.py --kustomize-share 0.5 --compare baseline.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from synthetic import AppSpec, add_spec_arguments, generate_app, spec_from_args
+
+from dependency_cmp.discovery import collect_manifests_recursive
+from dependency_cmp.graph import process_dag
+from dependency_cmp.output import write_yaml_stream
+from dependency_cmp.patterns import GlobMatcher
+
+FAKE_KUSTOMIZE = Path(__file__).with_name("fake_kustomize.py")
+
+
+def install_fake_kustomize(bin_dir: Path):
+    """Puts the offline kustomize stand-in first on PATH."""
+    bin_dir.mkdir(exist_ok=True)
+    wrapper = bin_dir / "kustomize"
+    wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_KUSTOMIZE}" "$@"\n')
+    wrapper.chmod(0o755)
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+
+
+class Timings:
+    """Wall time of every stage."""
+
+    def __init__(self):
+        self.values = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        yield
+        self.values[name] = time.perf_counter() - start
+
+
+class Peaks:
+    """Peak traced allocation of every stage, relative to the memory held at its start."""
+
+    def __init__(self):
+        self.values = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        tracemalloc.reset_peak()
+        held, _ = tracemalloc.get_traced_memory()
+        yield
+        self.values[name] = tracemalloc.get_traced_memory()[1] - held
+
+
+def run_pipeline(app: Path, args, out, meter) -> dict:
+    """Runs all stages once, measuring each with meter. Returns the output stats."""
+    with meter.stage("collect"):
+        manifests = collect_manifests_recursive(
+            app,
+            recurse=True,
+            include=GlobMatcher([]),
+            exclude=GlobMatcher([]),
+            kustomize_workers=args.kustomize_workers,
+        )
+
+    with meter.stage("process_dag"):
+        manifests = process_dag(manifests)
+
+    out.seek(0)
+    out.truncate()
+    with meter.stage("emit"):
+        write_yaml_stream(manifests, out)
+        out.flush()
+
+    return {"docs": len(manifests), "output_bytes": out.tell()}
+
+
+def run_case(spec: AppSpec, args, workdir: Path) -> dict:
+    app = workdir / f"app-{spec.resources}"
+    tree = generate_app(app, spec)
+
+    runs = {}
+    peaks = Peaks()
+    with open(workdir / "output.yaml", "wb") as out:
+        for _ in range(args.repeat):
+            timings = Timings()
+            output = run_pipeline(app, args, out, timings)
+            for stage, seconds in timings.values.items():
+                runs.setdefault(stage, []).append(seconds)
+        if args.memory:
+            tracemalloc.start()
+            try:
+                run_pipeline(app, args, out, peaks)
+            finally:
+                tracemalloc.stop()
+
+    stages = {
+        stage: {
+            "best_s": min(times),
+            "mean_s": sum(times) / len(times),
+            "runs_s": times,
+            "peak_traced_bytes": peaks.values.get(stage),
+        }
+        for stage, times in runs.items()
+    }
+    return {"spec": asdict(spec), "tree": tree, "output": output, "stages": stages}
+
+
+def compare(results: dict, baseline_file: Path):
+    baseline = {
+        AppSpec(**case["spec"]).label(): case for case in json.loads(baseline_file.read_text())["cases"]
+    }
+    print(f"Compared to {baseline_file} (best times, >1.00x is slower):")
+    for case in results["cases"]:
+        previous = baseline.get(AppSpec(**case["spec"]).label())
+        if previous is None:
+            print(f"  resources={case['spec']['resources']}: no matching case in baseline")
+            continue
+        ratios = [
+            f"{stage} {timing['best_s'] / previous['stages'][stage]['best_s']:.2f}x"
+            for stage, timing in case["stages"].items()
+            if previous["stages"].get(stage, {}).get("best_s")
+        ]
+        print(f"  resources={case['spec']['resources']}: {', '.join(ratios)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_spec_arguments(parser, skip=["resources"])
+    parser.add_argument("--resources", default="1000,10000", help="Comma separated sizes, one case each")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--kustomize-workers", type=int, default=1)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="Skip the tracemalloc run")
+    parser.add_argument("--workdir", type=Path, help="Keep the generated trees in this directory")
+    parser.add_argument("--output", type=Path, help="Write the JSON results to this file")
+    parser.add_argument("--compare", type=Path, help="Earlier JSON results to compare with")
+    args = parser.parse_args()
+
+    logging.getLogger("dependency_cmp").setLevel(logging.ERROR)
+    specs = [spec_from_args(args, resources=int(n)) for n in args.resources.split(",")]
+
+    with tempfile.TemporaryDirectory(prefix="bench-pipeline-") as tmp:
+        workdir = args.workdir or Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        if args.kustomize_share:
+            install_fake_kustomize(Path(tmp) / "bin")
+
+        cases = []
+        for spec in specs:
+            case = run_case(spec, args, workdir)
+            cases.append(case)
+            timings = ", ".join(f"{s} {t['best_s'] * 1000:.1f} ms" for s, t in case["stages"].items())
+            print(f"resources={spec.resources}: {timings}", file=sys.stderr)
+
+    results = {
+        "benchmark": "pipeline",
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "cases": cases,
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for `kustomize build`, used by the benchmarks.
+
+Supports local `resources` (files and directories with their own
+kustomization) and concatenates them as a YAML stream. Everything else in the
+kustomization is ignored. `kustomize version` prints a fixed version.
+"""
+
+import sys
+from pathlib import Path
+
+import yaml
+
+KUSTOMIZE_FILES = ("kustomization.yaml", "kustomization.yml", "Kustomization")
+
+
+def build(directory: Path, out):
+    kustomization = next((directory / f for f in KUSTOMIZE_FILES if (directory / f).exists()), None)
+    if kustomization is None:
+        sys.exit(f"Error: unable to find one of {KUSTOMIZE_FILES} in directory '{directory}'")
+
+    data = yaml.safe_load(kustomization.read_text()) or {}
+    for entry in data.get("resources") or []:
+        target = directory / entry
+        if target.is_dir():
+            build(target, out)
+        else:
+            text = target.read_text()
+            out.write(text if text.startswith("---") else "---\n" + text)
+            if not text.endswith("\n"):
+                out.write("\n")
+
+
+def main():
+    args = sys.argv[1:]
+    if args[:1] == ["version"]:
+        print("v5.8.0")
+        return
+    if args[:1] != ["build"] or len(args) < 2:
+        sys.exit("usage: kustomize build DIR [flags]")
+    build(Path(args[1]), sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Synthetic app tree generator for the benchmarks.
+
+Usage:
+    uv run python benchmarks/synthetic.py OUTPUT_DIR [--resources 10000] [--depth 3] ...
+"""
+
+import argparse
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from dependency_cmp.models import DEPENDS_ON_ANNOTATION
+
+# (apiVersion, kind) of generated resources, picked round-robin
+KINDS = [
+    ("v1", "ConfigMap"),
+    ("v1", "Secret"),
+    ("v1", "Service"),
+    ("apps/v1", "Deployment"),
+    ("batch/v1", "Job"),
+    ("example.com/v1alpha1", "Widget"),
+]
+
+
+@dataclass
+class AppSpec:
+    """Shape of a generated app tree."""
+
+    resources: int = 10_000
+    depth: int = 3  # Directory levels below the app root
+    fanout: int = 4  # Subdirectories per directory
+    docs_per_file: int = 10
+    payload_bytes: int = 256  # Size of the data block of every resource
+    dependency_density: float = 1.0  # Average depends-on entries per resource
+    chain_depth: int = 8  # Longest possible dependency chain (= max waves)
+    long_ref_ratio: float = 0.5  # Share of apiVersion:Kind:Name references
+    kustomize_share: float = 0.0  # Share of top-level directories built by kustomize
+    seed: int = 0
+
+    def label(self) -> str:
+        return ",".join(f"{k}={v}" for k, v in asdict(self).items())
+
+
+def _directories(root: Path, depth: int, fanout: int) -> list[Path]:
+    """All directories of a tree with the given depth and fan-out, root first."""
+    levels = [[root]]
+    for _ in range(depth):
+        levels.append([d / f"d{i}" for d in levels[-1] for i in range(fanout)])
+    return [d for level in levels for d in level]
+
+
+def _resource(index: int, spec: AppSpec, rng: random.Random, names: list) -> str:
+    api_version, kind = KINDS[index % len(KINDS)]
+    name = f"{kind.lower()}-{index}"
+    names.append((api_version, kind, name))
+
+    # Dependencies only point one layer down, which bounds chains by chain_depth
+    layer = index % spec.chain_depth
+    refs = []
+    if layer:
+        count = int(spec.dependency_density) + (rng.random() < spec.dependency_density % 1)
+        for _ in range(count):
+            target = rng.randrange(layer - 1, index, spec.chain_depth)
+            dep_api, dep_kind, dep_name = names[target]
+            if rng.random() < spec.long_ref_ratio:
+                refs.append(f"{dep_api}:{dep_kind}:{dep_name}")
+            else:
+                refs.append(f"{dep_kind}:{dep_name}")
+
+    lines = [f"apiVersion: {api_version}", f"kind: {kind}", "metadata:", f"  name: {name}"]
+    lines += ["  labels:", f"    app: bench-{index % 7}"]
+    if refs:
+        lines += ["  annotations:", f"    {DEPENDS_ON_ANNOTATION}: {','.join(sorted(set(refs)))}"]
+    lines += ["data:", f"  payload: {'x' * spec.payload_bytes}"]
+    return "\n".join(lines) + "\n"
+
+
+def generate_app(root: Path, spec: AppSpec) -> dict:
+    """
+    Writes a synthetic app to root and returns its stats.
+    Resources are spread evenly over all directories; every resource can
+    depend on resources in the previous dependency layer, using a mix of short
+    and long references. A share of the top-level directories gets a
+    kustomization.yaml listing all files below it.
+    """
+    rng = random.Random(spec.seed)
+    directories = _directories(root, spec.depth, spec.fanout)
+    for directory in directories:
+        directory.mkdir(parents=True, exist_ok=True)
+
+    names = []
+    files = {d: [] for d in directories}
+    total_bytes = 0
+    for start in range(0, spec.resources, spec.docs_per_file):
+        directory = directories[(start // spec.docs_per_file) % len(directories)]
+        end = min(start + spec.docs_per_file, spec.resources)
+        content = "---\n".join(_resource(i, spec, rng, names) for i in range(start, end))
+        file = directory / f"resources-{start}.yaml"
+        file.write_text(content)
+        files[directory].append(file)
+        total_bytes += len(content)
+
+    top_level = [d for d in directories if d.parent == root]
+    kustomizations = top_level[: round(len(top_level) * spec.kustomize_share)]
+    for directory in kustomizations:
+        below = sorted(f for d, fs in files.items() if d == directory or directory in d.parents for f in fs)
+        resources = "\n".join(f"- {f.relative_to(directory)}" for f in below)
+        (directory / "kustomization.yaml").write_text(f"resources:\n{resources}\n")
+
+    return {
+        "directories": len(directories),
+        "files": sum(len(fs) for fs in files.values()),
+        "bytes": total_bytes,
+        "resources": spec.resources,
+        "kustomizations": len(kustomizations),
+    }
+
+
+def add_spec_arguments(parser: argparse.ArgumentParser, skip=()):
+    for field, default in asdict(AppSpec()).items():
+        if field not in skip:
+            parser.add_argument(f"--{field.replace('_', '-')}", type=type(default), default=default)
+
+
+def spec_from_args(args: argparse.Namespace, **overrides) -> AppSpec:
+    fields = {field: getattr(args, field, default) for field, default in asdict(AppSpec()).items()}
+    return AppSpec(**{**fields, **overrides})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("output", type=Path)
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+
+    stats = generate_app(args.output, spec_from_args(args))
+    print(", ".join(f"{k}: {v}" for k, v in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+`dependency_cmp batch`: renders many app directories in one run, e.g. to
+pre-render and validate the apps of a monorepo in CI.
+
+Apps are rendered in parallel by a process pool. They share the parse and
+kustomize caches of CMP_CACHE_DIR (a temporary one if unset). A failing app
+is reported, the others are still rendered. Every app's output goes to its
+own file in --output-dir, or to stdout as a framed stream:
+
+    {"app": <name>, "status": "ok" | "failed", "bytes": <n>}\\n
+    <n bytes of output>
+
+followed by the next app, in manifest order. A JSON report with the timing
+and errors of every app is written to --report, or as one line to stderr.
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from dependency_cmp.config import FIELDS, EnvSettings, UnsupportedValue, parse_argo_glob_list
+
+logger = logging.getLogger("dependency_cmp")
+
+
+@dataclass(frozen=True, slots=True)
+class BatchApp:
+    """One app of a batch. Directory options left at None use the environment's."""
+
+    name: str
+    path: Path
+    recurse: bool | None = None
+    include_patterns: tuple[str, ...] | None = None
+    exclude_patterns: tuple[str, ...] | None = None
+
+
+def _app_name(path: Path, base: Path) -> str:
+    try:
+        relative = path.relative_to(base)
+    except ValueError:
+        relative = path
+    return "_".join(part for part in relative.parts if part != relative.anchor) or path.name or "app"
+
+
+def _parse_app(entry, base: Path) -> BatchApp:
+    if isinstance(entry, str):
+        entry = {"path": entry}
+    if not isinstance(entry, dict) or not isinstance(entry.get("path"), str):
+        raise ValueError(f"expected a path or a mapping with a path, got {entry!r}")
+
+    unknown = set(entry) - {"name", "path", "recurse", "include", "exclude"}
+    if unknown:
+        raise ValueError(f"unknown keys {sorted(unknown)} in {entry['path']}")
+
+    options = {}
+    if "recurse" in entry:
+        recurse = entry["recurse"]
+        if isinstance(recurse, str):
+            recurse = FIELDS["recurse"][1](recurse)
+        if not isinstance(recurse, bool):
+            raise ValueError(f"recurse must be a boolean in {entry['path']}")
+        options["recurse"] = recurse
+    for key in ("include", "exclude"):
+        if key in entry:
+            options[f"{key}_patterns"] = tuple(parse_argo_glob_list(entry[key]))
+
+    path = (base / entry["path"]).resolve()
+    return BatchApp(str(entry.get("name") or _app_name(path, base.resolve())), path, **options)
+
+
+def load_apps(manifest: Path | None, directories: list[str]) -> list[BatchApp]:
+    """
+    Reads the apps of a batch: directories given on the command line, and the
+    entries of a YAML or JSON manifest. A manifest is a list (or a mapping with
+    an `apps` list) of paths relative to the manifest, or mappings of
+    path, name, recurse, include and exclude. Raises ValueError if invalid.
+    """
+    entries = [(entry, Path.cwd()) for entry in directories]
+    if manifest is not None:
+        import yaml
+        from yaml import CLoader as Loader
+
+        try:
+            data = yaml.load(manifest.read_text(), Loader=Loader)
+        except (OSError, yaml.YAMLError) as e:
+            raise ValueError(f"cannot read {manifest}: {e}") from None
+        if isinstance(data, dict):
+            data = data.get("apps")
+        if not isinstance(data, list):
+            raise ValueError(f"{manifest} must contain a list of apps")
+        entries += [(entry, manifest.parent) for entry in data]
+
+    try:
+        apps = [_parse_app(entry, base) for entry, base in entries]
+    except UnsupportedValue as e:
+        raise ValueError(f"invalid boolean {e}") from None
+
+    names = [app.name for app in apps]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate app names {duplicates}, set a name for these apps")
+    return apps
+
+
+class _CaptureHandler(logging.Handler):
+    """Collects the log lines of one app, so they are not interleaved with other apps."""
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        self.lines = []
+        self.errors = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+        if record.levelno >= logging.ERROR:
+            self.errors.append(record.getMessage())
+
+
+def _init_worker(log_level: int):
+    logger.setLevel(log_level)
+
+
+def render_app(app: BatchApp, values: dict, output: str | None) -> dict:
+    """
+    Renders one app in a pool worker. The output is written to the file
+    `output` (only kept on success), or returned in the result if None.
+    """
+    from dependency_cmp.render import render
+    from dependency_cmp.stats import instrumented
+
+    overrides = {}
+    if app.recurse is not None:
+        overrides["recurse"] = app.recurse
+    if app.include_patterns is not None:
+        overrides["include_patterns"] = list(app.include_patterns)
+    if app.exclude_patterns is not None:
+        overrides["exclude_patterns"] = list(app.exclude_patterns)
+    settings = EnvSettings(**{**values, **overrides})
+    result = {"app": app.name, "path": str(app.path), "status": "failed"}
+    capture = _CaptureHandler()
+    handlers, propagate = logger.handlers, logger.propagate
+    logger.handlers, logger.propagate = [capture], False
+    stats = io.StringIO()
+    partial = f"{output}.partial" if output else None
+    start = time.perf_counter()
+    try:
+        with (open(partial, "wb") if partial else io.BytesIO()) as out:
+            with instrumented(settings, stream=stats):
+                render(app.path, settings, out)
+            result["bytes"] = out.tell()
+            if not partial:
+                result["output"] = out.getvalue()
+        if partial:
+            os.replace(partial, output)
+            result["output"] = output
+        result["status"] = "ok"
+    except SystemExit:
+        # The render logged the reason
+        pass
+    except Exception as e:
+        logger.error(f"Unexpected Error: {e}")
+    finally:
+        logger.handlers, logger.propagate = handlers, propagate
+        if partial and result["status"] != "ok":
+            Path(partial).unlink(missing_ok=True)
+
+    result["wall_s"] = round(time.perf_counter() - start, 6)
+    result["errors"] = capture.errors
+    result["log"] = capture.lines
+    if stats.getvalue():
+        result["stats"] = json.loads(stats.getvalue())["dependency_cmp_stats"]
+    return result
+
+
+def write_frame(stdout, result: dict):
+    """Writes one app's header line and output to the framed stream."""
+    output = result.get("output") or b""
+    header = {"app": result["app"], "status": result["status"], "bytes": len(output)}
+    stdout.write(json.dumps(header).encode() + b"\n")
+    stdout.write(output)
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="dependency_cmp batch", description="Renders several app directories in parallel."
+    )
+    parser.add_argument(
+        "directories", nargs="*", help="App directories, using the directory options of the environment"
+    )
+    parser.add_argument(
+        "--manifest", type=Path, help="YAML or JSON list of apps with their own directory options"
+    )
+    parser.add_argument(
+        "--output-dir", type=Path, help="Write every app to <name>.<format> instead of a stdout stream"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Apps rendered in parallel")
+    parser.add_argument("--report", type=Path, help="Write the JSON report here instead of stderr")
+    return parser
+
+
+def run_batch(settings, argv: list[str], stdout, stderr=None) -> int:
+    """Runs `dependency_cmp batch`. Returns the exit code: 1 if any app failed."""
+    stderr = stderr or sys.stderr
+    args = _parser().parse_args(argv)
+    try:
+        apps = load_apps(args.manifest, args.directories)
+    except ValueError as e:
+        logger.error(f"Invalid batch: {e}")
+        return 1
+    if not apps:
+        logger.error("Invalid batch: no apps given")
+        return 1
+
+    values = {name: getattr(settings, name) for name in FIELDS}
+    with tempfile.TemporaryDirectory(prefix="dependency-cmp-batch-") as tmp:
+        if not values["cache_dir"]:
+            # Apps still share their parse and kustomize results within the batch
+            values["cache_dir"] = tmp
+        if args.output_dir:
+            args.output_dir.mkdir(parents=True, exist_ok=True)
+
+        start = time.perf_counter()
+        workers = max(1, min(args.workers, len(apps)))
+        logger.info(f"Rendering {len(apps)} apps with {workers} workers")
+        results = []
+        level = logger.getEffectiveLevel()
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(level,)) as pool:
+            futures = []
+            for app in apps:
+                output = None
+                if args.output_dir:
+                    output = str(args.output_dir / f"{app.name}.{values['output_format']}")
+                futures.append(pool.submit(render_app, app, values, output))
+
+            # Collected in manifest order, so the stream is deterministic
+            for app, future in zip(apps, futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # e.g. a worker killed for running out of memory
+                    result = {"app": app.name, "path": str(app.path), "status": "failed"}
+                    result.update(errors=[f"Render worker failed: {e}"], log=[])
+                for line in result.pop("log"):
+                    print(f"[{app.name}] {line}", file=stderr)
+                if not args.output_dir:
+                    write_frame(stdout, result)
+                    result.pop("output", None)
+                results.append(result)
+
+    failed = [result["app"] for result in results if result["status"] != "ok"]
+    report = {
+        "apps": results,
+        "failed": failed,
+        "wall_s": round(time.perf_counter() - start, 6),
+        "workers": workers,
+    }
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2) + "\n")
+    else:
+        print(json.dumps({"dependency_cmp_batch": report}), file=stderr, flush=True)
+    if failed:
+        logger.error(f"{len(failed)} of {len(apps)} apps failed: {', '.join(failed)}")
+        return 1
+    return 0
@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger("dependency_cmp")
+
+# Entry layout: MAGIC + sha256(payload) + payload
+MAGIC = b"DCMPCACHE1\n"
+DIGEST_SIZE = hashlib.sha256().digest_size
+CHUNK_SIZE = 1024 * 1024
+
+
+class DiskCache:
+    """
+    Persistent key/value store for bytes in a local directory.
+    Entries are written atomically and carry a checksum, so a truncated or
+    corrupted entry is detected, deleted and reported as a miss. Hits refresh
+    the entry's mtime, and the least recently used entries are evicted once the
+    directory grows beyond max_bytes.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Estimated directory size, so not every put has to scan the directory
+        self._usage = None
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / f"{key}.bin"
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entry(key)
+        try:
+            data = entry.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        header = len(MAGIC) + DIGEST_SIZE
+        payload = data[header:]
+        if data[: len(MAGIC)] != MAGIC or data[len(MAGIC) : header] != hashlib.sha256(payload).digest():
+            logger.warning(f"Discarding corrupted cache entry {entry}")
+            self.discard(key)
+            return None
+
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return payload
+
+    def copy_to(self, key: str, out) -> bool:
+        """
+        Streams an entry's payload to out without loading it into memory.
+        The checksum is verified in a first pass, so nothing is written for a
+        corrupted entry. Returns False on a miss.
+        """
+        entry = self._entry(key)
+        try:
+            f = entry.open("rb")
+        except FileNotFoundError:
+            return False
+
+        with f:
+            header = f.read(len(MAGIC) + DIGEST_SIZE)
+            digest = hashlib.sha256()
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+            if header[: len(MAGIC)] != MAGIC or header[len(MAGIC) :] != digest.digest():
+                logger.warning(f"Discarding corrupted cache entry {entry}")
+                self.discard(key)
+                return False
+
+            f.seek(len(header))
+            shutil.copyfileobj(f, out, CHUNK_SIZE)
+
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return True
+
+    def put(self, key: str, payload: bytes):
+        with self.writer(key) as f:
+            f.write(payload)
+
+    @contextmanager
+    def writer(self, key: str):
+        """
+        Streams a new entry to disk. The entry only becomes visible if the
+        block completes and the payload fits into the cache.
+        """
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGIC + bytes(DIGEST_SIZE))
+                writer = _HashingWriter(f)
+                yield writer
+                if writer.error:
+                    raise writer.error
+                f.seek(len(MAGIC))
+                f.write(writer.digest.digest())
+                size = f.seek(0, os.SEEK_END)
+            if size > self.max_bytes:
+                logger.debug(f"Not caching {key}: entry exceeds the cache size limit")
+                Path(tmp_name).unlink()
+                return
+            os.replace(tmp_name, self._entry(key))
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        # Overwritten entries are counted twice, which only triggers an earlier scan
+        if self._usage is not None:
+            self._usage += size
+        if self._usage is None or self._usage > self.max_bytes:
+            self.evict()
+
+    def discard(self, key: str):
+        self._entry(key).unlink(missing_ok=True)
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits max_bytes."""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".bin"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                Path(path).unlink(missing_ok=True)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        self._usage = total
+
+
+class _HashingWriter:
+    """
+    File wrapper that hashes everything written through it.
+    Write errors (e.g. a full disk) are recorded instead of raised, so a
+    failing cache never interrupts the stream it is recording.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+        self.error = None
+
+    def write(self, data) -> int:
+        if self.error is None:
+            try:
+                self.f.write(data)
+                self.digest.update(data)
+            except OSError as e:
+                self.error = e
+        return len(data)
+
+    def flush(self):
+        pass
@@ -0,0 +1,162 @@
+"""
+Startup path for the plugin settings.
+Importing pydantic costs more than a small render, so the environment is
+parsed here with plain Python. Only values outside the simple, canonical
+forms (or invalid ones) are handed to the PluginSettings model, which then
+applies its full coercion rules and reports validation errors.
+"""
+
+import json
+import os
+
+
+def parse_argo_glob_list(v: str | list[str] | None) -> list[str]:
+    """
+    Parses Argo CD glob pattern strings into a python list.
+    Handles:
+      - None/Empty -> []
+      - "{a,b}" -> ["a", "b"]
+      - "a,b"   -> ["a", "b"]
+    """
+    if v is None:
+        return []
+    if isinstance(v, list):
+        return v
+
+    val = str(v).strip()
+    if not val:
+        return []
+
+    # Remove Argo-style braces if present
+    if val.startswith("{") and val.endswith("}"):
+        val = val[1:-1]
+
+    return [p.strip() for p in val.split(",") if p.strip()]
+
+
+class UnsupportedValue(ValueError):
+    """A value the fast path does not parse, PluginSettings has to decide."""
+
+
+_BOOLEANS = {
+    **dict.fromkeys(["1", "on", "t", "true", "y", "yes"], True),
+    **dict.fromkeys(["0", "off", "f", "false", "n", "no"], False),
+}
+
+
+def _bool(value: str) -> bool:
+    try:
+        return _BOOLEANS[value.lower()]
+    except KeyError:
+        raise UnsupportedValue(value) from None
+
+
+def _int(minimum: int):
+    def parse(value: str) -> int:
+        if not (value.isascii() and value.isdigit()) or int(value) < minimum:
+            raise UnsupportedValue(value)
+        return int(value)
+
+    return parse
+
+
+def _str(value: str) -> str:
+    return value
+
+
+def _glob_list(value: str) -> list[str]:
+    # pydantic-settings decodes JSON values of list fields first
+    try:
+        json.loads(value)
+    except ValueError:
+        return parse_argo_glob_list(value)
+    raise UnsupportedValue(value)
+
+
+def _choice(*choices: str):
+    def parse(value: str) -> str:
+        if value not in choices:
+            raise UnsupportedValue(value)
+        return value
+
+    return parse
+
+
+# name: (env var, parser, default, excluded from dumps), mirrors PluginSettings
+FIELDS = {
+    "recurse": ("PARAM_DIRECTORY_RECURSE", _bool, False, False),
+    "exclude_patterns": ("PARAM_DIRECTORY_EXCLUDE", _glob_list, [], False),
+    "include_patterns": ("PARAM_DIRECTORY_INCLUDE", _glob_list, [], False),
+    "kustomize_workers": ("CMP_KUSTOMIZE_WORKERS", _int(1), 1, False),
+    "cache_dir": ("CMP_CACHE_DIR", _str, "", False),
+    "kustomize_cache_max_bytes": ("CMP_KUSTOMIZE_CACHE_MAX_BYTES", _int(0), 256 * 1024 * 1024, False),
+    "render_cache_max_bytes": ("CMP_RENDER_CACHE_MAX_BYTES", _int(0), 256 * 1024 * 1024, False),
+    "file_cache_max_bytes": ("CMP_FILE_CACHE_MAX_BYTES", _int(0), 256 * 1024 * 1024, False),
+    "passthrough": ("CMP_RAW_PASSTHROUGH", _bool, False, False),
+    "wave_strategy": ("CMP_WAVE_STRATEGY", _choice("asap", "alap", "balanced"), "asap", False),
+    "output_format": ("PARAM_OUTPUT_FORMAT", _choice("yaml", "json"), "yaml", False),
+    "kustomize_native": ("CMP_KUSTOMIZE_NATIVE", _choice("off", "on", "verify"), "off", False),
+    "prefilter": ("CMP_PREFILTER", _choice("off", "lenient", "strict"), "off", False),
+    "parse_workers": ("CMP_PARSE_WORKERS", _int(0), 1, True),
+    "parse_parallel_min_bytes": ("CMP_PARSE_PARALLEL_MIN_BYTES", _int(0), 8 * 1024 * 1024, True),
+    "low_memory": ("CMP_LOW_MEMORY", _bool, False, True),
+    "low_memory_threshold_bytes": ("CMP_LOW_MEMORY_THRESHOLD_BYTES", _int(0), 0, True),
+    "max_files": ("CMP_MAX_FILES", _int(0), 0, True),
+    "max_bytes": ("CMP_MAX_BYTES", _int(0), 0, True),
+    "max_docs": ("CMP_MAX_DOCS", _int(0), 0, True),
+    "kustomize_timeout_seconds": ("CMP_KUSTOMIZE_TIMEOUT_SECONDS", _int(0), 0, True),
+    "render_timeout_seconds": ("CMP_RENDER_TIMEOUT_SECONDS", _int(0), 0, True),
+    "stats": ("CMP_STATS", _bool, False, True),
+    "profile": ("CMP_PROFILE", _choice("", "cprofile", "tracemalloc"), "", True),
+    "profile_file": ("CMP_PROFILE_FILE", _str, "", True),
+    "daemon_socket": ("CMP_DAEMON_SOCKET", _str, "", True),
+    "daemon_workers": ("CMP_DAEMON_WORKERS", _int(1), 4, True),
+}
+
+
+class EnvSettings:
+    """Plain settings object with the fields (and dump) of PluginSettings."""
+
+    __slots__ = tuple(FIELDS)
+
+    def __init__(self, **values):
+        for name, (_, _, default, _) in FIELDS.items():
+            value = values.get(name, default)
+            setattr(self, name, list(value) if isinstance(value, list) else value)
+
+    @classmethod
+    def from_env(cls, environ=None) -> "EnvSettings":
+        """Raises UnsupportedValue if any variable needs the full model."""
+        # Like pydantic-settings, variable names are case-insensitive
+        env = {k.lower(): v for k, v in (os.environ if environ is None else environ).items()}
+        values = {}
+        for name, (variable, parse, _, _) in FIELDS.items():
+            raw = env.get(variable.lower())
+            if raw is not None:
+                values[name] = parse(raw)
+        return cls(**values)
+
+    def model_dump(self) -> dict:
+        return {name: getattr(self, name) for name, spec in FIELDS.items() if not spec[3]}
+
+    def model_dump_json(self) -> str:
+        # Same bytes as pydantic's compact JSON dump
+        return json.dumps(self.model_dump(), separators=(",", ":"), ensure_ascii=False)
+
+    def __repr__(self):
+        fields = " ".join(f"{name}={getattr(self, name)!r}" for name in FIELDS)
+        return f"EnvSettings({fields})"
+
+
+def load_settings():
+    """
+    Reads the plugin settings from the environment.
+    Returns an EnvSettings, or a PluginSettings for values only pydantic can
+    parse; invalid values raise pydantic's ValidationError.
+    """
+    try:
+        return EnvSettings.from_env()
+    except UnsupportedValue:
+        from dependency_cmp.settings import PluginSettings
+
+        return PluginSettings()
@@ -0,0 +1,258 @@
+"""
+Optional long-lived render server on a Unix socket.
+`dependency_cmp serve` keeps the interpreter, imports and in-memory caches
+warm; `dependency_cmp` (generate) then only forwards its working directory,
+settings and environment to the server and relays the framed response:
+
+    request:  one JSON line {"cwd", "settings", "log_level", "env"}
+    response: frames of (type, length, payload), where type is
+              O (manifest bytes), E (stderr text) or X (exit code)
+"""
+
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+from contextvars import ContextVar
+from pathlib import Path
+
+from dependency_cmp.config import FIELDS, EnvSettings
+
+logger = logging.getLogger("dependency_cmp")
+
+FRAME_HEADER = struct.Struct(">cI")
+FRAME_OUTPUT, FRAME_STDERR, FRAME_EXIT = b"O", b"E", b"X"
+FRAME_SIZE = 256 * 1024  # Output is sent in frames of up to this size
+MAX_REQUEST_BYTES = 1024 * 1024
+CONNECT_TIMEOUT = 2.0  # Seconds, the client falls back to rendering in-process after
+
+# Channel of the request handled by the current thread, None outside of requests
+_channel: ContextVar["_Channel | None"] = ContextVar("dependency_cmp_channel", default=None)
+
+
+class _Channel:
+    """Framed, thread-safe writer for one client connection."""
+
+    def __init__(self, conn: socket.socket, log_level: int):
+        self.conn = conn
+        self.log_level = log_level
+        self._lock = threading.Lock()
+
+    def send(self, kind: bytes, payload: bytes):
+        with self._lock:
+            self.conn.sendall(FRAME_HEADER.pack(kind, len(payload)) + payload)
+
+
+class _OutputStream:
+    """Binary stream of the manifest output, sent as output frames."""
+
+    def __init__(self, channel: _Channel):
+        self.channel = channel
+        self.buffer = bytearray()
+
+    def write(self, data) -> int:
+        self.buffer += data
+        if len(self.buffer) >= FRAME_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.buffer:
+            self.channel.send(FRAME_OUTPUT, bytes(self.buffer))
+            self.buffer.clear()
+
+
+class _StderrStream:
+    """Text stream forwarded to the client's stderr (e.g. the stats summary)."""
+
+    def __init__(self, channel: _Channel):
+        self.channel = channel
+
+    def write(self, text: str) -> int:
+        self.channel.send(FRAME_STDERR, text.encode())
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class _RequestLogHandler(logging.Handler):
+    """
+    Sends log records of a request to its client, at the client's log level.
+    Records outside of requests go to the server's own stderr.
+    """
+
+    def __init__(self, server_level: int):
+        super().__init__()
+        self.server_level = server_level
+        self.fallback = logging.StreamHandler(sys.stderr)
+        self.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        self.fallback.setFormatter(self.formatter)
+        self._levels = []
+        self._levels_lock = threading.Lock()
+
+    def emit(self, record):
+        channel = _channel.get()
+        if channel is None:
+            if record.levelno >= self.server_level:
+                self.fallback.emit(record)
+        elif record.levelno >= channel.log_level:
+            try:
+                channel.send(FRAME_STDERR, (self.format(record) + "\n").encode())
+            except OSError:
+                pass
+
+    def track(self, level: int, active: bool):
+        """Keeps the logger level at the lowest level any running request asked for."""
+        with self._levels_lock:
+            if active:
+                self._levels.append(level)
+            else:
+                self._levels.remove(level)
+            logger.setLevel(min([self.server_level, *self._levels]))
+
+
+def _log_level(name) -> int:
+    level = logging.getLevelName(str(name or "ERROR").upper())
+    return level if isinstance(level, int) else logging.ERROR
+
+
+def _handle(conn: socket.socket, slots: threading.BoundedSemaphore, log_handler: _RequestLogHandler):
+    """Serves one request. Runs in its own thread, with a fresh context."""
+    from dependency_cmp.discovery import kustomize_env
+    from dependency_cmp.render import render
+    from dependency_cmp.stats import instrumented
+
+    with conn:
+        try:
+            with conn.makefile("rb") as f:
+                request = json.loads(f.readline(MAX_REQUEST_BYTES))
+            settings = EnvSettings(**{k: v for k, v in request["settings"].items() if k in FIELDS})
+            path = Path(request["cwd"])
+            # kustomize and its plugins read ARGOCD_APP_*, ARGOCD_ENV_*, PARAM_*, ... of the request
+            env = request.get("env")
+            if env is not None:
+                env = {str(k): str(v) for k, v in env.items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.error(f"Invalid render request: {e}")
+            return
+
+        channel = _Channel(conn, _log_level(request.get("log_level")))
+        _channel.set(channel)
+        kustomize_env.set(env)
+        output = _OutputStream(channel)
+        code = 0
+        with slots:
+            log_handler.track(channel.log_level, True)
+            try:
+                with instrumented(settings, stream=_StderrStream(channel)):
+                    render(path, settings, output)
+                output.flush()
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except Exception as e:
+                logger.error(f"Unexpected Error: {e}", exc_info=True)
+                code = 1
+            finally:
+                log_handler.track(channel.log_level, False)
+
+        try:
+            channel.send(FRAME_EXIT, str(code).encode())
+        except OSError as e:
+            logger.warning(f"Could not send result for {path}: {e}")
+
+
+def serve(socket_path: str, workers: int):
+    """
+    Runs the render server until terminated. At most `workers` renders run at
+    a time, further requests wait for a free slot. Only one server can own a
+    socket path; a second one exits right away.
+    """
+    import fcntl
+    import signal
+
+    # Warm up: the imports are the bulk of a cold render
+    import dependency_cmp.render  # noqa: F401
+
+    lock = open(f"{socket_path}.lock", "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        logger.error(f"Another render server owns {socket_path}")
+        sys.exit(1)
+
+    # A socket file left behind by a killed server
+    Path(socket_path).unlink(missing_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o077)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    server.listen()
+
+    # Per-request log routing, see _RequestLogHandler
+    log_handler = _RequestLogHandler(logger.getEffectiveLevel())
+    logger.addHandler(log_handler)
+    logger.propagate = False
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    slots = threading.BoundedSemaphore(workers)
+    logger.info(f"Render server listening on {socket_path} with {workers} workers")
+    try:
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=_handle, args=(conn, slots, log_handler), daemon=True).start()
+    finally:
+        server.close()
+        Path(socket_path).unlink(missing_ok=True)
+        lock.close()
+
+
+def request_render(socket_path: str, cwd: Path, settings, stdout, stderr) -> int | None:
+    """
+    Renders cwd on the server and relays its output. Returns the exit code, or
+    None if the server is unavailable and nothing has been written yet.
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.settimeout(CONNECT_TIMEOUT)
+    try:
+        conn.connect(socket_path)
+    except OSError as e:
+        logger.info(f"Render server at {socket_path} unavailable: {e}")
+        conn.close()
+        return None
+    conn.settimeout(None)
+
+    request = {
+        "cwd": str(cwd),
+        "settings": {name: getattr(settings, name) for name in FIELDS},
+        "log_level": os.environ.get("CMP_LOG_LEVEL", "ERROR"),
+        "env": dict(os.environ),
+    }
+    written = False  # Whether output reached stdout, after which we cannot fall back
+    with conn, conn.makefile("rb") as f:
+        try:
+            conn.sendall(json.dumps(request).encode() + b"\n")
+            while header := f.read(FRAME_HEADER.size):
+                kind, size = FRAME_HEADER.unpack(header)
+                payload = f.read(size)
+                if len(payload) < size:
+                    break
+                if kind == FRAME_OUTPUT:
+                    stdout.write(payload)
+                    written = True
+                elif kind == FRAME_STDERR:
+                    stderr.write(payload.decode(errors="replace"))
+                elif kind == FRAME_EXIT:
+                    return int(payload)
+        except OSError as e:
+            logger.info(f"Render server connection failed: {e}")
+
+    if not written:
+        return None
+    logger.error("Render server closed the connection before the render finished")
+    return 1
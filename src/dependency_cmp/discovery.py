@@ -1,21 +1,48 @@
 import logging
+import os
+import pickle
+import signal
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
 from pathlib import Path
 
 import yaml
 from yaml import CLoader as Loader
 
+from dependency_cmp.cache import DiskCache
+from dependency_cmp.filecache import ParsedFileCache
+from dependency_cmp.fingerprint import fingerprint_kustomization
+from dependency_cmp.kustomize import diff_builds, native_build
+from dependency_cmp.limits import LimitExceeded, charge, check_deadline, kustomize_timeout, metered
 from dependency_cmp.models import KUSTOMIZE_FILES
+from dependency_cmp.parallel import ParallelParser, start_parser
+from dependency_cmp.patterns import GlobMatcher, compile_patterns
+from dependency_cmp.prefilter import might_contain_objects
+from dependency_cmp.rawdoc import load_passthrough, load_passthrough_stream
+from dependency_cmp.spill import DocumentSpill
+from dependency_cmp.stats import count, record_kustomize, stage
 
 logger = logging.getLogger("dependency_cmp")
 
+WALK_WORKERS = 8  # Max directories listed concurrently during recursive discovery
+KUSTOMIZE_FLAGS = ["--enable-alpha-plugins"]
+# Read size when discarding the rest of a kustomize output
+PIPE_CHUNK_SIZE = 64 * 1024
 
-def match_pattern(path: Path, patterns: list[str]) -> bool:
+# Environment kustomize runs with, None for this process' own. The render server
+# sets the environment of the generate call it renders for (see daemon)
+kustomize_env: ContextVar[dict[str, str] | None] = ContextVar("dependency_cmp_kustomize_env", default=None)
+
+
+def match_pattern(path: Path, patterns: list[str] | GlobMatcher) -> bool:
     """Checks if path matches any glob pattern in the list."""
     if not patterns:
         return False
-    return any(path.match(p) for p in patterns)
+    return compile_patterns(patterns).match(path)
 
 
 def has_kustomization(path: Path) -> bool:
@@ -23,75 +50,476 @@ def has_kustomization(path: Path) -> bool:
     return any((path / f).exists() for f in KUSTOMIZE_FILES)
 
 
-def run_kustomize(path: Path):
-    """Runs kustomize build on a directory."""
+def _stream_kustomize(path: Path, parse):
+    """
+    Runs kustomize build on a directory and returns parse(stdout).
+    Documents are parsed while kustomize is still writing; stderr is drained
+    by a thread at the same time, so a chatty kustomize cannot block on a
+    full pipe.
+    With a timeout, kustomize runs in its own process group, which is killed
+    (with any plugins it started) once the timeout expires.
+    """
     logger.info(f"Running Kustomize in: {path}")
+    check_deadline(path)
+    cmd = ["kustomize", "build", str(path), *KUSTOMIZE_FLAGS]
+    timeout = kustomize_timeout()
+    group = timeout is not None
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=group,
+        env=kustomize_env.get(),
+    )
+
+    timed_out = threading.Event()
+    timer = None
+    if group:
+
+        def expire():
+            timed_out.set()
+            _kill(proc, group)
+
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+
+    stderr = []
+    drain = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+    drain.start()
+
+    parse_error = None
     try:
-        cmd = ["kustomize", "build", str(path), "--enable-alpha-plugins"]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return list(yaml.load_all(result.stdout, Loader=Loader))
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Kustomize failed in {path}:\n{e.stderr}")
+        docs = parse(metered(proc.stdout, path))
+    except yaml.YAMLError as e:
+        # Truncated output of a failing build; the exit code decides what is reported
+        parse_error = e
+        while proc.stdout.read(PIPE_CHUNK_SIZE):
+            pass
+    except BaseException:
+        _kill(proc, group)
+        proc.wait()
+        raise
+    finally:
+        proc.stdout.close()
+        if timer is not None:
+            timer.cancel()
+
+    returncode = proc.wait()
+    drain.join()
+    proc.stderr.close()
+
+    if returncode != 0 and timed_out.is_set():
+        raise LimitExceeded(f"kustomize build took longer than {timeout:g}s in {path}")
+    if returncode != 0:
+        logger.error(f"Kustomize failed in {path}:\n{b''.join(stderr).decode(errors='replace')}")
         sys.exit(1)
+    if parse_error is not None:
+        raise parse_error
+    return docs
 
 
-def read_raw_files(path: Path, include: list[str], exclude: list[str]):
-    """Reads files in a directory respecting include/exclude patterns."""
-    objects = []
-    # Sort for deterministic order
-    files = sorted([p for p in path.iterdir() if p.is_file()])
+def _kill(proc: subprocess.Popen, group: bool):
+    try:
+        if group:
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
+
+
+def run_kustomize(path: Path):
+    """Runs kustomize build on a directory."""
+    return _stream_kustomize(path, lambda stream: list(yaml.load_all(stream, Loader=Loader)))
+
+
+def run_kustomize_raw(path: Path):
+    """Runs kustomize build on a directory, keeping documents as raw text."""
+    return _stream_kustomize(path, load_passthrough_stream)
+
 
-    for p in files:
-        if exclude and match_pattern(p, exclude):
+def list_directory(path: Path):
+    """
+    Lists a directory with a single scandir call.
+    Returns sorted (file names, subdirectory names); DirEntry caches the file
+    type from the listing, so only symlinks cost an extra stat.
+    """
+    files, subdirs = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                files.append(entry.name)
+            elif entry.is_dir():
+                subdirs.append(entry.name)
+    files.sort()
+    subdirs.sort()
+    return files, subdirs
+
+
+def parse_file(path: Path, passthrough: bool = False) -> list:
+    """Parses the documents of one manifest file, skipping empty ones."""
+    with path.open("r") as f:
+        size = os.fstat(f.fileno()).st_size
+        count("files")
+        count("bytes", size)
+        # Charged before parsing, so an oversized file is never loaded
+        charge("bytes", size, path)
+        if passthrough:
+            return load_passthrough(f.read())
+        return [d for d in yaml.load_all(f, Loader=Loader) if d is not None]
+
+
+def manifest_files(
+    path: Path,
+    include: list[str],
+    exclude: list[str],
+    files: list[str] | None = None,
+    prefilter: str = "off",
+) -> list[Path]:
+    """
+    The files of a directory that are read as manifests, in order.
+    `files` are the already listed file names, the directory is listed if omitted.
+    With a prefilter mode, files that cannot hold Kubernetes objects are skipped (see prefilter).
+    """
+    include, exclude = compile_patterns(include), compile_patterns(exclude)
+    if files is None:
+        files, _ = list_directory(path)
+
+    selected = []
+    scanned = skipped = 0
+    # Sort for deterministic order
+    for p in (path / name for name in sorted(files)):
+        if exclude and exclude.match(p):
             continue
         if include:
-            if not match_pattern(p, include):
+            if not include.match(p):
                 continue
         else:
             # Default behavior: Only read yaml/yml if no explicit include is passed
             if p.suffix not in (".yaml", ".yml"):
                 continue
 
+        if prefilter != "off":
+            scanned += 1
+            if not might_contain_objects(p, prefilter):
+                logger.debug(f"Skipping file without Kubernetes objects: {p}")
+                skipped += 1
+                continue
+        selected.append(p)
+
+    if skipped:
+        count("prefiltered_files", skipped)
+        logger.debug(f"Prefilter skipped {skipped} of {scanned} files in {path}")
+    return selected
+
+
+def load_files(
+    paths: list[Path],
+    passthrough: bool = False,
+    file_cache: ParsedFileCache | None = None,
+    parser: ParallelParser | None = None,
+):
+    """
+    Parses manifest files, concatenating their documents in order.
+    Files submitted to a parser (see parallel) are taken from its process pool.
+    """
+
+    def parse(p):
+        if parser is not None and p in parser:
+            return parser.parse(p)
+        return parse_file(p, passthrough)
+
+    objects = []
+    for p in paths:
+        check_deadline(p)
         try:
-            with p.open("r") as f:
-                docs = list(yaml.load_all(f, Loader=Loader))
-                objects.extend([d for d in docs if d is not None])
+            docs = parse(p) if file_cache is None else file_cache.load(p, parse)
+        except LimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Failed to read file {p}: {e}")
             sys.exit(1)
+        charge("docs", len(docs), p)
+        objects.extend(docs)
     return objects
 
 
-def collect_manifests_recursive(path: Path, recurse: bool, include: list[str], exclude: list[str]):
+def read_raw_files(
+    path: Path,
+    include: list[str],
+    exclude: list[str],
+    files: list[str] | None = None,
+    passthrough: bool = False,
+    file_cache: ParsedFileCache | None = None,
+    prefilter: str = "off",
+):
     """
-    Discovery logic with support for directory.exclude and directory.include.
+    Reads files in a directory respecting include/exclude patterns.
+    `files` are the already listed file names, the directory is listed if omitted.
+    With passthrough, documents are kept as RawDocuments instead of being loaded.
+    With a file cache, only files that changed since they were cached are parsed.
+    With a prefilter mode, files that cannot hold Kubernetes objects are skipped (see prefilter).
     """
-    # Check if the directory itself is excluded (e.g. .git)
-    if exclude and match_pattern(path, exclude):
-        logger.debug(f"Skipping excluded directory: {path}")
-        return []
+    paths = manifest_files(path, include, exclude, files, prefilter)
+    return load_files(paths, passthrough, file_cache)
+
+
+class _DirNode:
+    """One visited directory of the discovery walk."""
+
+    __slots__ = ("path", "kustomize", "files", "children")
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.kustomize = False
+        self.files = []
+        self.children = []
+
+
+def _plan_directory(node: _DirNode, listing, recurse: bool, include: GlobMatcher, exclude: GlobMatcher):
+    """Decides how a listed directory is rendered and which subdirectories to descend into."""
+    files, subdirs = listing
+    path = node.path
 
     # Check for Kustomization (takes precedence over raw file scanning for this specific dir)
-    kustomization_file = next((path / f for f in KUSTOMIZE_FILES if (path / f).exists()), None)
+    names = set(files)
+    kustomization_file = next((path / f for f in KUSTOMIZE_FILES if f in names), None)
     if kustomization_file:
         # Check if the kustomization file itself is allowed
         # Logic: It must NOT be excluded. If include list exists, it MUST be included.
-        is_excluded = exclude and match_pattern(kustomization_file, exclude)
-        is_included = not include or match_pattern(kustomization_file, include)
+        is_excluded = exclude and exclude.match(kustomization_file)
+        is_included = not include or include.match(kustomization_file)
         if not is_excluded and is_included:
-            return run_kustomize(path)
+            node.kustomize = True
+            return
         else:
             logger.info(f"Kustomization found but filtered out in {path}")
 
-    collected_objects = []
-
-    # Read Raw Files in current dir
-    collected_objects.extend(read_raw_files(path, include, exclude))
+    node.files = files
+    charge("files", len(files), path)
 
-    # Recurse (if enabled)
+    # Recurse (if enabled), pruning excluded subtrees before they are listed
     if recurse:
-        subdirs = sorted([p for p in path.iterdir() if p.is_dir()])
-        for subdir in subdirs:
-            collected_objects.extend(collect_manifests_recursive(subdir, recurse, include, exclude))
+        for name in subdirs:
+            subdir = path / name
+            if exclude and exclude.match(subdir):
+                logger.debug(f"Skipping excluded directory: {subdir}")
+                continue
+            if include and not include.could_match_below(subdir):
+                logger.debug(f"Skipping directory without includable files: {subdir}")
+                continue
+            node.children.append(_DirNode(subdir))
+
+
+def walk_directories(path: Path, recurse: bool, include: list[str], exclude: list[str]):
+    """
+    Lists the directory tree level by level, fanning the listings of each level
+    out over a bounded thread pool. Returns the visited directories in the same
+    depth-first, name-sorted order the manifests are collected in.
+    """
+    include, exclude = compile_patterns(include), compile_patterns(exclude)
+
+    # Check if the directory itself is excluded (e.g. .git)
+    if exclude and exclude.match(path):
+        logger.debug(f"Skipping excluded directory: {path}")
+        return []
+
+    root = _DirNode(path)
+    if not recurse:
+        _plan_directory(root, list_directory(path), recurse, include, exclude)
+        return [root]
+
+    with ThreadPoolExecutor(max_workers=WALK_WORKERS) as pool:
+        level = [root]
+        while level:
+            listings = pool.map(list_directory, [node.path for node in level])
+            next_level = []
+            for node, listing in zip(level, listings):
+                check_deadline(node.path)
+                _plan_directory(node, listing, recurse, include, exclude)
+                next_level.extend(node.children)
+            level = next_level
+
+    # Flatten in pre-order: a directory's own files come before its subdirectories
+    ordered = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        ordered.append(node)
+        stack.extend(reversed(node.children))
+    return ordered
+
+
+def build_kustomization(
+    path: Path, cache: DiskCache | None = None, passthrough: bool = False, native: str = "off"
+):
+    """
+    Returns the documents of one kustomization. With a cache, the parsed output
+    is stored under a hash of all build inputs and reused while they are unchanged.
+    With native "on", simple kustomizations are built in-process (see kustomize);
+    with "verify", both builds run and differences are logged.
+    """
+    start = time.perf_counter()
+    native_docs = native_build(path) if native != "off" else None
+    if native_docs is not None and native == "on":
+        count("kustomize_native")
+        return native_docs
+
+    flags = [*KUSTOMIZE_FLAGS, "(passthrough)"] if passthrough else KUSTOMIZE_FLAGS
+    key = fingerprint_kustomization(path, flags) if cache else None
+    if key:
+        payload = cache.get(key)
+        if payload is not None:
+            try:
+                docs = pickle.loads(payload)
+            except Exception as e:
+                logger.warning(f"Discarding unreadable Kustomize cache entry for {path}: {e}")
+                cache.discard(key)
+            else:
+                logger.info(f"Using cached Kustomize output for: {path}")
+                record_kustomize(path, time.perf_counter() - start, cached=True)
+                return _verify_native(path, native_docs, docs)
+
+    with stage("kustomize"):
+        docs = run_kustomize_raw(path) if passthrough else run_kustomize(path)
+    record_kustomize(path, time.perf_counter() - start, cached=False)
+
+    if key:
+        try:
+            cache.put(key, pickle.dumps(docs, protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError as e:
+            logger.warning(f"Could not cache Kustomize output for {path}: {e}")
+    return _verify_native(path, native_docs, docs)
+
+
+def _verify_native(path: Path, native_docs: list | None, docs: list) -> list:
+    """Compares a native build with kustomize's output, which is returned either way."""
+    if native_docs is not None:
+        diff = diff_builds(native_docs, docs)
+        if diff:
+            count("kustomize_native_mismatches")
+            logger.warning(f"Native build of {path} differs from kustomize:\n{diff}")
+        else:
+            count("kustomize_native")
+    return docs
+
+
+def _build_and_store(
+    path: Path, cache: DiskCache | None, passthrough: bool, spill: DocumentSpill | None, native: str
+):
+    docs = build_kustomization(path, cache, passthrough, native)
+    charge("docs", len(docs), path)
+    return spill.store(docs) if spill else docs
+
+
+def build_kustomizations(
+    paths: list[Path],
+    workers: int = 1,
+    cache: DiskCache | None = None,
+    passthrough: bool = False,
+    spill: DocumentSpill | None = None,
+    native: str = "off",
+):
+    """
+    Runs kustomize build for every directory, up to `workers` at a time.
+    Returns the outputs in the order of `paths`. Failures are logged with their
+    stderr by run_kustomize; the first one in order aborts the render.
+    With a spill, each output is handed to it as soon as it is built.
+    """
+    if workers <= 1 or len(paths) <= 1:
+        return [_build_and_store(p, cache, passthrough, spill, native) for p in paths]
+
+    logger.info(f"Building {len(paths)} kustomizations with {min(workers, len(paths))} workers")
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        # Each build runs in a copy of this context, so it reports to the same render stats
+        futures = [
+            pool.submit(copy_context().run, _build_and_store, p, cache, passthrough, spill, native)
+            for p in paths
+        ]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            # Fail fast: builds that have not started yet are dropped
+            pool.shutdown(cancel_futures=True)
+            raise
+
+
+def collect_manifests_recursive(
+    path: Path,
+    recurse: bool,
+    include: list[str],
+    exclude: list[str],
+    kustomize_workers: int = 1,
+    kustomize_cache: DiskCache | None = None,
+    passthrough: bool = False,
+    file_cache: DiskCache | None = None,
+    spill: DocumentSpill | None = None,
+    kustomize_native: str = "off",
+    prefilter: str = "off",
+    parse_workers: int = 1,
+    parse_parallel_min_bytes: int = 0,
+):
+    """
+    Discovery logic with support for directory.exclude and directory.include.
+    Patterns can be passed as lists or as prebuilt GlobMatchers.
+    All kustomization roots are discovered first and built with up to
+    `kustomize_workers` concurrent kustomize processes.
+    With passthrough, documents are kept as RawDocuments (see rawdoc).
+    With a file cache, parsed documents of unchanged files are reused.
+    With a spill, documents are collected into it (see spill) and its list is returned.
+    kustomize_native selects in-process builds of simple kustomizations (see kustomize).
+    prefilter skips manifest files that cannot hold Kubernetes objects (see prefilter).
+    With parse_workers other than 1 (0 for one per CPU), manifest files are parsed in a
+    process pool if they add up to parse_parallel_min_bytes (see parallel).
+    """
+    include, exclude = compile_patterns(include), compile_patterns(exclude)
+    with stage("walk"):
+        nodes = walk_directories(path, recurse, include, exclude)
+    count("directories", len(nodes))
+
+    parsed_files = ParsedFileCache(file_cache, passthrough) if file_cache else None
+    with stage("parse"):
+        raw_files = {
+            node.path: manifest_files(node.path, include, exclude, node.files, prefilter)
+            for node in nodes
+            if not node.kustomize
+        }
+        # The process pool parses while kustomize builds run
+        parser = start_parser(
+            [p for paths in raw_files.values() for p in paths],
+            passthrough,
+            parsed_files,
+            parse_workers,
+            parse_parallel_min_bytes,
+        )
+
+    try:
+        roots = [node.path for node in nodes if node.kustomize]
+        builds = dict(
+            zip(
+                roots,
+                build_kustomizations(
+                    roots, kustomize_workers, kustomize_cache, passthrough, spill, kustomize_native
+                ),
+            )
+        )
+
+        # A spill takes the documents in order, moving them out of memory once active
+        collected_objects = [] if spill is None else spill
+        for node in nodes:
+            if node.kustomize:
+                collected_objects.extend(builds.pop(node.path))
+            else:
+                with stage("parse"):
+                    collected_objects.extend(
+                        load_files(raw_files.pop(node.path), passthrough, parsed_files, parser)
+                    )
+    finally:
+        if parser is not None:
+            parser.close()
+    if spill is not None:
+        collected_objects = spill.docs
 
+    count("docs", len(collected_objects))
     return collected_objects
@@ -0,0 +1,83 @@
+import hashlib
+import logging
+import os
+import pickle
+from pathlib import Path
+
+from dependency_cmp.cache import DiskCache
+from dependency_cmp.fingerprint import code_fingerprint
+from dependency_cmp.stats import count
+
+logger = logging.getLogger("dependency_cmp")
+
+
+class ParsedFileCache:
+    """
+    Parsed documents of single manifest files, pickled into a DiskCache.
+    Entries are stored under a hash of the file content. A second key built
+    from the path and stat data points to the content entry, so unchanged
+    files are served without reading them, and touched but identical files
+    still hit after hashing.
+    """
+
+    def __init__(self, cache: DiskCache, passthrough: bool = False):
+        self.cache = cache
+        # Parsing mode and plugin build both determine the parsed documents
+        self.context = "\0".join(["file", "raw" if passthrough else "full", code_fingerprint()])
+
+    def _stat_key(self, path: Path) -> str | None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        info = f"{self.context}\0{path}\0{st.st_size}:{st.st_mtime_ns}:{st.st_ctime_ns}:{st.st_ino}"
+        return "stat-" + hashlib.sha256(info.encode()).hexdigest()
+
+    def _load(self, key: str, path: Path):
+        payload = self.cache.get(key)
+        if payload is None:
+            return None
+        try:
+            return pickle.loads(payload)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry for {path}: {e}")
+            self.cache.discard(key)
+            return None
+
+    def is_fresh(self, path: Path) -> bool:
+        """Whether path is served by its stat key, without reading the file."""
+        stat_key = self._stat_key(path)
+        return stat_key is not None and self.cache.get(stat_key) is not None
+
+    def load(self, path: Path, parse) -> list:
+        """Returns the documents of path, calling parse(path) only on a miss."""
+        stat_key = self._stat_key(path)
+        alias = self.cache.get(stat_key) if stat_key else None
+        if alias is not None:
+            docs = self._load(alias.decode(), path)
+            if docs is not None:
+                count("file_cache_hits")
+                return docs
+
+        digest = hashlib.sha256(f"{self.context}\0".encode())
+        with path.open("rb") as f:
+            digest.update(hashlib.file_digest(f, "sha256").digest())
+        content_key = "file-" + digest.hexdigest()
+
+        docs = self._load(content_key, path)
+        if docs is None:
+            docs = parse(path)
+            try:
+                self.cache.put(content_key, pickle.dumps(docs, protocol=pickle.HIGHEST_PROTOCOL))
+            except OSError as e:
+                logger.warning(f"Could not cache parsed documents of {path}: {e}")
+                return docs
+        else:
+            count("file_cache_hits")
+
+        if stat_key:
+            try:
+                self.cache.put(stat_key, content_key.encode())
+            except OSError as e:
+                logger.warning(f"Could not cache parsed documents of {path}: {e}")
+        return docs
@@ -0,0 +1,200 @@
+import hashlib
+import logging
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import yaml
+from yaml import CSafeLoader as SafeLoader
+
+from dependency_cmp.limits import charge, check_deadline
+from dependency_cmp.models import KUSTOMIZE_FILES
+
+logger = logging.getLogger("dependency_cmp")
+
+# Kustomization fields that pull in other directories (or remote URLs)
+KUSTOMIZE_REFERENCE_FIELDS = ("resources", "bases", "components")
+# Kustomization fields that run (exec) plugins, whose inputs we cannot see
+KUSTOMIZE_PLUGIN_FIELDS = ("generators", "transformers", "validators")
+
+
+def tool_fingerprint(name: str) -> str | None:
+    """
+    Identifies an executable on PATH by its real location, size and mtime.
+    Much cheaper than spawning `<tool> version`; None if the tool is missing.
+    """
+    location = shutil.which(name)
+    if location is None:
+        return None
+    real = os.path.realpath(location)
+    stat = os.stat(real)
+    return f"{real}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _iter_strings(value):
+    """Yields every string leaf of a parsed YAML document."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _iter_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _iter_strings(item)
+
+
+def _kustomization_references(directory: Path, kustomization_file: Path) -> list[Path] | None:
+    """
+    Returns the local files and directories a kustomization file refers to.
+    None if the build depends on something we cannot fingerprint: remote
+    resources, plugins or an unreadable kustomization.
+    """
+    try:
+        data = yaml.load(kustomization_file.read_bytes(), Loader=SafeLoader)
+    except (OSError, yaml.YAMLError):
+        return None
+    if data is None:
+        return []
+    if not isinstance(data, dict) or any(data.get(f) for f in KUSTOMIZE_PLUGIN_FIELDS):
+        return None
+
+    references = []
+    for field in KUSTOMIZE_REFERENCE_FIELDS:
+        for entry in data.get(field) or []:
+            target = directory / entry if isinstance(entry, str) else None
+            # Anything that is not a local path (e.g. a git URL) makes the build uncacheable
+            if target is None or not target.exists():
+                return None
+            references.append(target.resolve())
+
+    # Other fields (patches, generator files, ...) may point to single files
+    for value in _iter_strings(data):
+        for candidate in (value, value.partition("=")[2]):
+            if not candidate or candidate.startswith("/"):
+                continue
+            try:
+                target = directory / candidate
+                if target.is_file():
+                    references.append(target.resolve())
+            except (OSError, ValueError):
+                continue
+    return references
+
+
+def _is_within(path: Path, roots) -> bool:
+    return any(path == root or root in path.parents for root in roots)
+
+
+def kustomize_inputs(path: Path) -> list[tuple[str, Path, list[Path]]] | None:
+    """
+    Collects every file a `kustomize build` of path can read: the directory
+    tree itself plus the trees and files referenced from any kustomization
+    inside it, followed transitively.
+    Returns sorted (label, root, files) entries, where label is the root's
+    location relative to path. None if the build cannot be fingerprinted.
+    """
+    base = path.resolve()
+    inputs = {}  # root -> files
+    pending = [base]
+    while pending:
+        root = pending.pop()
+        if root in inputs or _is_within(root, [r for r in inputs if r.is_dir()]):
+            continue
+        if root.is_file():
+            inputs[root] = [root]
+            continue
+
+        files = []
+        inputs[root] = files
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if d != ".git")
+            current = Path(dirpath)
+            check_deadline(current)
+            charge("files", len(filenames), current)
+            for name in dirnames:
+                # os.walk does not descend into symlinked dirs, kustomize does
+                if (current / name).is_symlink():
+                    pending.append((current / name).resolve())
+            for name in sorted(filenames):
+                files.append(current / name)
+                if name in KUSTOMIZE_FILES:
+                    references = _kustomization_references(current, current / name)
+                    if references is None:
+                        return None
+                    pending.extend(references)
+
+    return sorted(
+        (os.path.relpath(root, base), root, files) for root, files in inputs.items()
+    )
+
+
+def _relative_name(file: Path, root: Path) -> str:
+    return "." if file == root else str(file.relative_to(root))
+
+
+def content_fingerprint(inputs, context: str) -> str:
+    """Hash over the names and contents of all input files, salted with context."""
+    digest = hashlib.sha256(f"{context}\0".encode())
+    for label, root, files in inputs:
+        digest.update(f"root\0{label}\0".encode())
+        for file in files:
+            check_deadline(file)
+            try:
+                with file.open("rb") as f:
+                    charge("bytes", os.fstat(f.fileno()).st_size, file)
+                    content = hashlib.file_digest(f, "sha256").digest()
+            except OSError:
+                # Unreadable files (e.g. dangling symlinks) only contribute their name
+                content = b""
+            digest.update(f"{_relative_name(file, root)}\0".encode())
+            digest.update(content)
+    return digest.hexdigest()
+
+
+def stat_fingerprint(inputs, context: str) -> str:
+    """
+    Cheap hash over the names and stat data of all input files, salted with context.
+    ctime and inode change on every rewrite, even if size and mtime are restored.
+    """
+    digest = hashlib.sha256(f"{context}\0".encode())
+    for label, root, files in inputs:
+        digest.update(f"root\0{label}\0".encode())
+        for file in files:
+            check_deadline(file)
+            try:
+                st = file.stat()
+                info = f"{st.st_size}:{st.st_mtime_ns}:{st.st_ctime_ns}:{st.st_ino}"
+            except OSError:
+                info = "-"
+            digest.update(f"{_relative_name(file, root)}\0{info}\0".encode())
+    return digest.hexdigest()
+
+
+def code_fingerprint() -> str:
+    """Identifies the running plugin build: interpreter/binary and package sources."""
+    parts = []
+    for location in [sys.executable, *sorted(Path(__file__).parent.glob("*.py"))]:
+        try:
+            st = os.stat(location)
+            parts.append(f"{location}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            continue
+    return "|".join(parts)
+
+
+def fingerprint_kustomization(path: Path, flags: list[str]) -> str | None:
+    """
+    Content hash over everything that determines the output of
+    `kustomize build path <flags>`: the kustomize binary, the flags and all
+    input files. None if the build cannot be cached safely.
+    """
+    tool = tool_fingerprint("kustomize")
+    if tool is None:
+        return None
+    inputs = kustomize_inputs(path)
+    if inputs is None:
+        logger.debug(f"Kustomization in {path} has inputs that cannot be fingerprinted")
+        return None
+
+    return content_fingerprint(inputs, f"kustomize\0{tool}\0{' '.join(flags)}")
@@ -1,15 +1,236 @@
 import logging
 import sys
-from graphlib import TopologicalSorter
+from array import array
 
-from dependency_cmp.models import DEPENDS_ON_ANNOTATION, SYNC_WAVE_ANNOTATION, get_resource_key
+from dependency_cmp.models import (
+    DEPENDS_ON_ANNOTATION,
+    SYNC_WAVE_ANNOTATION,
+    ResourceIndex,
+    get_resource_key,
+    parse_dependency,
+    split_dependencies,
+)
+from dependency_cmp.stats import count, enabled, report
 
 logger = logging.getLogger("dependency_cmp")
 
 
-def process_dag(manifests):
-    """Builds DAG and calculates sync waves."""
-    graph = {}
+def _csr(node_count, heads, tails):
+    """
+    Packs the edge list (heads[i] -> tails[i]) into compressed sparse rows:
+    the targets of node n are targets[offsets[n]:offsets[n + 1]].
+    """
+    offsets = array("i", [0]) * (node_count + 1)
+    for head in heads:
+        offsets[head + 1] += 1
+    for node in range(node_count):
+        offsets[node + 1] += offsets[node]
+
+    fill = offsets[:-1]
+    targets = array("i", [0]) * len(heads)
+    for head, tail in zip(heads, tails):
+        targets[fill[head]] = tail
+        fill[head] += 1
+    return offsets, targets
+
+
+class DependencyGraph:
+    """
+    Integer-indexed dependency graph.
+    Every resource ID gets a dense node number, edges are kept in two flat
+    arrays and only turned into adjacency lists (CSR) when waves are computed.
+    """
+
+    def __init__(self):
+        self.ids = []  # Node -> resource ID
+        self.nodes = {}  # Resource ID -> Node
+        self._dependencies = array("i")  # Edge -> node that must be synced first
+        self._dependents = array("i")  # Edge -> node that waits for it
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def edge_count(self):
+        return len(self._dependents)
+
+    def add_node(self, key_id):
+        """Returns the node for a resource ID, registering it on first use."""
+        node = self.nodes.get(key_id)
+        if node is None:
+            node = self.nodes[key_id] = len(self.ids)
+            self.ids.append(key_id)
+        return node
+
+    def add_edge(self, dependent, dependency):
+        """Records that node `dependent` depends on node `dependency`."""
+        self._dependencies.append(dependency)
+        self._dependents.append(dependent)
+
+    def _topological_order(self):
+        """
+        Kahn pass over the graph. Returns the nodes in topological order and
+        their ASAP waves: a node's wave is the length of the longest dependency
+        chain leading to it, the same layering as repeated
+        TopologicalSorter.get_ready().
+        Raises ValueError("nodes are in a cycle", cycle) like graphlib does.
+        """
+        node_count = len(self.ids)
+        offsets, targets = _csr(node_count, self._dependencies, self._dependents)
+
+        indegree = array("i", [0]) * node_count
+        for dependent in self._dependents:
+            indegree[dependent] += 1
+
+        waves = array("i", [0]) * node_count
+        queue = [node for node in range(node_count) if indegree[node] == 0]
+        # The queue grows while we walk it; every node is appended exactly once
+        for node in queue:
+            next_wave = waves[node] + 1
+            for i in range(offsets[node], offsets[node + 1]):
+                target = targets[i]
+                if waves[target] < next_wave:
+                    waves[target] = next_wave
+                indegree[target] -= 1
+                if indegree[target] == 0:
+                    queue.append(target)
+
+        if len(queue) < node_count:
+            raise ValueError("nodes are in a cycle", self._find_cycle(indegree))
+        return queue, waves
+
+    def _latest_waves(self, order, earliest):
+        """
+        ALAP waves: every node as late as its dependents allow, within the
+        same number of waves as the ASAP layering.
+        """
+        offsets, targets = _csr(len(self.ids), self._dependencies, self._dependents)
+        last = max(earliest, default=0)
+        latest = array("i", [last]) * len(self.ids)
+        for node in reversed(order):
+            for i in range(offsets[node], offsets[node + 1]):
+                if latest[targets[i]] - 1 < latest[node]:
+                    latest[node] = latest[targets[i]] - 1
+        return latest
+
+    def _balanced_waves(self, order, earliest, latest):
+        """
+        Spreads the nodes with slack (earliest < latest) over the waves they
+        can go to, in topological order, aiming at the average wave size.
+        Nodes on a critical path keep their only possible wave, so the wave
+        count does not change.
+        """
+        offsets, targets = _csr(len(self.ids), self._dependents, self._dependencies)
+        waves = array("i", earliest)
+        sizes = [0] * (max(earliest, default=0) + 1)
+        for node in order:
+            if earliest[node] == latest[node]:
+                sizes[earliest[node]] += 1
+        target = -(-len(order) // len(sizes))  # Average wave size, rounded up
+
+        for node in order:
+            if earliest[node] == latest[node]:
+                continue
+            # Dependencies are placed already, they may have moved to later waves
+            lowest = max(
+                (waves[targets[i]] + 1 for i in range(offsets[node], offsets[node + 1])),
+                default=0,
+            )
+            # The earliest wave below the average size keeps the most room for
+            # dependents; if all are full, the smallest one
+            candidates = range(lowest, latest[node] + 1)
+            wave = next((w for w in candidates if sizes[w] < target), None)
+            if wave is None:
+                wave = min(candidates, key=sizes.__getitem__)
+            waves[node] = wave
+            sizes[wave] += 1
+        return waves
+
+    def waves(self, strategy: str = "asap"):
+        """
+        Calculates the sync wave of every node.
+        asap: earliest possible wave (longest chain of dependencies)
+        alap: latest possible wave (longest chain of dependents), so resources
+              nothing depends on are synced last instead of holding back wave 0
+        balanced: evens out the number of resources per wave using the slack
+                  between both
+        All strategies use the minimal number of waves, the critical path length.
+        """
+        order, earliest = self._topological_order()
+        if strategy == "asap":
+            return earliest
+        latest = self._latest_waves(order, earliest)
+        if strategy == "alap":
+            return latest
+        if strategy == "balanced":
+            return self._balanced_waves(order, earliest, latest)
+        raise ValueError(f"Unknown wave strategy: {strategy}")
+
+    def critical_path(self):
+        """
+        Returns one longest dependency chain as resource IDs, dependencies
+        first. Its length is the number of waves of every strategy.
+        """
+        if not self.ids:
+            return []
+        _, waves = self._topological_order()
+        offsets, targets = _csr(len(self.ids), self._dependents, self._dependencies)
+        node = max(range(len(self.ids)), key=waves.__getitem__)
+        path = [node]
+        while waves[node] > 0:
+            # With ASAP waves, some dependency is exactly one wave earlier
+            node = next(
+                targets[i]
+                for i in range(offsets[node], offsets[node + 1])
+                if waves[targets[i]] == waves[node] - 1
+            )
+            path.append(node)
+        path.reverse()
+        return [self.ids[n] for n in path]
+
+    def _find_cycle(self, indegree):
+        """
+        Returns one cycle among the nodes Kahn could not release (indegree > 0).
+        Each of those still has an unreleased dependency, so walking backwards
+        through them must eventually revisit a node.
+        """
+        offsets, targets = _csr(len(self.ids), self._dependents, self._dependencies)
+        node = next(n for n in range(len(self.ids)) if indegree[n] > 0)
+        path = {}
+        while node not in path:
+            path[node] = len(path)
+            node = next(
+                targets[i]
+                for i in range(offsets[node], offsets[node + 1])
+                if indegree[targets[i]] > 0
+            )
+        cycle = list(path)[path[node] :]
+        # Report in dependency order, closing the loop like graphlib
+        cycle.reverse()
+        return [self.ids[n] for n in cycle + cycle[:1]]
+
+
+def wave_report(graph: DependencyGraph, waves) -> dict:
+    """Summarizes a wave assignment: wave count, critical path, widest and narrowest wave."""
+    sizes = [0] * (max(waves, default=-1) + 1)
+    for wave in waves:
+        sizes[wave] += 1
+    critical_path = graph.critical_path()
+    result = {"waves": len(sizes), "critical_path": critical_path}
+    if sizes:
+        widest = max(range(len(sizes)), key=sizes.__getitem__)
+        narrowest = min(range(len(sizes)), key=sizes.__getitem__)
+        result["widest"] = {"wave": widest, "resources": sizes[widest]}
+        result["narrowest"] = {"wave": narrowest, "resources": sizes[narrowest]}
+    return result
+
+
+def process_dag(manifests, strategy: str = "asap"):
+    """
+    Builds DAG and calculates sync waves.
+    strategy selects the wave placement, see DependencyGraph.waves().
+    """
+    graph = DependencyGraph()
     resource_map = {}  # Map ID -> Doc
     keys_list = []  # List of ResourceKey objects for searching
 
@@ -22,11 +243,11 @@ def process_dag(manifests):
 
         resource_map[rkey.id] = doc
         keys_list.append(rkey)
-
-        if rkey.id not in graph:
-            graph[rkey.id] = set()
+        graph.add_node(rkey.id)
 
     # 2. Build Edges (Resolve Dependencies)
+    index = ResourceIndex(keys_list)
+    parsed = {}  # Dependency string -> Dependency, None if unsupported
     for rkey in keys_list:
         doc = resource_map[rkey.id]
         metadata = doc.get("metadata") or {}
@@ -36,15 +257,33 @@ def process_dag(manifests):
             deps_str = annotations[DEPENDS_ON_ANNOTATION]
             if deps_str:
                 # Split comma and space separated dependencies
-                raw_deps = [d.strip() for d in deps_str.replace(",", " ").split()]
+                raw_deps = split_dependencies(deps_str)
 
                 for raw_dep in raw_deps:
-                    # Resolve matches
-                    matches = [k for k in keys_list if k.matches(raw_dep)]
+                    # Resolve matches; annotations repeat a lot, parse each string once
+                    if raw_dep not in parsed:
+                        parsed[raw_dep] = parse_dependency(raw_dep)
+                    dependency = parsed[raw_dep]
+                    matches = index.lookup(dependency)
+
+                    if dependency is not None and dependency.selector:
+                        # Selectors fan in to every match, except the resource itself
+                        node = graph.nodes[rkey.id]
+                        for match in matches:
+                            if match.id != rkey.id:
+                                graph.add_edge(node, graph.nodes[match.id])
+                        if not matches:
+                            logger.info(f"Selector '{raw_dep}' in '{rkey.id}' matched no resources.")
+                        continue
+
+                    if len(matches) > 1 and dependency.namespace is None:
+                        # Unqualified names prefer the dependent's own namespace
+                        local = [m for m in matches if m.namespace == rkey.namespace]
+                        if len(local) == 1:
+                            matches = local
 
                     if len(matches) == 1:
-                        target_id = matches[0].id
-                        graph[rkey.id].add(target_id)
+                        graph.add_edge(graph.nodes[rkey.id], graph.nodes[matches[0].id])
                     elif len(matches) > 1:
                         logger.error(
                             f"Ambiguous dependency '{raw_dep}' in '{rkey.id}'. Matches: {[m.id for m in matches]}"
@@ -56,24 +295,30 @@ def process_dag(manifests):
                         )
 
     # 3. Calculate Waves
-    sorter = TopologicalSorter(graph)
     try:
-        sorter.prepare()
+        waves = graph.waves(strategy)
     except ValueError as e:
         logger.error(f"Cycle detected in dependencies: {e}")
         sys.exit(1)
 
-    waves = {}
-    current_wave = 0
-    while sorter.is_active():
-        ready = sorter.get_ready()
-        for node in ready:
-            waves[node] = current_wave
-        sorter.done(*ready)
-        current_wave += 1
+    if enabled() or logger.isEnabledFor(logging.INFO):
+        summary = wave_report(graph, waves)
+        report("wave_report", {"strategy": strategy, **summary})
+        if summary["waves"]:
+            logger.info(
+                f"{summary['waves']} waves ({strategy}), critical path: "
+                f"{' -> '.join(summary['critical_path'])}; widest wave "
+                f"{summary['widest']['wave']} ({summary['widest']['resources']} resources), "
+                f"narrowest wave {summary['narrowest']['wave']} "
+                f"({summary['narrowest']['resources']} resources)"
+            )
+
+    count("resources", len(graph))
+    count("edges", graph.edge_count)
+    count("waves", max(waves, default=-1) + 1)
 
     # 4. Inject Annotations
-    for key_id, wave in waves.items():
+    for key_id, wave in zip(graph.ids, waves):
         doc = resource_map[key_id]
         if doc.get("metadata") is None:
             doc["metadata"] = {}
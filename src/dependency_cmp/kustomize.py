@@ -0,0 +1,405 @@
+"""
+In-process `kustomize build` for a small, clearly defined subset of
+kustomizations, so simple ones do not cost a kustomize process.
+
+Supported kustomization fields:
+  - resources: local files inside the kustomization directory, and local
+    directories with a kustomization of their own (built recursively)
+  - namespace, commonLabels, commonAnnotations, namePrefix, nameSuffix
+  - apiVersion and kind (Kustomization)
+
+Whenever a build needs anything else (other fields, remote resources, List
+documents, or transformations whose side effects are not reproduced here,
+such as name reference updates), native_build returns None and the caller
+runs the kustomize binary. Resources are emitted in kustomize's legacy
+order. CMP_KUSTOMIZE_NATIVE=verify runs both and reports differences.
+"""
+
+import difflib
+import logging
+from pathlib import Path
+
+import yaml
+from yaml import CDumper as Dumper
+from yaml import CLoader as Loader
+
+from dependency_cmp.models import KUSTOMIZE_FILES
+from dependency_cmp.rawdoc import RawDocument
+
+logger = logging.getLogger("dependency_cmp")
+
+SUPPORTED_FIELDS = {
+    "apiVersion",
+    "kind",
+    "resources",
+    "namespace",
+    "commonLabels",
+    "commonAnnotations",
+    "namePrefix",
+    "nameSuffix",
+}
+
+# kustomize's legacy resource order: these kinds first and last, in this order
+ORDER_FIRST = [
+    "Namespace",
+    "ResourceQuota",
+    "StorageClass",
+    "CustomResourceDefinition",
+    "ServiceAccount",
+    "PodSecurityPolicy",
+    "Role",
+    "ClusterRole",
+    "RoleBinding",
+    "ClusterRoleBinding",
+    "ConfigMap",
+    "Secret",
+    "Endpoints",
+    "Service",
+    "LimitRange",
+    "PriorityClass",
+    "PersistentVolume",
+    "PersistentVolumeClaim",
+    "Deployment",
+    "StatefulSet",
+    "CronJob",
+    "PodDisruptionBudget",
+]
+ORDER_LAST = ["MutatingWebhookConfiguration", "ValidatingWebhookConfiguration"]
+_TYPE_ORDER = {
+    **{kind: i - len(ORDER_FIRST) for i, kind in enumerate(ORDER_FIRST)},
+    **{kind: i + 1 for i, kind in enumerate(ORDER_LAST)},
+}
+
+# Cluster-scoped built-in kinds, and kinds whose namespace references kustomize updates
+NAMESPACE_UNSUPPORTED = {
+    "APIService",
+    "CertificateSigningRequest",
+    "ClusterRole",
+    "ClusterRoleBinding",
+    "ComponentStatus",
+    "CSIDriver",
+    "CSINode",
+    "CustomResourceDefinition",
+    "FlowSchema",
+    "IngressClass",
+    "MutatingWebhookConfiguration",
+    "Namespace",
+    "Node",
+    "PersistentVolume",
+    "PodSecurityPolicy",
+    "PriorityClass",
+    "PriorityLevelConfiguration",
+    "RoleBinding",
+    "RuntimeClass",
+    "StorageClass",
+    "ValidatingAdmissionPolicy",
+    "ValidatingAdmissionPolicyBinding",
+    "ValidatingWebhookConfiguration",
+    "VolumeAttachment",
+}
+
+# Built-in kinds other resources refer to by name, kustomize renames those references
+NAME_REFERENCE_TARGETS = {
+    "APIService",
+    "ClusterRole",
+    "ConfigMap",
+    "CronJob",
+    "CSIDriver",
+    "CustomResourceDefinition",
+    "DaemonSet",
+    "Deployment",
+    "IngressClass",
+    "Job",
+    "Namespace",
+    "PersistentVolume",
+    "PersistentVolumeClaim",
+    "Pod",
+    "PriorityClass",
+    "ReplicaSet",
+    "ReplicationController",
+    "Role",
+    "RuntimeClass",
+    "Secret",
+    "Service",
+    "ServiceAccount",
+    "StatefulSet",
+    "StorageClass",
+    "VolumeSnapshotClass",
+}
+
+_POD_TEMPLATE_LABELS = [("spec", "template", "metadata", "labels")]
+_POD_TEMPLATE_ANNOTATIONS = [("spec", "template", "metadata", "annotations")]
+_WORKLOAD_LABELS = [("spec", "selector", "matchLabels"), *_POD_TEMPLATE_LABELS]
+
+# kind: (API groups, label fields created if missing, label fields only updated, annotation fields)
+FIELD_SPECS = {
+    "Service": ({""}, [("spec", "selector")], [], []),
+    "ReplicationController": (
+        {""},
+        [("spec", "selector"), *_POD_TEMPLATE_LABELS],
+        [],
+        _POD_TEMPLATE_ANNOTATIONS,
+    ),
+    "Deployment": ({"apps", "extensions"}, _WORKLOAD_LABELS, [], _POD_TEMPLATE_ANNOTATIONS),
+    "ReplicaSet": ({"apps", "extensions"}, _WORKLOAD_LABELS, [], _POD_TEMPLATE_ANNOTATIONS),
+    "DaemonSet": ({"apps", "extensions"}, _WORKLOAD_LABELS, [], _POD_TEMPLATE_ANNOTATIONS),
+    "StatefulSet": ({"apps"}, _WORKLOAD_LABELS, [], _POD_TEMPLATE_ANNOTATIONS),
+    "Job": (
+        {"batch"},
+        _POD_TEMPLATE_LABELS,
+        [("spec", "selector", "matchLabels")],
+        _POD_TEMPLATE_ANNOTATIONS,
+    ),
+    "CronJob": (
+        {"batch"},
+        [
+            ("spec", "jobTemplate", "metadata", "labels"),
+            ("spec", "jobTemplate", "spec", "template", "metadata", "labels"),
+        ],
+        [("spec", "jobTemplate", "spec", "selector", "matchLabels")],
+        [
+            ("spec", "jobTemplate", "metadata", "annotations"),
+            ("spec", "jobTemplate", "spec", "template", "metadata", "annotations"),
+        ],
+    ),
+    "PodDisruptionBudget": ({"policy"}, [], [("spec", "selector", "matchLabels")], []),
+    "NetworkPolicy": (
+        {"networking.k8s.io"},
+        [],
+        [
+            ("spec", "podSelector", "matchLabels"),
+            ("spec", "ingress", "from", "podSelector", "matchLabels"),
+            ("spec", "egress", "to", "podSelector", "matchLabels"),
+        ],
+        [],
+    ),
+}
+
+
+class Unsupported(Exception):
+    """The kustomization needs a feature outside the native subset."""
+
+
+def _group_version(doc) -> tuple[str, str]:
+    group, _, version = doc["apiVersion"].rpartition("/")
+    return group, version
+
+
+def _namespace(doc) -> str:
+    namespace = doc["metadata"].get("namespace") or ""
+    return "" if namespace == "default" else namespace
+
+
+def legacy_order_key(doc) -> tuple:
+    """Sort key of kustomize's legacy resource order (kind groups, then GVK, then id)."""
+    group, version = _group_version(doc)
+    kind = doc["kind"]
+    gvk = "_".join([group or "~G", version or "~V", kind or "~K"])
+    # ResId.LegacySortString, with its placeholders for a missing namespace or name
+    metadata = doc["metadata"]
+    resid = "|".join([gvk, metadata.get("namespace") or "~X", metadata.get("name") or "~N"])
+    return _TYPE_ORDER.get(kind, 0), gvk, resid
+
+
+def _kustomization_file(path: Path) -> Path:
+    found = [path / name for name in sorted(KUSTOMIZE_FILES) if (path / name).is_file()]
+    if len(found) != 1:
+        raise Unsupported(f"{len(found)} kustomization files in {path}")
+    return found[0]
+
+
+def _load_resources(file: Path, root: Path) -> list:
+    if not file.resolve().is_relative_to(root):
+        # kustomize only loads files from within the kustomization root
+        raise Unsupported(f"{file} is outside of {root}")
+    docs = []
+    with file.open("r") as f:
+        for doc in yaml.load_all(f, Loader=Loader):
+            if doc is None:
+                continue
+            if not isinstance(doc, dict):
+                raise Unsupported(f"non-mapping document in {file}")
+            metadata = doc.get("metadata")
+            if not (
+                isinstance(doc.get("apiVersion"), str)
+                and isinstance(doc.get("kind"), str)
+                and isinstance(metadata, dict)
+                and isinstance(metadata.get("name"), str)
+                and isinstance(metadata.get("namespace", ""), str)
+            ):
+                raise Unsupported(f"document without apiVersion, kind or name in {file}")
+            if doc["kind"].endswith("List"):
+                raise Unsupported(f"list document in {file}")
+            docs.append(doc)
+    return docs
+
+
+def _string_map(value, field: str) -> dict:
+    if not isinstance(value, dict) or not all(
+        isinstance(k, str) and isinstance(v, str) for k, v in value.items()
+    ):
+        raise Unsupported(f"{field} must map strings to strings")
+    return value
+
+
+def _set_fields(node, path: tuple, values: dict, create: bool):
+    """Merges values into the mapping at path, walking through lists on the way."""
+    if isinstance(node, list):
+        for item in node:
+            _set_fields(item, path, values, create)
+        return
+    if not isinstance(node, dict):
+        raise Unsupported(f"unexpected value on the way to {'/'.join(path)}")
+    key, rest = path[0], path[1:]
+    child = node.get(key)
+    if child is None:
+        if not create:
+            return
+        child = node[key] = {}
+    if rest:
+        _set_fields(child, rest, values, create)
+    elif isinstance(child, dict):
+        child.update(values)
+    else:
+        raise Unsupported(f"{key} is not a mapping")
+
+
+def _field_spec(doc):
+    spec = FIELD_SPECS.get(doc["kind"])
+    if spec is not None and _group_version(doc)[0] not in spec[0]:
+        raise Unsupported(f"{doc['apiVersion']} {doc['kind']} is not the built-in kind")
+    return spec
+
+
+def _check_label_fields(doc):
+    """Selector fields kustomize also updates, which are not reproduced here."""
+    if doc["kind"] == "StatefulSet" and (doc.get("spec") or {}).get("volumeClaimTemplates"):
+        raise Unsupported("StatefulSet volumeClaimTemplates")
+    pod = ((doc.get("spec") or {}).get("template") or {}).get("spec") or {}
+    if not isinstance(pod, dict):
+        raise Unsupported("unexpected pod template")
+    affinity = pod.get("affinity") or {}
+    if pod.get("topologySpreadConstraints") or (
+        isinstance(affinity, dict) and (affinity.get("podAffinity") or affinity.get("podAntiAffinity"))
+    ):
+        raise Unsupported("pod affinity and topology spread label selectors")
+
+
+def _transform(kustomization: dict, docs: list):
+    """Applies the kustomization's transformations in kustomize's order."""
+    namespace = kustomization.get("namespace")
+    if namespace is not None:
+        if not isinstance(namespace, str):
+            raise Unsupported("namespace must be a string")
+        for doc in docs:
+            if doc["kind"] in NAMESPACE_UNSUPPORTED:
+                raise Unsupported(f"namespace with a {doc['kind']}")
+            doc["metadata"]["namespace"] = namespace
+
+    prefix = kustomization.get("namePrefix") or ""
+    suffix = kustomization.get("nameSuffix") or ""
+    if prefix or suffix:
+        if not isinstance(prefix, str) or not isinstance(suffix, str):
+            raise Unsupported("namePrefix and nameSuffix must be strings")
+        for doc in docs:
+            if doc["kind"] in NAME_REFERENCE_TARGETS:
+                raise Unsupported(f"name references to a renamed {doc['kind']}")
+            doc["metadata"]["name"] = f"{prefix}{doc['metadata']['name']}{suffix}"
+
+    labels = kustomization.get("commonLabels")
+    if labels:
+        labels = _string_map(labels, "commonLabels")
+        for doc in docs:
+            _set_fields(doc, ("metadata", "labels"), labels, create=True)
+            spec = _field_spec(doc)
+            if spec is not None:
+                _check_label_fields(doc)
+                for path in spec[1]:
+                    _set_fields(doc, path, labels, create=True)
+                for path in spec[2]:
+                    _set_fields(doc, path, labels, create=False)
+
+    annotations = kustomization.get("commonAnnotations")
+    if annotations:
+        annotations = _string_map(annotations, "commonAnnotations")
+        for doc in docs:
+            _set_fields(doc, ("metadata", "annotations"), annotations, create=True)
+            spec = _field_spec(doc)
+            for path in spec[3] if spec else ():
+                _set_fields(doc, path, annotations, create=True)
+
+
+def _build(path: Path, visiting: frozenset) -> list:
+    if path in visiting:
+        raise Unsupported(f"cycle through {path}")
+    visiting = visiting | {path}
+
+    kustomization = yaml.load(_kustomization_file(path).read_text(), Loader=Loader) or {}
+    if not isinstance(kustomization, dict):
+        raise Unsupported("kustomization is not a mapping")
+    unsupported = set(kustomization) - SUPPORTED_FIELDS
+    if unsupported:
+        raise Unsupported(f"fields {sorted(unsupported)}")
+    if kustomization.get("kind", "Kustomization") != "Kustomization":
+        raise Unsupported(f"kind {kustomization.get('kind')}")
+
+    docs = []
+    resources = kustomization.get("resources") or []
+    if not isinstance(resources, list):
+        raise Unsupported("resources must be a list")
+    for entry in resources:
+        if not isinstance(entry, str) or "://" in entry or entry.startswith(("git@", "github.com/")):
+            raise Unsupported(f"resource {entry!r}")
+        target = path / entry
+        if target.is_dir():
+            docs.extend(_build(target.resolve(), visiting))
+        elif target.is_file():
+            docs.extend(_load_resources(target, path))
+        else:
+            raise Unsupported(f"missing resource {entry}")
+
+    _transform(kustomization, docs)
+
+    ids = set()
+    for doc in docs:
+        resid = (_group_version(doc)[0], doc["kind"], _namespace(doc), doc["metadata"]["name"])
+        if resid in ids:
+            raise Unsupported(f"duplicate resource {resid}")
+        ids.add(resid)
+    return docs
+
+
+def native_build(path: Path) -> list | None:
+    """
+    Builds the kustomization in path in-process. Returns its documents in
+    kustomize's output order, or None if the kustomize binary has to build it.
+    """
+    try:
+        docs = _build(path.resolve(), frozenset())
+    except Unsupported as e:
+        logger.info(f"Using kustomize in {path}, not supported natively: {e}")
+        return None
+    except (OSError, UnicodeDecodeError, yaml.YAMLError) as e:
+        # kustomize reports these in its own words
+        logger.info(f"Using kustomize in {path}, native build failed: {e}")
+        return None
+    return sorted(docs, key=legacy_order_key)
+
+
+def _comparable(docs) -> list[str]:
+    lines = []
+    for doc in docs:
+        if isinstance(doc, RawDocument):
+            doc = yaml.load(doc.to_yaml(), Loader=Loader)
+        if doc is not None:
+            lines.extend(["---", *yaml.dump(doc, Dumper=Dumper).splitlines()])
+    return lines
+
+
+def diff_builds(native: list, binary: list) -> str:
+    """Unified diff of a native build against kustomize's output, empty if they agree."""
+    return "\n".join(
+        difflib.unified_diff(
+            _comparable(binary), _comparable(native), "kustomize build", "native build", lineterm=""
+        )
+    )
@@ -0,0 +1,155 @@
+"""
+Resource budgets of a render: files scanned, bytes parsed, documents
+collected, a timeout per kustomize build and an overall deadline.
+Discovery and parsing charge the budget of the current render as they go,
+so a runaway input (a vendored tree pulled in by `include`, a huge generated
+file, a hung kustomize plugin) aborts the render early with LimitExceeded.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Budget of the render running in the current context, None when no limit is set
+_active: ContextVar["Budget | None"] = ContextVar("dependency_cmp_budget", default=None)
+
+
+class LimitExceeded(Exception):
+    """A render exceeded one of its limits. The message names the limit and where."""
+
+
+class Budget:
+    """Limits of one render, 0 meaning unlimited. Charged from several threads."""
+
+    def __init__(
+        self,
+        max_files: int = 0,
+        max_bytes: int = 0,
+        max_docs: int = 0,
+        kustomize_timeout: float = 0,
+        render_timeout: float = 0,
+    ):
+        self._lock = threading.Lock()
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_docs = max_docs
+        self.kustomize_timeout = kustomize_timeout
+        self.render_timeout = render_timeout
+        self.deadline = time.monotonic() + render_timeout if render_timeout else None
+        self.files = self.bytes = self.docs = 0
+
+    def charge(self, name: str, n: int, where):
+        limit = getattr(self, f"max_{name}")
+        if not limit:
+            return
+        with self._lock:
+            total = getattr(self, name) + n
+            setattr(self, name, total)
+        if total > limit:
+            raise LimitExceeded(f"more than {limit} {name} (CMP_MAX_{name.upper()}) at {where}")
+
+    def check_deadline(self, where):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise LimitExceeded(
+                f"render took longer than {self.render_timeout}s (CMP_RENDER_TIMEOUT_SECONDS) at {where}"
+            )
+
+    def timeout(self) -> float | None:
+        """Seconds a kustomize build may take: its own timeout, capped by the render deadline."""
+        timeouts = []
+        if self.kustomize_timeout:
+            timeouts.append(self.kustomize_timeout)
+        if self.deadline is not None:
+            timeouts.append(max(self.deadline - time.monotonic(), 0.0))
+        return min(timeouts) if timeouts else None
+
+    def fresh(self) -> "Budget":
+        """A budget with the same limits and deadline and nothing charged."""
+        budget = Budget(self.max_files, self.max_bytes, self.max_docs, self.kustomize_timeout)
+        budget.render_timeout = self.render_timeout
+        budget.deadline = self.deadline
+        return budget
+
+
+@contextmanager
+def limited(settings):
+    """Applies the limits of settings to the renders in this block, if any is set."""
+    limits = (
+        settings.max_files,
+        settings.max_bytes,
+        settings.max_docs,
+        settings.kustomize_timeout_seconds,
+        settings.render_timeout_seconds,
+    )
+    if not any(limits):
+        yield None
+        return
+    budget = Budget(*limits)
+    token = _active.set(budget)
+    try:
+        yield budget
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def separately():
+    """
+    Charges the block to a fresh copy of the current budget, for passes over
+    inputs that discovery reads again afterwards (e.g. fingerprinting them).
+    """
+    budget = _active.get()
+    if budget is None:
+        yield
+        return
+    token = _active.set(budget.fresh())
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+def charge(name: str, n: int, where):
+    """Adds n files, bytes or docs to the budget of the current render."""
+    budget = _active.get()
+    if budget is not None:
+        budget.charge(name, n, where)
+
+
+def check_deadline(where):
+    """Raises LimitExceeded once the current render is past its deadline."""
+    budget = _active.get()
+    if budget is not None:
+        budget.check_deadline(where)
+
+
+def kustomize_timeout() -> float | None:
+    budget = _active.get()
+    return budget.timeout() if budget is not None else None
+
+
+class MeteredStream:
+    """Wraps a binary stream, charging the bytes read to the budget as they arrive."""
+
+    def __init__(self, stream, where):
+        self.stream = stream
+        self.where = where
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        charge("bytes", len(data), self.where)
+        return data
+
+    def __iter__(self):
+        for line in self.stream:
+            charge("bytes", len(line), self.where)
+            yield line
+
+
+def metered(stream, where):
+    """stream, metered if the current render limits the bytes parsed."""
+    budget = _active.get()
+    if budget is None or not budget.max_bytes:
+        return stream
+    return MeteredStream(stream, where)
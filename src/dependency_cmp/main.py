@@ -1,24 +1,10 @@
 import logging
 import os
 import sys
+from contextlib import nullcontext
 from pathlib import Path
 
-from yaml import CDumper as Dumper
-from yaml import dump_all
-
-from dependency_cmp.discovery import collect_manifests_recursive
-from dependency_cmp.graph import process_dag
-
-# Import the new settings model
-from dependency_cmp.settings import PluginSettings
-
-# Initialize Settings (Loading Env Vars immediately)
-try:
-    settings = PluginSettings()
-except Exception as e:
-    # If config fails, we must print to stderr and exit non-zero
-    print(f"Configuration Error: {e}", file=sys.stderr)
-    sys.exit(1)
+from dependency_cmp.config import load_settings
 
 logging.basicConfig(
     stream=sys.stderr,
@@ -27,8 +13,52 @@ logging.basicConfig(
 )
 logger = logging.getLogger("dependency_cmp")
 
+OUTPUT_BUFFER_SIZE = 1024 * 1024  # Buffer size of the binary stdout writer
+
+
+def open_stdout():
+    """Opens stdout as a large-buffered binary stream for the manifest output."""
+    try:
+        return open(sys.stdout.fileno(), "wb", buffering=OUTPUT_BUFFER_SIZE, closefd=False)
+    except (AttributeError, OSError, ValueError):
+        # stdout was replaced (e.g. captured), fall back to its own buffer
+        return nullcontext(sys.stdout.buffer)
+
 
 def main():
+    # Initialize Settings (pydantic is only imported for unusual or invalid values)
+    try:
+        settings = load_settings()
+    except Exception as e:
+        # If config fails, we must print to stderr and exit non-zero
+        print(f"Configuration Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if sys.argv[1:2] == ["serve"]:
+        serve(settings)
+        return
+
+    if sys.argv[1:2] == ["batch"]:
+        from dependency_cmp.batch import run_batch
+
+        with open_stdout() as stdout:
+            code = run_batch(settings, sys.argv[2:], stdout)
+        sys.exit(code)
+
+    # Hand the render to a running render server, if configured
+    if settings.daemon_socket:
+        from dependency_cmp.daemon import request_render
+
+        with open_stdout() as stdout:
+            code = request_render(settings.daemon_socket, Path.cwd(), settings, stdout, sys.stderr)
+        if code is not None:
+            sys.exit(code)
+        logger.info("Rendering in-process")
+
+    # Heavy imports (yaml, ...) are only needed when rendering in this process
+    from dependency_cmp.render import render
+    from dependency_cmp.stats import instrumented
+
     try:
         # Log active configuration for debugging
         if settings.exclude_patterns:
@@ -38,21 +68,9 @@ def main():
         if settings.recurse:
             logger.info("Recursive search: Enabled")
 
-        cwd = Path.cwd()
-
-        # 1. Collect
-        manifests = collect_manifests_recursive(
-            cwd,
-            recurse=settings.recurse,
-            include=settings.include_patterns,
-            exclude=settings.exclude_patterns,
-        )
-
-        # 2. Process
-        final_manifests = process_dag(manifests)
-
-        # 3. Output
-        print(dump_all(final_manifests, Dumper=Dumper))
+        # Collect, process and output (or replay a cached render)
+        with open_stdout() as stdout, instrumented(settings):
+            render(Path.cwd(), settings, stdout)
 
     except Exception as e:
         logger.error(f"Unexpected Error: {e}")
@@ -62,5 +80,15 @@ def main():
         sys.exit(1)
 
 
+def serve(settings):
+    """`dependency_cmp serve`: runs the render server on CMP_DAEMON_SOCKET."""
+    from dependency_cmp.daemon import serve as serve_forever
+
+    if not settings.daemon_socket:
+        logger.error("CMP_DAEMON_SOCKET must be set to run the render server")
+        sys.exit(1)
+    serve_forever(settings.daemon_socket, settings.daemon_workers)
+
+
 if __name__ == "__main__":
     main()
@@ -1,50 +1,272 @@
+import fnmatch
+import re
+import sys
+
 # Constants moved from utils.py
 DEPENDS_ON_ANNOTATION = "argocd-dependency-cmp/depends-on"
 SYNC_WAVE_ANNOTATION = "argocd.argoproj.io/sync-wave"
 KUSTOMIZE_FILES = {"kustomization.yaml", "kustomization.yml", "Kustomization"}
 
 
+_KIND_LOWER = {}  # Kind -> interned lowercase Kind, shared by all keys
+
+
+def _intern(value):
+    """Interns strings so repeated apiVersions/Kinds share one object."""
+    return sys.intern(value) if type(value) is str else value
+
+
+def _lower_kind(kind):
+    """Returns the normalized Kind used for matching, None if Kind is not a string."""
+    if not isinstance(kind, str):
+        return None
+    lowered = _KIND_LOWER.get(kind)
+    if lowered is None:
+        lowered = _KIND_LOWER[kind] = sys.intern(kind.lower())
+    return lowered
+
+
 class ResourceKey:
     """Helper to manage unique resource identifiers and matching logic."""
 
-    def __init__(self, api_version, kind, name):
-        self.api_version = api_version
-        self.kind = kind
+    __slots__ = ("api_version", "kind", "name", "namespace", "labels", "id", "kind_lower")
+
+    def __init__(self, api_version, kind, name, namespace=None, labels=None):
+        self.api_version = _intern(api_version)
+        self.kind = _intern(kind)
         self.name = name
+        self.namespace = _intern(namespace) if namespace else None
+        self.labels = labels or {}
+        # Unique ID for the graph: apiVersion:Kind:Name, or apiVersion:Kind:Namespace/Name
+        if self.namespace:
+            self.id = f"{api_version}:{kind}:{namespace}/{name}"
+        else:
+            self.id = f"{api_version}:{kind}:{name}"
+        self.kind_lower = _lower_kind(kind)
 
-    @property
-    def id(self):
-        """Unique ID for the graph: apiVersion:Kind:Name"""
-        return f"{self.api_version}:{self.kind}:{self.name}"
+    def __eq__(self, other):
+        if not isinstance(other, ResourceKey):
+            return NotImplemented
+        return self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"ResourceKey({self.id!r})"
 
     def matches(self, dep_str):
         """
         Checks if this resource matches a dependency string.
-        Supported formats:
+        Supported formats (see parse_dependency):
         1. "Kind:Name" (Partial match)
         2. "apiVersion:Kind:Name" (Exact match)
+        Name can be namespace qualified and use globs, a label selector can follow.
         """
-        parts = dep_str.split(":")
+        dependency = parse_dependency(dep_str)
+        return dependency is not None and dependency.matches(self)
+
+
+_GLOB_CHARS = ("*", "?")
+
+
+def _pattern(value, lower=False):
+    """Returns a compiled glob for values with wildcards, the plain string otherwise."""
+    if lower:
+        value = value.lower()
+    if any(c in value for c in _GLOB_CHARS):
+        return re.compile(fnmatch.translate(value))
+    return value
+
+
+def _matches(pattern, value):
+    if type(pattern) is str:
+        return pattern == value
+    return isinstance(value, str) and pattern.match(value) is not None
+
 
-        if len(parts) == 2:
-            # Format: Kind:Name
-            req_kind, req_name = parts
-            return self.kind.lower() == req_kind.lower() and self.name == req_name
+def _parse_selector(selector):
+    """
+    Parses "key=value,key!=value,key,!key" into (key, operator, value) terms,
+    None if a term is malformed.
+    """
+    terms = []
+    for term in selector.split(","):
+        term = term.strip()
+        if "!=" in term:
+            key, value = term.split("!=", 1)
+            terms.append((key.strip(), "!=", value.strip()))
+        elif "=" in term:
+            key, value = term.split("=", 1)
+            terms.append((key.strip().rstrip("="), "=", value.strip().lstrip("=")))
+        elif term.startswith("!"):
+            terms.append((term[1:].strip(), "!", None))
+        else:
+            terms.append((term, "exists", None))
+        if not terms[-1][0]:
+            return None
+    return terms
 
-        elif len(parts) >= 3:
-            # Format: apiVersion:Kind:Name
-            # We assume the LAST two parts are Kind and Name. Everything before is apiVersion.
-            req_name = parts[-1]
-            req_kind = parts[-2]
-            req_api = ":".join(parts[:-2])
 
-            return (
-                self.kind.lower() == req_kind.lower()
-                and self.name == req_name
-                and self.api_version == req_api
-            )
+class Dependency:
+    """
+    A parsed depends-on entry. apiVersion and namespace are None when not
+    given (matching any); kind, namespace and name may be globs. A dependency
+    with globs or a label selector is a selector: it matches any number of
+    resources instead of exactly one.
+    """
 
-        return False
+    __slots__ = ("api_version", "kind", "namespace", "name", "labels", "selector")
+
+    def __init__(self, api_version, kind, namespace, name, labels=()):
+        self.api_version = api_version
+        self.kind = _pattern(kind, lower=True)
+        self.namespace = None if namespace is None else _pattern(namespace)
+        self.name = _pattern(name)
+        self.labels = labels
+        self.selector = bool(labels) or any(
+            type(p) is not str for p in (self.kind, self.namespace or "", self.name)
+        )
+
+    def matches(self, rkey):
+        if self.api_version is not None and rkey.api_version != self.api_version:
+            return False
+        if not _matches(self.kind, rkey.kind_lower) or not _matches(self.name, rkey.name):
+            return False
+        if self.namespace is not None and not _matches(self.namespace, rkey.namespace or ""):
+            return False
+        labels = rkey.labels
+        for key, operator, value in self.labels:
+            if operator == "=" and labels.get(key) != value:
+                return False
+            if operator == "!=" and labels.get(key) == value:
+                return False
+            if operator == "exists" and key not in labels:
+                return False
+            if operator == "!" and key in labels:
+                return False
+        return True
+
+
+def parse_dependency(dep_str):
+    """
+    Parses a dependency string:
+      Kind:Name                 any apiVersion
+      apiVersion:Kind:Name      exact apiVersion (may contain ':')
+    Name may be "namespace/name" ("/name" for cluster-scoped resources),
+    namespace, name and Kind may use * and ? wildcards, and a trailing
+    "[key=value,...]" label selector restricts the matches further
+    (e.g. "*:*[tier=db]"). Returns None for unsupported strings.
+    """
+    labels = ()
+    if dep_str.endswith("]") and "[" in dep_str:
+        dep_str, _, selector = dep_str[:-1].rpartition("[")
+        labels = _parse_selector(selector)
+        if labels is None:
+            return None
+
+    parts = dep_str.split(":")
+    if len(parts) == 2:
+        api_version = None
+    elif len(parts) >= 3:
+        api_version = ":".join(parts[:-2])
+    else:
+        return None
+
+    kind, target = parts[-2], parts[-1]
+    namespace = None
+    if "/" in target:
+        namespace, target = target.split("/", 1)
+    if not kind or not target:
+        return None
+    return Dependency(api_version, kind, namespace, target, labels)
+
+
+def split_dependencies(value):
+    """
+    Splits a depends-on annotation at commas and whitespace, except inside
+    label selector brackets.
+    """
+    deps, current, depth = [], [], 0
+    for char in value:
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth = max(depth - 1, 0)
+        elif depth == 0 and (char == "," or char.isspace()):
+            if current:
+                deps.append("".join(current))
+                current = []
+            continue
+        current.append(char)
+    if current:
+        deps.append("".join(current))
+    return deps
+
+
+class ResourceIndex:
+    """
+    Lookup tables over ResourceKeys so a dependency resolves from the most
+    selective index instead of calling ResourceKey.matches on every known
+    resource. Selectors start from their kind or a label, so one annotation
+    can fan in to thousands of resources cheaply.
+    """
+
+    def __init__(self, keys=()):
+        self.keys = []
+        self.by_kind_name = {}  # (kind.lower(), name) -> [ResourceKey]
+        self.by_api_kind_name = {}  # (apiVersion, kind.lower(), name) -> [ResourceKey]
+        self.by_kind = {}  # kind.lower() -> [ResourceKey]
+        self.by_label = {}  # (label key, value) -> [ResourceKey]
+        self.by_label_key = {}  # label key -> [ResourceKey]
+        for rkey in keys:
+            self.add(rkey)
+
+    def add(self, rkey):
+        # Dependency strings only ever hold str parts, other values can never match
+        if rkey.kind_lower is None or not isinstance(rkey.name, str):
+            return
+        kind = rkey.kind_lower
+        self.keys.append(rkey)
+        self.by_kind_name.setdefault((kind, rkey.name), []).append(rkey)
+        self.by_api_kind_name.setdefault((rkey.api_version, kind, rkey.name), []).append(rkey)
+        self.by_kind.setdefault(kind, []).append(rkey)
+        for key, value in rkey.labels.items():
+            if isinstance(key, str) and isinstance(value, str):
+                self.by_label.setdefault((key, value), []).append(rkey)
+                self.by_label_key.setdefault(key, []).append(rkey)
+
+    def _candidates(self, dependency):
+        """Smallest indexed list that contains every match of the dependency."""
+        kind, name = dependency.kind, dependency.name
+        if type(kind) is str and type(name) is str:
+            if dependency.api_version is None:
+                return self.by_kind_name.get((kind, name), [])
+            return self.by_api_kind_name.get((dependency.api_version, kind, name), [])
+
+        candidates = self.by_kind.get(kind, []) if type(kind) is str else self.keys
+        for key, operator, value in dependency.labels:
+            if operator == "=":
+                indexed = self.by_label.get((key, value), [])
+            elif operator == "exists":
+                indexed = self.by_label_key.get(key, [])
+            else:
+                continue
+            if len(indexed) < len(candidates):
+                candidates = indexed
+        return candidates
+
+    def lookup(self, dependency):
+        """
+        Returns all keys matching the dependency (a string or a parsed
+        Dependency), in insertion order. Same result as filtering the indexed
+        keys with ResourceKey.matches.
+        """
+        if isinstance(dependency, str):
+            dependency = parse_dependency(dependency)
+        if dependency is None:
+            return []
+        return [k for k in self._candidates(dependency) if dependency.matches(k)]
 
 
 def get_resource_key(doc):
@@ -53,4 +275,12 @@ def get_resource_key(doc):
     api_version = doc.get("apiVersion", "v1")
     metadata = doc.get("metadata") or {}
     name = metadata.get("name", "unnamed")
-    return ResourceKey(api_version, kind, name)
+    namespace = metadata.get("namespace")
+    labels = metadata.get("labels")
+    return ResourceKey(
+        api_version,
+        kind,
+        name,
+        namespace if isinstance(namespace, str) else None,
+        labels if isinstance(labels, dict) else None,
+    )
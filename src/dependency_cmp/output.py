@@ -0,0 +1,145 @@
+import base64
+import datetime
+import json
+import math
+from typing import BinaryIO
+
+import yaml
+from yaml import CDumper as Dumper
+from yaml import CLoader as Loader
+
+from dependency_cmp.rawdoc import RawDocument
+
+OUTPUT_FORMATS = ("yaml", "json")
+_JSON_OPTIONS = {"allow_nan": False, "ensure_ascii": False, "separators": (",", ":")}
+
+
+def write_yaml_stream(docs, out: BinaryIO):
+    """
+    Serializes documents one at a time to a binary stream.
+    libyaml flushes after every document, so only one document is held as
+    text at a time. The bytes are identical to print(dump_all(docs, Dumper=Dumper)).
+    RawDocuments are written as their original text with the metadata spliced in.
+    """
+    if any(isinstance(doc, RawDocument) for doc in docs):
+        _write_mixed_stream(docs, out)
+        return
+
+    dumper = Dumper(out, encoding="utf-8")
+    try:
+        dumper.open()
+        for doc in docs:
+            dumper.represent(doc)
+        dumper.close()
+    finally:
+        dumper.dispose()
+    # print() terminated the dump_all string with a newline
+    out.write(b"\n")
+
+
+def _write_mixed_stream(docs, out: BinaryIO):
+    """Same layout as dump_all: documents separated by '---' lines."""
+    for i, doc in enumerate(docs):
+        if isinstance(doc, RawDocument):
+            text = ("---\n" if i else "") + doc.to_yaml()
+        else:
+            # The dumper writes the marker itself, "--- {}" for flow style documents
+            text = yaml.dump(doc, Dumper=Dumper, explicit_start=bool(i))
+        out.write(text.encode())
+    out.write(b"\n")
+
+
+def _json_default(value):
+    """
+    YAML-only types the loader produces, as the YAML output spells them:
+    timestamps in isoformat, binary data base64 encoded, sets as mappings to null.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    if isinstance(value, set | frozenset):
+        return dict.fromkeys(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_key(key) -> str:
+    if isinstance(key, str):
+        return key
+    value = _jsonable(key)
+    return value if isinstance(value, str) else json.dumps(value, **_JSON_OPTIONS)
+
+
+def _sorted_keys(keys) -> list:
+    # Sorted like the YAML dumper sorts; mixed key types keep their order
+    try:
+        return sorted(keys)
+    except TypeError:
+        return list(keys)
+
+
+def _jsonable(value):
+    """Slow path of _json_default for whole documents: non-string keys and non-finite floats."""
+    if isinstance(value, dict):
+        return {_json_key(k): _jsonable(value[k]) for k in _sorted_keys(value)}
+    if isinstance(value, set | frozenset):
+        # Sets have no stable order of their own
+        try:
+            keys = sorted(value)
+        except TypeError:
+            keys = sorted(value, key=lambda k: (type(k).__name__, _json_key(k)))
+        return dict.fromkeys(map(_json_key, keys))
+    if isinstance(value, list | tuple):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return ".nan" if math.isnan(value) else (".inf" if value > 0 else "-.inf")
+    if isinstance(value, datetime.date | bytes):
+        return _json_default(value)
+    return value
+
+
+def _json_document(doc) -> bytes:
+    if isinstance(doc, RawDocument):
+        doc = yaml.load(doc.to_yaml(), Loader=Loader)
+    try:
+        text = json.dumps(doc, sort_keys=True, default=_json_default, **_JSON_OPTIONS)
+    except (TypeError, ValueError):
+        # Keys the encoder cannot sort or convert, NaN and infinity
+        text = json.dumps(_jsonable(doc), **_JSON_OPTIONS)
+    return text.encode() + b"\n"
+
+
+def write_json_stream(docs, out: BinaryIO):
+    """
+    Serializes documents as a stream of JSON objects, one per line.
+    Argo CD detects JSON output by its leading brace and decodes consecutive
+    objects. Keys are sorted like in the YAML output.
+    """
+    for doc in docs:
+        out.write(_json_document(doc))
+
+
+def write_stream(docs, out: BinaryIO, output_format: str = "yaml"):
+    """Writes documents in one of OUTPUT_FORMATS."""
+    if output_format == "json":
+        write_json_stream(docs, out)
+    else:
+        write_yaml_stream(docs, out)
+
+
+class TeeWriter:
+    """Binary stream that forwards every write to several streams."""
+
+    def __init__(self, *streams: BinaryIO):
+        self.streams = streams
+
+    def write(self, data) -> int:
+        for stream in self.streams:
+            stream.write(data)
+        return len(data)
+
+    def flush(self):
+        for stream in self.streams:
+            stream.flush()
@@ -0,0 +1,190 @@
+"""
+Parallel parsing of manifest files in a process pool.
+The files of a render are submitted up front (while kustomize builds run),
+grouped into tasks of about PARSE_TASK_BYTES; large multi-document files
+are split at document markers. Workers send the documents back marshalled
+(pickled if they hold other types, e.g. timestamps), which is much cheaper
+than parsing, and the documents are reassembled per file in order.
+Renders with less than CMP_PARSE_PARALLEL_MIN_BYTES to parse stay serial.
+"""
+
+import io
+import logging
+import marshal
+import mmap
+import multiprocessing
+import os
+import pickle
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from dependency_cmp.limits import charge
+from dependency_cmp.rawdoc import RawDocument, full_load, load_passthrough
+from dependency_cmp.stats import count
+
+logger = logging.getLogger("dependency_cmp")
+
+PARSE_TASK_BYTES = 1024 * 1024  # Bytes parsed per pool task, files above are split
+
+# Column 0 lines the split would change the meaning of: directives apply to the next
+# document, content after a marker makes load_passthrough fully parse the whole file
+_UNSPLITTABLE = re.compile(rb"^(?:%|---[ \t]+[^ \t\r\n#])", re.M)
+
+
+def split_ranges(data, task_bytes: int = PARSE_TASK_BYTES) -> list[tuple[int, int]]:
+    """
+    Splits a YAML stream into byte ranges of about task_bytes, each starting at
+    a document marker (or the start). Returns one range if it cannot be split.
+    """
+    size = len(data)
+    if size <= task_bytes or _UNSPLITTABLE.search(data):
+        return [(0, size)]
+    ranges = []
+    start = 0
+    pos = task_bytes
+    while pos < size:
+        marker = data.find(b"\n---", pos)
+        if marker == -1:
+            break
+        pos = marker + 4
+        if data[pos : pos + 1] not in (b"", b" ", b"\t", b"\r", b"\n"):
+            continue
+        ranges.append((start, marker + 1))
+        start = marker + 1
+        pos = start + task_bytes
+    ranges.append((start, size))
+    return ranges
+
+
+def _parse_range(path: str, start: int, end: int | None, passthrough: bool) -> list:
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read() if end is None else f.read(end - start)
+    # Decoded like parse_file's text mode file (encoding and newlines)
+    text = io.TextIOWrapper(io.BytesIO(data)).read()
+    return load_passthrough(text) if passthrough else full_load(text)
+
+
+def _encode(docs: list) -> bytes:
+    items = [(dict(d), d.text, d.metadata_span) if isinstance(d, RawDocument) else (d,) for d in docs]
+    try:
+        return b"m" + marshal.dumps(items)
+    except ValueError:
+        return b"p" + pickle.dumps(docs, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(payload: bytes) -> list:
+    if payload[:1] == b"p":
+        return pickle.loads(memoryview(payload)[1:])
+    items = marshal.loads(memoryview(payload)[1:])
+    return [RawDocument(*item) if len(item) == 3 else item[0] for item in items]
+
+
+def parse_task(ranges: list[tuple[str, int, int]], passthrough: bool) -> list[bytes | None]:
+    """Pool task: the encoded documents of each range, None where parsing failed."""
+    results = []
+    for path, start, end in ranges:
+        try:
+            results.append(_encode(_parse_range(path, start, end, passthrough)))
+        except Exception:
+            # Parsed again in the parent, which reports the error for the whole file
+            results.append(None)
+    return results
+
+
+class ParallelParser:
+    """Parses files in a process pool. parse(path) returns the documents of a submitted file."""
+
+    def __init__(self, passthrough: bool, workers: int):
+        self.passthrough = passthrough
+        context = multiprocessing.get_context("forkserver")
+        # Workers start from a server with the parser imported, not from a copy of this process
+        context.set_forkserver_preload(["dependency_cmp.parallel"])
+        self.pool = ProcessPoolExecutor(workers, mp_context=context)
+        self.futures = []
+        self.parts = {}  # path: [(task number, index in the task)] in file order
+
+    def __contains__(self, path: Path) -> bool:
+        return path in self.parts
+
+    def submit(self, files: list[tuple[Path, int]]):
+        task, task_size = [], 0
+        for path, size in files:
+            ranges = [(0, size)]
+            if size > PARSE_TASK_BYTES:
+                try:
+                    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        ranges = split_ranges(data)
+                except (OSError, ValueError):
+                    # Parsed in the parent, which reports the error
+                    continue
+            count("files")
+            count("bytes", size)
+            charge("bytes", size, path)
+
+            self.parts[path] = []
+            for start, end in ranges:
+                self.parts[path].append((len(self.futures), len(task)))
+                task.append((str(path), start, end))
+                task_size += end - start
+                if task_size >= PARSE_TASK_BYTES:
+                    self.futures.append(self.pool.submit(parse_task, task, self.passthrough))
+                    task, task_size = [], 0
+        if task:
+            self.futures.append(self.pool.submit(parse_task, task, self.passthrough))
+
+    def parse(self, path: Path) -> list:
+        docs = []
+        for task, index in self.parts.pop(path):
+            try:
+                payload = self.futures[task].result()[index]
+            except Exception as e:
+                # e.g. a worker killed for running out of memory
+                logger.warning(f"Parsing {path} serially, parse worker failed: {e}")
+                payload = None
+            if payload is None:
+                return _parse_range(str(path), 0, None, self.passthrough)
+            docs.extend(_decode(payload))
+        return docs
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def start_parser(paths: list[Path], passthrough: bool, file_cache, workers: int, min_bytes: int):
+    """
+    Submits the files in paths to a ParallelParser, skipping files the file
+    cache serves. None if the files are below min_bytes or workers is 1.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or not paths:
+        return None
+
+    files = []
+    for path in paths:
+        if file_cache is not None and file_cache.is_fresh(path):
+            continue
+        try:
+            files.append((path, os.stat(path).st_size))
+        except OSError:
+            continue
+    total = sum(size for _, size in files)
+    if not files or total < min_bytes:
+        logger.debug(f"Parsing {total} bytes serially, below the parallel threshold of {min_bytes}")
+        return None
+
+    workers = min(workers, len(files))
+    logger.info(f"Parsing {len(files)} files ({total} bytes) with {workers} processes")
+    parser = ParallelParser(passthrough, workers)
+    try:
+        parser.submit(files)
+    except (OSError, ImportError, NotImplementedError) as e:
+        # Pool processes are started on the first submit
+        logger.info(f"Parsing serially, cannot start a process pool: {e}")
+        parser.close()
+        return None
+    except BaseException:
+        parser.close()
+        raise
+    return parser
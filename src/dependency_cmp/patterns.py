@@ -0,0 +1,136 @@
+import fnmatch
+import re
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+
+# Joins path parts for matching. Parts can never contain NUL, so unlike "/"
+# it also works for the root part "/" of absolute paths.
+SEP = "\x00"
+
+
+def _translate_part(pattern: str) -> str:
+    """
+    Translates one glob path segment into a regex, following fnmatch rules.
+    Wildcards never cross SEP, so segments can be joined into one regex.
+    """
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c == "*":
+            # Collapse runs of stars
+            while i < n and pattern[i] == "*":
+                i += 1
+            out.append(f"[^{SEP}]*")
+        elif c == "?":
+            out.append(f"[^{SEP}]")
+        elif c == "[":
+            j = i
+            if j < n and pattern[j] == "!":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                out.append("\\[")
+            else:
+                # Let fnmatch handle ranges and negation, just forbid SEP
+                translated = _fnmatch_translate(pattern[i - 1 : j + 1])
+                out.append(f"(?!{SEP}){translated}")
+                i = j + 1
+        else:
+            out.append(re.escape(c))
+    return "".join(out)
+
+
+# fnmatch wraps its result as (?s:...)\Z
+_FNMATCH_WRAPPER = re.compile(r"\(\?s:(.*)\)\\[Zz]", re.S)
+
+
+def _fnmatch_translate(bracket: str) -> str:
+    """Returns the bare regex fnmatch generates for a single [...] expression."""
+    return _FNMATCH_WRAPPER.fullmatch(fnmatch.translate(bracket)).group(1)
+
+
+def _split_pattern(pattern: str):
+    """Splits a glob like Path.match does. Returns (anchored, parts)."""
+    parts = PurePosixPath(pattern).parts
+    if not parts:
+        raise ValueError("empty pattern")
+    return parts[0] == "/", parts
+
+
+class GlobMatcher:
+    """
+    Compiled form of a list of glob patterns with Path.match semantics:
+    relative patterns match from the right, absolute patterns match the whole path.
+    All patterns with the same number of segments share one combined regex,
+    so a lookup costs one regex call per distinct pattern length.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+
+        groups = {}  # (anchored, segment count) -> [regex]
+        self._anchored = []  # Per absolute pattern: compiled regex per segment
+        for pattern in self.patterns:
+            anchored, parts = _split_pattern(pattern)
+            translated = [_translate_part(part) for part in parts]
+            groups.setdefault((anchored, len(parts)), []).append(SEP.join(translated))
+            if anchored:
+                self._anchored.append([re.compile(t, re.S) for t in translated])
+
+        self._groups = [
+            (anchored, count, re.compile("|".join(f"(?:{r})" for r in regexes), re.S).fullmatch)
+            for (anchored, count), regexes in sorted(groups.items())
+        ]
+        self._has_relative = any(not anchored for anchored, _, _ in self._groups)
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    def __repr__(self):
+        return f"GlobMatcher({self.patterns!r})"
+
+    def match(self, path: Path) -> bool:
+        """Checks if path matches any of the patterns."""
+        parts = path.parts
+        total = len(parts)
+        for anchored, count, fullmatch in self._groups:
+            if anchored:
+                if total == count and fullmatch(SEP.join(parts)):
+                    return True
+            elif total >= count and fullmatch(SEP.join(parts[total - count :])):
+                return True
+        return False
+
+    def could_match_below(self, directory: Path) -> bool:
+        """
+        Checks if any path inside directory could still match.
+        Relative patterns can match at any depth, so only a matcher made of
+        absolute patterns can rule out a whole subtree.
+        """
+        if self._has_relative:
+            return True
+        parts = directory.parts
+        depth = len(parts)
+        for segments in self._anchored:
+            if len(segments) > depth and all(
+                segment.fullmatch(part) for segment, part in zip(segments, parts)
+            ):
+                return True
+        return False
+
+
+@lru_cache(maxsize=32)
+def _compile_cached(patterns: tuple[str, ...]) -> GlobMatcher:
+    return GlobMatcher(patterns)
+
+
+def compile_patterns(patterns) -> GlobMatcher:
+    """Returns a GlobMatcher for a pattern list, reusing compiled matchers."""
+    if isinstance(patterns, GlobMatcher):
+        return patterns
+    return _compile_cached(tuple(patterns or ()))
@@ -0,0 +1,60 @@
+"""
+Pre-scan of manifest files, so YAML that cannot hold Kubernetes objects
+(Helm values, CI configs, docs sites) is skipped before it is parsed.
+Files are searched as bytes through mmap, without decoding or parsing:
+
+  - lenient: skip files that mention neither `apiVersion` nor `kind`
+  - strict: skip files without a top-level `apiVersion:` and `kind:` key.
+    Flow style and JSON files (starting with `{` or `[`) are checked leniently.
+"""
+
+import mmap
+import os
+from pathlib import Path
+
+PREFILTER_MODES = ("off", "lenient", "strict")
+KEYS = (b"apiVersion", b"kind")
+HEAD_BYTES = 4096  # Bytes searched for the start of the first document
+
+_BOM = b"\xef\xbb\xbf"
+
+
+def _mentions(data, key: bytes) -> bool:
+    return data.find(key) != -1
+
+
+def _has_top_level_key(data, key: bytes, start: int) -> bool:
+    """Whether a line starts with key: (plain, single or double quoted)."""
+    for needle in (key + b":", b'"' + key + b'":', b"'" + key + b"':"):
+        if data[start : start + len(needle)] == needle or data.find(b"\n" + needle) != -1:
+            return True
+    return False
+
+
+def _is_flow(head: bytes) -> bool:
+    """Whether the first document is a flow mapping or sequence, e.g. JSON."""
+    for line in head.removeprefix(_BOM).splitlines():
+        line = line.strip()
+        if line and not line.startswith(b"#") and line != b"---":
+            return line[:1] in (b"{", b"[")
+    return False
+
+
+def might_contain_objects(path: Path, mode: str) -> bool:
+    """
+    Whether the file at path may hold Kubernetes objects and has to be parsed.
+    Unreadable files are kept, parsing them reports the error.
+    """
+    if mode == "off":
+        return True
+    try:
+        with path.open("rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return False
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if mode == "strict" and not _is_flow(data[:HEAD_BYTES]):
+                    start = len(_BOM) if data[: len(_BOM)] == _BOM else 0
+                    return all(_has_top_level_key(data, key, start) for key in KEYS)
+                return any(_mentions(data, key) for key in KEYS)
+    except (OSError, ValueError):
+        return True
@@ -0,0 +1,223 @@
+import re
+
+import yaml
+from yaml import CDumper as Dumper
+from yaml import CLoader as Loader
+
+# The only top-level fields process_dag reads or writes
+HEADER_KEYS = ("apiVersion", "kind", "metadata")
+
+# Lines starting at column 0. Indented lines (the bulk of big payloads) are
+# never looked at, the regex engine skips over them.
+_COLUMN0_LINE = re.compile(r"^[^ \t\r\n][^\r\n]*", re.M)
+
+# Simple or quoted mapping key at column 0, followed by its (single line) value
+_TOP_LEVEL_KEY = re.compile(
+    r"""([A-Za-z0-9_][\w.\-/]*|"[^"\\]*"|'[^']*')[ \t]*:(?:[ \t]+(.*))?"""
+)
+
+# Anchor (&name) and alias (*name) tokens. May also match inside scalars, which
+# only costs a full parse.
+ANCHOR_TOKEN = re.compile(r"(?:^|[\s\[{,])&[^\s\[\]{},]+", re.M)
+ALIAS_TOKEN = re.compile(r"(?:^|[\s\[{,])\*[^\s\[\]{},]+", re.M)
+
+
+def _has_anchors(text: str) -> bool:
+    return ("&" in text and ANCHOR_TOKEN.search(text) is not None) or (
+        "*" in text and ALIAS_TOKEN.search(text) is not None
+    )
+
+
+class RawDocument(dict):
+    """
+    A document kept as its original YAML text.
+    The dict only holds the header fields (apiVersion, kind, metadata) that
+    process_dag needs. On output, the metadata block is re-rendered from the
+    dict and spliced into the otherwise untouched text.
+    """
+
+    __slots__ = ("text", "metadata_span")
+
+    def __init__(self, header, text: str, metadata_span: tuple[int, int]):
+        super().__init__(header)
+        self.text = text
+        self.metadata_span = metadata_span
+
+    def __bool__(self):
+        # Unlike an empty dict, a document without header fields still has content
+        return True
+
+    def to_yaml(self) -> str:
+        start, end = self.metadata_span
+        block = ""
+        if "metadata" in self:
+            block = yaml.dump({"metadata": self["metadata"]}, Dumper=Dumper)
+        return self.text[:start] + block + self.text[end:]
+
+
+def full_load(text: str) -> list:
+    """Regular full parse, used whenever the fast path does not apply."""
+    return [d for d in yaml.load_all(text, Loader=Loader) if d is not None]
+
+
+def _closing_quote(value: str) -> int:
+    """Index of the quote closing the quoted scalar value starts with, -1 if unterminated."""
+    quote = value[0]
+    i = 1
+    while (i := value.find(quote, i)) != -1:
+        if quote == "'":
+            if value[i + 1 : i + 2] != "'":
+                return i
+            i += 2  # '' is an escaped quote
+        else:
+            backslashes = i - len(value[:i].rstrip("\\"))
+            if backslashes % 2 == 0:
+                return i
+            i += 1
+    return -1
+
+
+def _single_line_value(value: str | None) -> bool:
+    """
+    Rejects values that may continue on a column 0 line (unterminated quotes or
+    flow collections), where our line-based view of the document would break.
+    """
+    if not value:
+        return True
+    value = value.rstrip()
+    first = value[0]
+    if first in "\"'":
+        closing = _closing_quote(value)
+        return closing > 0 and (value[closing + 1 :].strip() or "#").startswith("#")
+    if first in "[{":
+        value = value.split(" #", 1)[0].rstrip()
+        return value.endswith("]" if first == "[" else "}")
+    return True
+
+
+def _section_end(chunk: str, start: int, end: int) -> int:
+    """Excludes trailing blank and column 0 comment lines from a key's section."""
+    lines = chunk[start:end].splitlines(keepends=True)
+    while len(lines) > 1 and (not lines[-1].strip() or lines[-1].startswith("#")):
+        lines.pop()
+    return start + sum(len(line) for line in lines)
+
+
+def _raw_document(chunk: str, keys: list[tuple[str, int]]):
+    """Builds a RawDocument from a chunk and its top-level keys, None if unsupported."""
+    if not chunk.endswith("\n"):
+        chunk += "\n"
+
+    sections = {}
+    for i, (name, start) in enumerate(keys):
+        if name not in HEADER_KEYS:
+            continue
+        if name in sections:
+            return None
+        end = keys[i + 1][1] if i + 1 < len(keys) else len(chunk)
+        sections[name] = (start, _section_end(chunk, start, end))
+
+    snippet = "".join(chunk[start:end] + "\n" for start, end in sections.values())
+    try:
+        header = yaml.load(snippet, Loader=Loader) if snippet else {}
+    except yaml.YAMLError:
+        return None
+    if not isinstance(header, dict):
+        return None
+
+    metadata_span = sections.get("metadata", (len(chunk), len(chunk)))
+    return RawDocument(header, chunk, metadata_span)
+
+
+def _unquote(key: str) -> str:
+    if key[0] == '"':
+        return key[1:-1]
+    if key[0] == "'":
+        return key[1:-1].replace("''", "'")
+    return key
+
+
+def load_passthrough(text: str) -> list:
+    """
+    Splits a YAML stream into documents without constructing them.
+    Block-style documents become RawDocuments; anything the line scanner cannot
+    handle safely (directives, flow or indented top-level nodes, multi-line
+    keys) is fully parsed instead, per document where possible.
+    """
+    if text.startswith("\ufeff"):
+        text = text[1:]
+
+    docs = []
+    chunk_start = 0
+    keys = []  # (key, offset in chunk) of the current document
+    supported = True
+
+    def finish(end):
+        chunk = text[chunk_start:end]
+        # An anchor in the re-rendered metadata block would be lost for its aliases
+        doc = _raw_document(chunk, keys) if supported and keys and not _has_anchors(chunk) else None
+        if doc is None:
+            docs.extend(full_load(chunk))
+        else:
+            docs.append(doc)
+
+    for match in _COLUMN0_LINE.finditer(text):
+        line = match.group()
+        if line.startswith(("---", "...")) and (len(line) == 3 or line[3] in " \t"):
+            if line[3:].strip() and not line[3:].strip().startswith("#"):
+                # Content after the marker ("--- !tag", "--- |")
+                return full_load(text)
+            finish(match.start())
+            chunk_start = match.end()
+            if text.startswith("\r\n", chunk_start):
+                chunk_start += 2
+            elif text.startswith("\n", chunk_start):
+                chunk_start += 1
+            keys = []
+            supported = True
+            continue
+        if line[0] == "%":
+            # Directives apply to the whole stream
+            return full_load(text)
+        if not supported or line[0] == "#":
+            continue
+        if line[0] == "-" and (len(line) == 1 or line[1] in " \t") and keys:
+            # Block sequence item of the previous key, indented by zero
+            continue
+
+        key = _TOP_LEVEL_KEY.fullmatch(line)
+        if key is None or not _single_line_value(key.group(2)):
+            supported = False
+            continue
+        keys.append((_unquote(key.group(1)), match.start() - chunk_start))
+
+    finish(len(text))
+    return docs
+
+
+def _document_marker(line: bytes) -> bool:
+    return line.startswith((b"---", b"...")) and line[3:4] in (b"", b" ", b"\t", b"\r", b"\n")
+
+
+def load_passthrough_stream(stream) -> list:
+    """
+    load_passthrough for a binary stream (e.g. a pipe), one document at a time.
+    Documents are split off as soon as the next marker line arrives, so the
+    whole output never has to be held as a single string. Streams the per
+    document split cannot handle (directives, content after a marker) are read
+    to the end and passed to load_passthrough as a whole.
+    """
+    docs = []
+    chunk = []
+    for line in stream:
+        if line.startswith(b"%") or (_document_marker(line) and line[3:].strip()[:1] not in (b"", b"#")):
+            chunk.append(line)
+            chunk.extend(stream)
+            break
+        if _document_marker(line) and chunk:
+            docs.extend(load_passthrough(b"".join(chunk).decode()))
+            chunk = []
+        chunk.append(line)
+    if chunk:
+        docs.extend(load_passthrough(b"".join(chunk).decode()))
+    return docs
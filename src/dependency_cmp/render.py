@@ -0,0 +1,204 @@
+import logging
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+from dependency_cmp.cache import DiskCache
+from dependency_cmp.discovery import collect_manifests_recursive
+from dependency_cmp.fingerprint import (
+    code_fingerprint,
+    content_fingerprint,
+    kustomize_inputs,
+    stat_fingerprint,
+    tool_fingerprint,
+)
+from dependency_cmp.graph import process_dag
+from dependency_cmp.limits import LimitExceeded, check_deadline, limited, separately
+from dependency_cmp.output import TeeWriter, write_stream
+from dependency_cmp.patterns import compile_patterns
+from dependency_cmp.spill import DocumentSpill
+from dependency_cmp.stats import count, stage
+
+logger = logging.getLogger("dependency_cmp")
+
+
+def _open_cache(directory: Path, max_bytes: int) -> DiskCache | None:
+    """A DiskCache in directory, None if it cannot be created (e.g. a read-only volume)."""
+    try:
+        return DiskCache(directory, max_bytes)
+    except OSError as e:
+        logger.warning(f"Not using cache in {directory}: {e}")
+        return None
+
+
+def render_manifests(path: Path, settings, out: BinaryIO):
+    """Runs the full pipeline for one app directory and streams the output to out."""
+    kustomize_cache = file_cache = None
+    if settings.cache_dir:
+        kustomize_cache = _open_cache(
+            Path(settings.cache_dir) / "kustomize", settings.kustomize_cache_max_bytes
+        )
+        if settings.file_cache_max_bytes:
+            file_cache = _open_cache(Path(settings.cache_dir) / "files", settings.file_cache_max_bytes)
+
+    spill = None
+    if settings.low_memory or settings.low_memory_threshold_bytes:
+        spill = DocumentSpill(0 if settings.low_memory else settings.low_memory_threshold_bytes)
+
+    try:
+        # 1. Collect
+        with stage("collect"):
+            manifests = collect_manifests_recursive(
+                path,
+                recurse=settings.recurse,
+                include=compile_patterns(settings.include_patterns),
+                exclude=compile_patterns(settings.exclude_patterns),
+                kustomize_workers=settings.kustomize_workers,
+                kustomize_cache=kustomize_cache,
+                passthrough=settings.passthrough,
+                file_cache=file_cache,
+                spill=spill,
+                kustomize_native=settings.kustomize_native,
+                prefilter=settings.prefilter,
+                parse_workers=settings.parse_workers,
+                parse_parallel_min_bytes=settings.parse_parallel_min_bytes,
+            )
+
+        # 2. Process
+        check_deadline("the dependency graph")
+        with stage("graph"):
+            final_manifests = process_dag(manifests, settings.wave_strategy)
+
+        # 3. Output
+        check_deadline("the output")
+        with stage("emit"):
+            write_stream(final_manifests, out, settings.output_format)
+    finally:
+        if spill is not None:
+            spill.close()
+
+
+class RenderCache:
+    """
+    Whole-render memoization on top of a DiskCache.
+    Outputs are stored under a content hash of all inputs. A second, cheap key
+    built from file stat data points to the content hash, so unchanged trees
+    are recognised without reading any file, and freshly checked out trees
+    (new mtimes, same content) still hit after one round of hashing.
+    """
+
+    def __init__(self, cache: DiskCache, path: Path, settings):
+        self.cache = cache
+        self.inputs = kustomize_inputs(path)
+        self.context = "\0".join(
+            [
+                "render",
+                code_fingerprint(),
+                tool_fingerprint("kustomize") or "-",
+                settings.model_dump_json(),
+            ]
+        )
+        self._stat_key = None
+        self._content_key = None
+
+    @property
+    def cacheable(self) -> bool:
+        return self.inputs is not None
+
+    def stat_key(self) -> str:
+        if self._stat_key is None:
+            self._stat_key = "stat-" + stat_fingerprint(self.inputs, self.context)
+        return self._stat_key
+
+    def content_key(self) -> str:
+        if self._content_key is None:
+            self._content_key = "out-" + content_fingerprint(self.inputs, self.context)
+        return self._content_key
+
+    def replay(self, out: BinaryIO) -> bool:
+        """Streams a previously rendered output to out. Returns False on a miss."""
+        alias = self.cache.get(self.stat_key())
+        if alias is not None and self.cache.copy_to(alias.decode(), out):
+            return True
+
+        if self.cache.copy_to(self.content_key(), out):
+            self._put_alias()
+            return True
+        return False
+
+    def _put_alias(self):
+        try:
+            self.cache.put(self.stat_key(), self.content_key().encode())
+        except OSError as e:
+            logger.warning(f"Could not store render output in cache: {e}")
+
+    @contextmanager
+    def recorder(self, out: BinaryIO):
+        """
+        Yields a stream that writes to out and records the output in the cache.
+        A failing cache (e.g. a full disk) is logged and discards the entry,
+        the output itself is always complete.
+        """
+        try:
+            writer = self.cache.writer(self.content_key())
+            entry = writer.__enter__()
+        except OSError as e:
+            logger.warning(f"Could not store render output in cache: {e}")
+            yield out
+            return
+
+        try:
+            yield TeeWriter(out, entry)
+        except BaseException:
+            # Deletes the incomplete entry
+            writer.__exit__(*sys.exc_info())
+            raise
+        try:
+            writer.__exit__(None, None, None)
+        except OSError as e:
+            logger.warning(f"Could not store render output in cache: {e}")
+            return
+        self._put_alias()
+
+
+def render(path: Path, settings, out: BinaryIO):
+    """
+    Renders an app directory to out. With a cache directory configured, identical
+    inputs (files, settings, plugin and kustomize build) reuse the previous output.
+    A render exceeding one of its limits (see limits) is aborted.
+    """
+    try:
+        with limited(settings):
+            _render(path, settings, out)
+    except LimitExceeded as e:
+        logger.error(f"Render aborted: {e}")
+        sys.exit(1)
+
+
+def _render(path: Path, settings, out: BinaryIO):
+    if not (settings.cache_dir and settings.render_cache_max_bytes):
+        render_manifests(path, settings, out)
+        return
+
+    cache = _open_cache(Path(settings.cache_dir) / "render", settings.render_cache_max_bytes)
+    if cache is None:
+        render_manifests(path, settings, out)
+        return
+
+    # Fingerprinting walks and hashes the inputs within the limits, but on a miss
+    # discovery reads them again, so it must not use up the budget of the render
+    with separately(), stage("render_cache"):
+        render_cache = RenderCache(cache, path, settings)
+        hit = render_cache.cacheable and render_cache.replay(out)
+    if not render_cache.cacheable:
+        logger.info("Render cache skipped: inputs cannot be fingerprinted")
+        render_manifests(path, settings, out)
+        return
+    if hit:
+        logger.info("Served output from render cache")
+        count("render_cache_hits")
+        return
+
+    with render_cache.recorder(out) as recording:
+        render_manifests(path, settings, recording)
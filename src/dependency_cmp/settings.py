@@ -1,31 +1,9 @@
-from typing import Annotated, Union
+from typing import Annotated, Literal, Union
 
 from pydantic import BeforeValidator, Field
 from pydantic_settings import BaseSettings
 
-
-def parse_argo_glob_list(v: str | list[str] | None) -> list[str]:
-    """
-    Parses Argo CD glob pattern strings into a python list.
-    Handles:
-      - None/Empty -> []
-      - "{a,b}" -> ["a", "b"]
-      - "a,b"   -> ["a", "b"]
-    """
-    if v is None:
-        return []
-    if isinstance(v, list):
-        return v
-
-    val = str(v).strip()
-    if not val:
-        return []
-
-    # Remove Argo-style braces if present
-    if val.startswith("{") and val.endswith("}"):
-        val = val[1:-1]
-
-    return [p.strip() for p in val.split(",") if p.strip()]
+from dependency_cmp.config import parse_argo_glob_list
 
 
 ArgoGlobList = Annotated[Union[str, list[str]], BeforeValidator(parse_argo_glob_list)]
@@ -34,6 +12,7 @@ ArgoGlobList = Annotated[Union[str, list[str]], BeforeValidator(parse_argo_glob_
 class PluginSettings(BaseSettings):
     """
     Configuration loaded from Environment Variables.
+    The fields are mirrored in config.FIELDS for the pydantic-free startup path.
     """
 
     # Prioritizes the Param from the Plugin UI (PARAM_DIRECTORY_RECURSE)
@@ -44,3 +23,99 @@ class PluginSettings(BaseSettings):
 
     # Matches 'directory.include' from plugin parameters
     include_patterns: ArgoGlobList = Field(default=[], validation_alias="PARAM_DIRECTORY_INCLUDE")
+
+    # Max concurrent `kustomize build` processes when an app has several kustomizations
+    kustomize_workers: int = Field(default=1, ge=1, validation_alias="CMP_KUSTOMIZE_WORKERS")
+
+    # Directory for persistent caches, caching is disabled when empty
+    cache_dir: str = Field(default="", validation_alias="CMP_CACHE_DIR")
+
+    # Size cap of the kustomize build cache, least recently used entries are evicted
+    kustomize_cache_max_bytes: int = Field(
+        default=256 * 1024 * 1024, ge=0, validation_alias="CMP_KUSTOMIZE_CACHE_MAX_BYTES"
+    )
+
+    # Size cap of the whole-render output cache, 0 disables it
+    render_cache_max_bytes: int = Field(
+        default=256 * 1024 * 1024, ge=0, validation_alias="CMP_RENDER_CACHE_MAX_BYTES"
+    )
+
+    # Size cap of the parsed manifest file cache, 0 disables it
+    file_cache_max_bytes: int = Field(
+        default=256 * 1024 * 1024, ge=0, validation_alias="CMP_FILE_CACHE_MAX_BYTES"
+    )
+
+    # Emit documents verbatim (only the metadata block is rewritten) instead of re-dumping them
+    passthrough: bool = Field(default=False, validation_alias="CMP_RAW_PASSTHROUGH")
+
+    # Sync wave placement: asap (earliest), alap (latest) or balanced (even wave sizes)
+    wave_strategy: Literal["asap", "alap", "balanced"] = Field(
+        default="asap", validation_alias="CMP_WAVE_STRATEGY"
+    )
+
+    # Matches the 'output-format' plugin parameter: yaml or json (one object per line)
+    output_format: Literal["yaml", "json"] = Field(default="yaml", validation_alias="PARAM_OUTPUT_FORMAT")
+
+    # Build simple kustomizations in-process: off, on, or verify (run both and log differences)
+    kustomize_native: Literal["off", "on", "verify"] = Field(
+        default="off", validation_alias="CMP_KUSTOMIZE_NATIVE"
+    )
+
+    # Skip files without Kubernetes objects before parsing: off, lenient or strict (see prefilter)
+    prefilter: Literal["off", "lenient", "strict"] = Field(default="off", validation_alias="CMP_PREFILTER")
+
+    # Parallel parsing, excluded from dumps as the output stays the same
+    # Processes parsing manifest files, 1 parses in-process, 0 for one per CPU
+    parse_workers: int = Field(default=1, ge=0, validation_alias="CMP_PARSE_WORKERS", exclude=True)
+
+    # Parse serially while the manifest files to parse add up to less than this
+    parse_parallel_min_bytes: int = Field(
+        default=8 * 1024 * 1024, ge=0, validation_alias="CMP_PARSE_PARALLEL_MIN_BYTES", exclude=True
+    )
+
+    # Low-memory mode, excluded from dumps as the output stays the same
+    # Keep documents in a memory-mapped temp file instead of in memory
+    low_memory: bool = Field(default=False, validation_alias="CMP_LOW_MEMORY", exclude=True)
+
+    # Switch to the low-memory mode once the process uses more memory than this, 0 disables it
+    low_memory_threshold_bytes: int = Field(
+        default=0, ge=0, validation_alias="CMP_LOW_MEMORY_THRESHOLD_BYTES", exclude=True
+    )
+
+    # Limits, 0 disables each. Excluded from dumps: a render within them has the same output
+    # Files listed in the directories scanned for manifests
+    max_files: int = Field(default=0, ge=0, validation_alias="CMP_MAX_FILES", exclude=True)
+
+    # Bytes of manifest files and kustomize output parsed
+    max_bytes: int = Field(default=0, ge=0, validation_alias="CMP_MAX_BYTES", exclude=True)
+
+    # Documents collected from files and kustomizations
+    max_docs: int = Field(default=0, ge=0, validation_alias="CMP_MAX_DOCS", exclude=True)
+
+    # Seconds one kustomize build may run before its process group is killed
+    kustomize_timeout_seconds: int = Field(
+        default=0, ge=0, validation_alias="CMP_KUSTOMIZE_TIMEOUT_SECONDS", exclude=True
+    )
+
+    # Seconds the whole render may take
+    render_timeout_seconds: int = Field(
+        default=0, ge=0, validation_alias="CMP_RENDER_TIMEOUT_SECONDS", exclude=True
+    )
+
+    # Instrumentation, excluded from dumps so it never changes cache keys
+    # Write a JSON summary of stage timings and counters to stderr
+    stats: bool = Field(default=False, validation_alias="CMP_STATS", exclude=True)
+
+    # Capture a cProfile or tracemalloc profile of the render
+    profile: Literal["", "cprofile", "tracemalloc"] = Field(
+        default="", validation_alias="CMP_PROFILE", exclude=True
+    )
+
+    # Profile output file, defaults to dependency-cmp-<pid>.<prof|tracemalloc> in the temp dir
+    profile_file: str = Field(default="", validation_alias="CMP_PROFILE_FILE", exclude=True)
+
+    # Unix socket of the render server (`dependency_cmp serve`), generate falls back to rendering in-process
+    daemon_socket: str = Field(default="", validation_alias="CMP_DAEMON_SOCKET", exclude=True)
+
+    # Max renders the server runs at a time
+    daemon_workers: int = Field(default=4, ge=1, validation_alias="CMP_DAEMON_WORKERS", exclude=True)
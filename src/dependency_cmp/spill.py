@@ -0,0 +1,220 @@
+"""
+Low-memory mode: documents are written to an anonymous temp file as YAML
+text, and only a compact header (the fields process_dag reads) stays in
+memory. On output, each document is read back through mmap, its metadata
+block is re-parsed, the computed sync-wave is injected and the block is
+spliced back into the untouched text.
+"""
+
+import logging
+import mmap
+import re
+import tempfile
+import threading
+import time
+
+import yaml
+from yaml import CDumper as Dumper
+from yaml import CLoader as Loader
+
+from dependency_cmp.models import DEPENDS_ON_ANNOTATION, SYNC_WAVE_ANNOTATION
+from dependency_cmp.rawdoc import ALIAS_TOKEN, ANCHOR_TOKEN, RawDocument
+from dependency_cmp.stats import count
+
+logger = logging.getLogger("dependency_cmp")
+
+CHECK_INTERVAL = 0.01  # Seconds between two reads of the process memory
+
+_METADATA_LINE = re.compile(r"^metadata:(?=[ \t\r\n]|$)", re.M)
+_COLUMN0_LINE = re.compile(r"^[^ \t\r\n]", re.M)
+
+
+def resident_bytes() -> int:
+    """
+    Resident memory of this process, without file-backed pages (such as the
+    mapped spill file), which the kernel can reclaim. The peak resident
+    memory where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            _, resident, shared = f.read().split()[:3]
+        return (int(resident) - int(shared)) * mmap.PAGESIZE
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class SpillFile:
+    """Append-only temp file, read back through a read-only memory map."""
+
+    def __init__(self):
+        # Unlinked right away, the space is freed even if the process is killed
+        self.file = tempfile.TemporaryFile(prefix="dependency-cmp-spill-")
+        self.size = 0
+        self._map = None
+        self._lock = threading.Lock()
+
+    def append(self, data: bytes) -> int:
+        """Writes data and returns its offset."""
+        with self._lock:
+            offset = self.size
+            self.file.write(data)
+            self.size += len(data)
+        return offset
+
+    def read(self, offset: int, length: int) -> bytes:
+        with self._lock:
+            if self._map is None or len(self._map) < offset + length:
+                self.file.flush()
+                if self._map is not None:
+                    self._map.close()
+                self._map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map[offset : offset + length]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self.file.close()
+
+
+class SpilledDocument(RawDocument):
+    """
+    A document stored in a SpillFile. The dict only holds apiVersion, kind and
+    the name, namespace, labels and depends-on annotation of the metadata.
+    """
+
+    __slots__ = ("spill", "offset", "length")
+
+    def __init__(self, header, spill: SpillFile, offset: int, length: int, metadata_span):
+        dict.__init__(self, header)
+        self.spill = spill
+        self.offset = offset
+        self.length = length
+        self.metadata_span = metadata_span
+
+    @property
+    def text(self) -> str:
+        return self.spill.read(self.offset, self.length).decode()
+
+    def to_yaml(self) -> str:
+        text = self.text
+        if "metadata" not in self:
+            return text
+
+        # The original metadata, plus the sync-wave process_dag injected
+        start, end = self.metadata_span
+        section = yaml.load(text[start:end], Loader=Loader) if start < end else None
+        metadata = (section or {}).get("metadata")
+        wave = ((self["metadata"] or {}).get("annotations") or {}).get(SYNC_WAVE_ANNOTATION)
+        if wave is not None:
+            if metadata is None:
+                metadata = {}
+            if metadata.get("annotations") is None:
+                metadata["annotations"] = {}
+            metadata["annotations"][SYNC_WAVE_ANNOTATION] = wave
+        block = yaml.dump({"metadata": metadata}, Dumper=Dumper)
+        return text[:start] + block + text[end:]
+
+
+def _compact_header(doc) -> dict:
+    header = {key: doc[key] for key in ("apiVersion", "kind") if key in doc}
+    if "metadata" not in doc:
+        return header
+    metadata = doc["metadata"]
+    if isinstance(metadata, dict):
+        compact = {key: metadata[key] for key in ("name", "namespace", "labels") if key in metadata}
+        annotations = metadata.get("annotations")
+        if isinstance(annotations, dict) and DEPENDS_ON_ANNOTATION in annotations:
+            compact["annotations"] = {DEPENDS_ON_ANNOTATION: annotations[DEPENDS_ON_ANNOTATION]}
+        metadata = compact
+    header["metadata"] = metadata
+    return header
+
+
+def _dumped_metadata_span(text: str) -> tuple[int, int]:
+    """Span of the top-level metadata key in yaml.dump output (sorted keys, block style)."""
+    match = _METADATA_LINE.search(text)
+    if match is None:
+        return len(text), len(text)
+    end = _COLUMN0_LINE.search(text, match.end())
+    return match.start(), end.start() if end else len(text)
+
+
+class DocumentSpill:
+    """
+    Collects documents, spilling them to a SpillFile once the process uses
+    more than `threshold` bytes of memory (from the start for 0). Documents
+    collected before the switch are moved on the next extend().
+    """
+
+    def __init__(self, threshold: int = 0):
+        self.threshold = threshold
+        self.docs = []
+        self.file = None
+        self._moved = False
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _active(self) -> bool:
+        """Whether documents are spilled, switching over once the threshold is hit."""
+        if self.file is not None:
+            return True
+        with self._lock:
+            if self.file is None:
+                if self.threshold:
+                    now = time.monotonic()
+                    if now < self._next_check:
+                        return False
+                    self._next_check = now + CHECK_INTERVAL
+                    resident = resident_bytes()
+                    if resident <= self.threshold:
+                        return False
+                    logger.info(
+                        f"Memory use of {resident} bytes above {self.threshold}, "
+                        "spilling documents to a temp file"
+                    )
+                self.file = SpillFile()
+        return True
+
+    def _spill(self, doc):
+        if isinstance(doc, SpilledDocument) or not doc or not isinstance(doc, dict):
+            # Empty documents are skipped by process_dag and stay as they are
+            return doc
+        if isinstance(doc, RawDocument):
+            text, span = doc.text, doc.metadata_span
+        else:
+            if not isinstance(doc.get("metadata", {}), dict | None):
+                return doc
+            # process_dag gives every document a metadata mapping, dump it at its sorted position
+            text = yaml.dump({**doc, "metadata": doc.get("metadata") or {}}, Dumper=Dumper)
+            span = _dumped_metadata_span(text)
+        start, end = span
+        if ANCHOR_TOKEN.search(text, start, end) or ALIAS_TOKEN.search(text):
+            # Re-dumping the metadata block would drop an anchor its aliases refer to
+            return doc
+        data = text.encode()
+        offset = self.file.append(data)
+        count("spilled_docs")
+        count("spilled_bytes", len(data))
+        return SpilledDocument(_compact_header(doc), self.file, offset, len(data), span)
+
+    def store(self, docs: list) -> list:
+        """Returns docs, spilled if the spill is active. Safe to call from threads."""
+        if not self._active():
+            return docs
+        return [self._spill(doc) for doc in docs]
+
+    def extend(self, docs: list):
+        """Appends documents to self.docs, in order."""
+        docs = self.store(docs)
+        if self.file is not None and not self._moved:
+            self.docs = self.store(self.docs)
+            self._moved = True
+        self.docs.extend(docs)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger("dependency_cmp")
+
+# Frames kept per allocation in tracemalloc captures
+TRACEMALLOC_FRAMES = 10
+
+# Collector of the render running in the current context, None when instrumentation is off
+_active: ContextVar["RenderStats | None"] = ContextVar("dependency_cmp_stats", default=None)
+
+
+class RenderStats:
+    """
+    Stage timings and counters of one render.
+    Stages can run several times and in several threads (e.g. concurrent
+    kustomize builds); their calls, wall and CPU times are summed up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.kustomize = []
+        self.reports = {}
+
+    def add_stage(self, name: str, wall: float, cpu: float):
+        with self._lock:
+            entry = self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0})
+            entry["calls"] += 1
+            entry["wall_s"] += wall
+            entry["cpu_s"] += cpu
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_kustomize(self, path, seconds: float, cached: bool):
+        with self._lock:
+            self.kustomize.append({"path": str(path), "wall_s": round(seconds, 6), "cached": cached})
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "stages": {
+                    name: {**entry, "wall_s": round(entry["wall_s"], 6), "cpu_s": round(entry["cpu_s"], 6)}
+                    for name, entry in self.stages.items()
+                },
+                "counters": dict(self.counters),
+                "kustomize": sorted(self.kustomize, key=lambda k: k["path"]),
+                **self.reports,
+            }
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times a block as a pipeline stage. CPU time is that of the running thread,
+    child processes (kustomize) are not included. No-op without instrumentation.
+    """
+    stats = _active.get()
+    if stats is None:
+        yield
+        return
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        stats.add_stage(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+
+def count(name: str, n: int = 1):
+    """Adds n to a counter of the current render."""
+    stats = _active.get()
+    if stats is not None:
+        stats.count(name, n)
+
+
+def record_kustomize(path, seconds: float, cached: bool):
+    """Records one kustomization build (or cache hit) of the current render."""
+    stats = _active.get()
+    if stats is not None:
+        stats.add_kustomize(path, seconds, cached)
+
+
+def enabled() -> bool:
+    """Whether the current render collects stats, to skip computing costly reports."""
+    return _active.get() is not None
+
+
+def report(name: str, value: dict):
+    """Adds a named section to the summary of the current render."""
+    stats = _active.get()
+    if stats is not None:
+        with stats._lock:
+            stats.reports[name] = value
+
+
+def _profile_file(settings) -> str:
+    if settings.profile_file:
+        return settings.profile_file
+    suffix = "prof" if settings.profile == "cprofile" else "tracemalloc"
+    return os.path.join(tempfile.gettempdir(), f"dependency-cmp-{os.getpid()}.{suffix}")
+
+
+@contextmanager
+def instrumented(settings, stream=None):
+    """
+    Collects stats for the renders in this block, if enabled in settings.
+    With CMP_STATS, a JSON summary is written to stream, stderr by default
+    (never stdout, which carries the manifests). With CMP_PROFILE, a cProfile stats file or a
+    tracemalloc snapshot is written to CMP_PROFILE_FILE.
+    """
+    if not settings.stats and not settings.profile:
+        yield
+        return
+
+    # Profilers are only imported when used, they are not needed at startup
+    import tracemalloc
+
+    stats = RenderStats()
+    token = _active.set(stats)
+    profiler = None
+    if settings.profile == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif settings.profile == "tracemalloc":
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    status = "error"
+    try:
+        yield stats
+        status = "ok"
+    finally:
+        summary = {
+            "status": status,
+            "wall_s": round(time.perf_counter() - wall, 6),
+            "cpu_s": round(time.process_time() - cpu, 6),
+        }
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        summary["children_cpu_s"] = round(
+            usage.ru_utime + usage.ru_stime - children.ru_utime - children.ru_stime, 6
+        )
+        # ru_maxrss is in KiB on Linux
+        summary["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        _active.reset(token)
+
+        # 1. Profiles
+        if settings.profile:
+            path = _profile_file(settings)
+            try:
+                if profiler is not None:
+                    profiler.disable()
+                    profiler.dump_stats(path)
+                else:
+                    summary["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.take_snapshot().dump(path)
+                summary["profile_file"] = path
+                logger.info(f"Wrote {settings.profile} profile to {path}")
+            except OSError as e:
+                logger.warning(f"Could not write profile to {path}: {e}")
+            finally:
+                if profiler is None:
+                    tracemalloc.stop()
+
+        # 2. Summary
+        if settings.stats:
+            summary.update(stats.summary())
+            print(json.dumps({"dependency_cmp_stats": summary}), file=stream or sys.stderr, flush=True)
@@ -0,0 +1,31 @@
+import io
+
+import pytest
+
+from dependency_cmp.config import EnvSettings
+from dependency_cmp.render import render
+
+
+@pytest.fixture
+def app(tmp_path):
+    """A Deployment depending on a Service. Test modules needing other manifests override it."""
+    app = tmp_path / "app"
+    app.mkdir()
+    (app / "db.yaml").write_text("apiVersion: v1\nkind: Service\nmetadata: {name: db}\n")
+    (app / "web.yaml").write_text(
+        "apiVersion: apps/v1\nkind: Deployment\nmetadata:\n  name: web\n"
+        "  annotations: {argocd-dependency-cmp/depends-on: 'Service:db'}\n"
+    )
+    return app
+
+
+@pytest.fixture
+def render_app():
+    """Renders an app recursively with the given settings, returning the output."""
+
+    def render_app(app, **settings) -> bytes:
+        out = io.BytesIO()
+        render(app, EnvSettings(recurse=True, **settings), out)
+        return out.getvalue()
+
+    return render_app
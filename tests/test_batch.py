@@ -0,0 +1,96 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from dependency_cmp.batch import load_apps, run_batch
+from dependency_cmp.config import EnvSettings
+
+SERVICE = "apiVersion: v1\nkind: Service\nmetadata: {name: db}\n"
+CYCLE = (
+    "apiVersion: v1\nkind: Service\nmetadata:\n  name: a\n"
+    "  annotations: {argocd-dependency-cmp/depends-on: 'Service:a2'}\n---\n"
+    "apiVersion: v1\nkind: Service\nmetadata:\n  name: a2\n"
+    "  annotations: {argocd-dependency-cmp/depends-on: 'Service:a'}\n"
+)
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "apps" / "web" / "nested").mkdir(parents=True)
+    (tmp_path / "apps" / "web" / "db.yaml").write_text(SERVICE)
+    (tmp_path / "apps" / "web" / "nested" / "cache.yaml").write_text(SERVICE.replace("db", "cache"))
+    (tmp_path / "apps" / "broken").mkdir()
+    (tmp_path / "apps" / "broken" / "cycle.yaml").write_text(CYCLE)
+    (tmp_path / "batch.yaml").write_text(
+        "apps:\n"
+        "  - path: apps/web\n    name: web-all\n    recurse: true\n    exclude: '{*/ignored/*}'\n"
+        "  - apps/web\n"
+        "  - path: apps/broken\n"
+    )
+    return tmp_path
+
+
+def batch(argv, settings=None):
+    stdout, stderr = io.BytesIO(), io.StringIO()
+    code = run_batch(settings or EnvSettings(), argv, stdout, stderr)
+    return code, stdout.getvalue(), stderr.getvalue()
+
+
+def read_frames(stream: bytes) -> dict:
+    frames = {}
+    while stream:
+        header, stream = stream.split(b"\n", 1)
+        header = json.loads(header)
+        frames[header["app"]] = (header["status"], stream[: header["bytes"]])
+        stream = stream[header["bytes"] :]
+    return frames
+
+
+def test_manifest_apps_and_options(repo):
+    apps = load_apps(repo / "batch.yaml", ["apps/web/nested"])
+
+    assert [app.name for app in apps] == ["apps_web_nested", "web-all", "apps_web", "apps_broken"]
+    assert apps[1].path == repo / "apps" / "web"
+    assert (apps[1].recurse, apps[1].exclude_patterns) == (True, ("*/ignored/*",))
+    assert (apps[2].recurse, apps[2].include_patterns) == (None, None)
+
+
+def test_duplicate_names_are_rejected(repo):
+    with pytest.raises(ValueError, match="duplicate app names"):
+        load_apps(repo / "batch.yaml", ["apps/web"])
+
+
+def test_failures_do_not_abort_the_batch(repo):
+    code, stdout, stderr = batch(["--manifest", "batch.yaml", "--workers", "2"])
+
+    assert code == 1
+    frames = read_frames(stdout)
+    assert list(frames) == ["web-all", "apps_web", "apps_broken"]
+    assert frames["web-all"][1].count(b"kind: Service") == 2
+    assert frames["apps_web"][1].count(b"kind: Service") == 1
+    assert frames["apps_broken"] == ("failed", b"")
+
+    assert "[apps_broken] ERROR: Cycle detected" in stderr
+    report = json.loads(stderr.splitlines()[-1])["dependency_cmp_batch"]
+    assert report["failed"] == ["apps_broken"]
+    assert [app["status"] for app in report["apps"]] == ["ok", "ok", "failed"]
+    assert all(app["wall_s"] >= 0 for app in report["apps"])
+
+
+def test_output_files_and_report(repo):
+    settings = EnvSettings(output_format="json", stats=True)
+    argv = ["apps/web", "apps/broken", "--output-dir", "out", "--report", "report.json"]
+    code, stdout, _ = batch(argv, settings)
+
+    assert code == 1
+    assert stdout == b""
+    assert sorted(path.name for path in Path("out").iterdir()) == ["apps_web.json"]
+    assert json.loads(Path("out/apps_web.json").read_text())["kind"] == "Service"
+
+    report = json.loads(Path("report.json").read_text())
+    assert report["apps"][0]["output"] == str(Path("out/apps_web.json"))
+    assert report["apps"][0]["stats"]["counters"]["docs"] == 1
+    assert "Cycle detected" in report["apps"][1]["errors"][0]
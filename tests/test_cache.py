@@ -0,0 +1,68 @@
+import io
+import os
+
+from dependency_cmp.cache import DiskCache
+
+
+def test_roundtrip(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1024)
+    assert cache.get("missing") is None
+
+    cache.put("key", b"payload")
+    assert cache.get("key") == b"payload"
+
+
+def test_corrupted_entry_is_discarded(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1024)
+    cache.put("key", b"payload")
+
+    entry = tmp_path / "key.bin"
+    entry.write_bytes(entry.read_bytes()[:-1] + b"X")
+
+    assert cache.get("key") is None
+    assert not entry.exists()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=250)
+    for i, key in enumerate(["old", "used", "new"]):
+        cache.put(key, bytes(40))
+        # Give each entry a distinct, increasing mtime
+        os.utime(tmp_path / f"{key}.bin", ns=(i * 10**9, i * 10**9))
+
+    # Reading "old" makes it the most recently used entry
+    assert cache.get("old") is not None
+    cache.put("newest", bytes(40))
+
+    assert cache.get("used") is None
+    assert cache.get("old") is not None
+    assert cache.get("newest") is not None
+
+
+def test_oversized_entries_are_not_stored(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=10)
+    cache.put("key", bytes(100))
+    assert cache.get("key") is None
+
+
+def test_copy_to_streams_payload(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1024)
+    with cache.writer("key") as f:
+        f.write(b"part1-")
+        f.write(b"part2")
+
+    out = io.BytesIO()
+    assert cache.copy_to("key", out)
+    assert out.getvalue() == b"part1-part2"
+    assert not cache.copy_to("missing", io.BytesIO())
+
+
+def test_copy_to_writes_nothing_for_corrupted_entry(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1024)
+    cache.put("key", b"payload")
+    entry = tmp_path / "key.bin"
+    entry.write_bytes(entry.read_bytes()[:-2])
+
+    out = io.BytesIO()
+    assert not cache.copy_to("key", out)
+    assert out.getvalue() == b""
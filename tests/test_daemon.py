@@ -0,0 +1,97 @@
+import io
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from dependency_cmp.config import EnvSettings
+from dependency_cmp.daemon import request_render
+from dependency_cmp.render import render
+
+
+@pytest.fixture
+def server(tmp_path):
+    socket_path = str(tmp_path / "cmp.sock")
+    env = {
+        **os.environ,
+        "CMP_DAEMON_SOCKET": socket_path,
+        "CMP_DAEMON_WORKERS": "1",
+        "PYTHONPATH": os.pathsep.join(sys.path),
+    }
+    proc = subprocess.Popen([sys.executable, "-m", "dependency_cmp.main", "serve"], env=env)
+    deadline = time.monotonic() + 10
+    while not os.path.exists(socket_path):
+        assert proc.poll() is None and time.monotonic() < deadline, "server did not start"
+        time.sleep(0.05)
+    yield socket_path
+    proc.terminate()
+    proc.wait(timeout=10)
+    assert not os.path.exists(socket_path)
+
+
+def request(socket_path, app, **settings):
+    out, err = io.BytesIO(), io.StringIO()
+    code = request_render(socket_path, app, EnvSettings(**settings), out, err)
+    return code, out.getvalue(), err.getvalue()
+
+
+def test_server_output_equals_in_process_render(server, app):
+    expected = io.BytesIO()
+    render(app, EnvSettings(), expected)
+
+    code, output, _ = request(server, app)
+    assert code == 0
+    assert output == expected.getvalue()
+
+
+def test_failures_are_reported_to_the_client(server, app):
+    (app / "db.yaml").write_text(
+        "apiVersion: v1\nkind: Service\nmetadata:\n  name: db\n"
+        "  annotations: {argocd-dependency-cmp/depends-on: 'Deployment:web'}\n"
+    )
+    code, _, stderr = request(server, app)
+    assert code == 1
+    assert "Cycle detected" in stderr
+
+
+def test_requests_beyond_the_worker_limit_wait(server, app):
+    results = [None] * 4
+
+    def run(i):
+        results[i] = request(server, app, recurse=bool(i % 2))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    assert [code for code, _, _ in results] == [0] * len(results)
+
+
+def test_unavailable_server_falls_back(tmp_path, app):
+    assert request(str(tmp_path / "missing.sock"), app) == (None, b"", "")
+
+
+def test_kustomize_runs_with_the_client_environment(server, tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    kustomize = bin_dir / "kustomize"
+    kustomize.write_text(
+        "#!/bin/sh\n"
+        "printf 'apiVersion: v1\\nkind: ConfigMap\\nmetadata: {name: env}\\ndata: {app: %s}\\n' \"$ARGOCD_APP_NAME\"\n"
+    )
+    kustomize.chmod(0o755)
+    app = tmp_path / "kustomize-app"
+    app.mkdir()
+    (app / "kustomization.yaml").write_text("resources: []\n")
+
+    # Set after the server started, so only the request carries them
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    for name in ["guestbook", "shop"]:
+        monkeypatch.setenv("ARGOCD_APP_NAME", name)
+        code, output, _ = request(server, app)
+        assert code == 0
+        assert f"app: {name}".encode() in output
@@ -1,6 +1,16 @@
+import os
+import sys
+import textwrap
+import time
 from pathlib import Path
 
+import pytest
+
+from dependency_cmp import discovery
+from dependency_cmp.cache import DiskCache
+from dependency_cmp.config import EnvSettings
 from dependency_cmp.discovery import collect_manifests_recursive
+from dependency_cmp.limits import LimitExceeded, limited
 
 
 # Helper to create dummy yaml files
@@ -10,6 +20,21 @@ def create_yaml(path: Path, filename: str, content="kind: ConfigMap"):
     return p
 
 
+@pytest.fixture
+def fake_kustomize(tmp_path, monkeypatch):
+    """Puts a kustomize script on PATH that runs the given Python body."""
+
+    def install(body: str):
+        bin_dir = tmp_path / "bin"
+        bin_dir.mkdir(exist_ok=True)
+        script = bin_dir / "kustomize"
+        script.write_text(f"#!{sys.executable}\nimport sys\n{textwrap.dedent(body)}")
+        script.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    return install
+
+
 def test_recurse_false_ignores_subdirs(tmp_path):
     # Setup: root file and subdir file
     create_yaml(tmp_path, "root.yaml")
@@ -136,3 +161,177 @@ def test_multiple_kustomizations_recursive(tmp_path, mocker):
     names = [doc["metadata"]["name"] for doc in results]
     assert "from-app1" in names
     assert "from-app2" in names
+
+
+def test_recursive_order_is_depth_first_and_sorted(tmp_path):
+    """Files of a directory come before its subdirectories, siblings sorted by name."""
+    for folder in ["b", "a/y", "a/x", "a/x/deep"]:
+        (tmp_path / folder).mkdir(parents=True, exist_ok=True)
+    for folder in ["", "b", "a", "a/y", "a/x", "a/x/deep"]:
+        name = folder.replace("/", "-") or "root"
+        create_yaml(tmp_path / folder, f"{name}.yaml", content=f"kind: ConfigMap\nname: {name}")
+
+    results = collect_manifests_recursive(tmp_path, recurse=True, include=[], exclude=[])
+
+    assert [doc["name"] for doc in results] == ["root", "a", "a-x", "a-x-deep", "a-y", "b"]
+
+
+def test_excluded_subtree_is_not_listed(tmp_path, mocker):
+    create_yaml(tmp_path, "root.yaml")
+    (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+    create_yaml(tmp_path / "node_modules" / "pkg", "ignored.yaml")
+
+    spy = mocker.spy(discovery, "list_directory")
+
+    results = collect_manifests_recursive(
+        tmp_path, recurse=True, include=[], exclude=["node_modules"]
+    )
+
+    assert len(results) == 1
+    assert [call.args[0] for call in spy.call_args_list] == [tmp_path]
+
+
+def test_concurrent_kustomize_builds_keep_order(tmp_path, mocker):
+    """Builds run in parallel, results are merged in discovery order."""
+    for name in ["app1", "app2", "app3"]:
+        (tmp_path / name).mkdir()
+        create_yaml(tmp_path / name, "kustomization.yaml")
+    create_yaml(tmp_path, "root.yaml", content="kind: ConfigMap\nmetadata: {name: root}")
+
+    running = []
+    peak = []
+
+    def side_effect(path):
+        running.append(path)
+        peak.append(len(running))
+        # Later directories finish first
+        time.sleep(0.05 * (4 - int(path.name[-1])))
+        running.remove(path)
+        return [{"kind": "ConfigMap", "metadata": {"name": f"from-{path.name}"}}]
+
+    mocker.patch("dependency_cmp.discovery.run_kustomize", side_effect=side_effect)
+
+    results = collect_manifests_recursive(
+        tmp_path, recurse=True, include=[], exclude=[], kustomize_workers=3
+    )
+
+    names = [doc["metadata"]["name"] for doc in results]
+    assert names == ["root", "from-app1", "from-app2", "from-app3"]
+    assert max(peak) > 1
+
+
+def test_concurrent_kustomize_failure_aborts(tmp_path, mocker):
+    for name in ["app1", "app2"]:
+        (tmp_path / name).mkdir()
+        create_yaml(tmp_path / name, "kustomization.yaml")
+
+    def side_effect(path):
+        if path.name == "app2":
+            sys.exit(1)
+        return []
+
+    mock_run = mocker.patch("dependency_cmp.discovery.run_kustomize", side_effect=side_effect)
+
+    with pytest.raises(SystemExit):
+        collect_manifests_recursive(
+            tmp_path, recurse=True, include=[], exclude=[], kustomize_workers=2
+        )
+    assert mock_run.call_count == 2
+
+
+def test_kustomize_output_is_cached(tmp_path, mocker):
+    app = tmp_path / "app"
+    app.mkdir()
+    create_yaml(app, "kustomization.yaml", content="resources: [cm.yaml]")
+    create_yaml(app, "cm.yaml")
+
+    mocker.patch("dependency_cmp.fingerprint.tool_fingerprint", return_value="kustomize:1")
+    mock_run = mocker.patch(
+        "dependency_cmp.discovery.run_kustomize", return_value=[{"kind": "Built"}]
+    )
+    cache = DiskCache(tmp_path / "cache", max_bytes=1024 * 1024)
+
+    for _ in range(2):
+        results = collect_manifests_recursive(
+            app, recurse=False, include=[], exclude=[], kustomize_cache=cache
+        )
+        assert results == [{"kind": "Built"}]
+    assert mock_run.call_count == 1
+
+    # Changing an input file invalidates the entry
+    create_yaml(app, "cm.yaml", content="kind: Secret")
+    collect_manifests_recursive(app, recurse=False, include=[], exclude=[], kustomize_cache=cache)
+    assert mock_run.call_count == 2
+
+
+def test_kustomize_output_is_parsed_while_streaming(tmp_path, fake_kustomize):
+    fake_kustomize(
+        """
+        for i in range(2000):
+            sys.stdout.write(f"kind: ConfigMap\\nmetadata:\\n  name: cm-{i}\\n---\\n")
+        sys.stderr.write("warning\\n" * 20000)
+        """
+    )
+
+    docs = [d for d in discovery.run_kustomize(tmp_path) if d is not None]
+    assert len(docs) == 2000
+    assert docs[-1]["metadata"]["name"] == "cm-1999"
+    assert [d["metadata"]["name"] for d in discovery.run_kustomize_raw(tmp_path)] == [
+        d["metadata"]["name"] for d in docs
+    ]
+
+
+def test_kustomize_failure_reports_stderr(tmp_path, fake_kustomize, caplog):
+    fake_kustomize(
+        """
+        sys.stdout.write("kind: ConfigMap\\nmetadata: {name: [\\n")
+        sys.stderr.write("noise\\n" * 20000 + "Error: accumulating resources\\n")
+        sys.exit(1)
+        """
+    )
+
+    with pytest.raises(SystemExit):
+        discovery.run_kustomize(tmp_path)
+    assert f"Kustomize failed in {tmp_path}" in caplog.text
+    assert "Error: accumulating resources" in caplog.text
+
+
+def test_kustomize_timeout_kills_process_group(tmp_path, fake_kustomize):
+    pid_file = tmp_path / "child.pid"
+    fake_kustomize(
+        f"""
+        import subprocess, time
+        child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+        open({str(pid_file)!r}, "w").write(str(child.pid))
+        sys.stdout.write("kind: ConfigMap\\n")
+        sys.stdout.flush()
+        time.sleep(60)
+        """
+    )
+
+    start = time.monotonic()
+    with limited(EnvSettings(kustomize_timeout_seconds=0.5)):
+        with pytest.raises(LimitExceeded, match="kustomize build took longer than 0.5s"):
+            discovery.run_kustomize(tmp_path)
+    assert time.monotonic() - start < 10
+
+    # The plugin kustomize started is gone too (or a zombie waiting for its new parent)
+    stat = Path(f"/proc/{pid_file.read_text()}/stat")
+    deadline = time.monotonic() + 5
+    while stat.exists() and stat.read_text().split(") ")[1][0] != "Z" and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not stat.exists() or stat.read_text().split(") ")[1][0] == "Z"
+
+
+def test_kustomize_output_counts_towards_max_bytes(tmp_path, fake_kustomize):
+    fake_kustomize(
+        """
+        for i in range(5000):
+            sys.stdout.write(f"kind: ConfigMap\\nmetadata:\\n  name: cm-{i}\\n---\\n")
+        """
+    )
+
+    for run in (discovery.run_kustomize, discovery.run_kustomize_raw):
+        with limited(EnvSettings(max_bytes=10_000)):
+            with pytest.raises(LimitExceeded, match=f"more than 10000 bytes .* at {tmp_path}"):
+                run(tmp_path)
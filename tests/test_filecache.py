@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from dependency_cmp import discovery
+from dependency_cmp.cache import DiskCache
+from dependency_cmp.discovery import collect_manifests_recursive
+from dependency_cmp.rawdoc import RawDocument
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = tmp_path / "app"
+    (app / "nested").mkdir(parents=True)
+    (app / "db.yaml").write_text("kind: Service\nmetadata: {name: db}\n---\nkind: Secret\n")
+    (app / "nested" / "web.yaml").write_text("kind: Deployment\nmetadata: {name: web}\n")
+    return app
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskCache(tmp_path / "cache", max_bytes=1024 * 1024)
+
+
+def collect(app, cache, passthrough=False):
+    return collect_manifests_recursive(
+        app, recurse=True, include=[], exclude=[], passthrough=passthrough, file_cache=cache
+    )
+
+
+def test_unchanged_files_are_not_parsed_again(app, cache, mocker):
+    first = collect(app, cache)
+    spy = mocker.spy(discovery, "parse_file")
+
+    assert collect(app, cache) == first
+    assert spy.call_count == 0
+
+    (app / "nested" / "web.yaml").write_text("kind: Deployment\nmetadata: {name: api}\n")
+    docs = collect(app, cache)
+    assert spy.call_count == 1
+    assert docs[-1]["metadata"]["name"] == "api"
+
+
+def test_touched_files_hit_by_content(app, cache, mocker):
+    first = collect(app, cache)
+    os.utime(app / "db.yaml", ns=(10**9, 10**9))
+    spy = mocker.spy(discovery, "parse_file")
+
+    assert collect(app, cache) == first
+    assert spy.call_count == 0
+
+
+def test_parsing_modes_are_cached_separately(app, cache):
+    full = collect(app, cache)
+    raw = collect(app, cache, passthrough=True)
+
+    assert not any(isinstance(doc, RawDocument) for doc in full)
+    assert all(isinstance(doc, RawDocument) for doc in raw)
+    assert raw == full
@@ -0,0 +1,51 @@
+import pytest
+
+from dependency_cmp.fingerprint import fingerprint_kustomization, kustomize_inputs
+
+FLAGS = ["--enable-alpha-plugins"]
+
+
+@pytest.fixture(autouse=True)
+def fake_kustomize(mocker):
+    return mocker.patch("dependency_cmp.fingerprint.tool_fingerprint", return_value="kustomize:1")
+
+
+def make_overlay(tmp_path):
+    base = tmp_path / "base"
+    overlay = tmp_path / "overlay"
+    base.mkdir()
+    overlay.mkdir()
+    (base / "kustomization.yaml").write_text("resources: [cm.yaml]")
+    (base / "cm.yaml").write_text("kind: ConfigMap")
+    (overlay / "kustomization.yaml").write_text("resources: [../base]")
+    return base, overlay
+
+
+def test_fingerprint_follows_local_bases(tmp_path):
+    base, overlay = make_overlay(tmp_path)
+
+    labels = [label for label, _, _ in kustomize_inputs(overlay)]
+    assert labels == [".", "../base"]
+
+    before = fingerprint_kustomization(overlay, FLAGS)
+    (base / "cm.yaml").write_text("kind: Secret")
+    assert fingerprint_kustomization(overlay, FLAGS) != before
+
+
+def test_fingerprint_depends_on_tool_and_flags(tmp_path, fake_kustomize):
+    _, overlay = make_overlay(tmp_path)
+    before = fingerprint_kustomization(overlay, FLAGS)
+
+    assert fingerprint_kustomization(overlay, []) != before
+    fake_kustomize.return_value = "kustomize:2"
+    assert fingerprint_kustomization(overlay, FLAGS) != before
+
+
+def test_remote_resources_and_plugins_are_not_cacheable(tmp_path):
+    (tmp_path / "kustomization.yaml").write_text(
+        "resources: [github.com/example/repo//base?ref=v1]"
+    )
+    assert fingerprint_kustomization(tmp_path, FLAGS) is None
+
+    (tmp_path / "kustomization.yaml").write_text("generators: [gen.yaml]")
+    assert fingerprint_kustomization(tmp_path, FLAGS) is None
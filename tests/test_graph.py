@@ -1,6 +1,9 @@
+import random
+from graphlib import TopologicalSorter
+
 import pytest
 
-from dependency_cmp.graph import process_dag
+from dependency_cmp.graph import DependencyGraph, process_dag
 
 
 def test_simple_dependency():
@@ -63,3 +66,170 @@ def test_cycle_detection():
 
     with pytest.raises(SystemExit):
         process_dag(manifests)
+
+
+def test_ambiguous_dependency_exits(caplog):
+    manifests = [
+        {"apiVersion": "v1", "kind": "Service", "metadata": {"name": "db"}},
+        {"apiVersion": "example.com/v1", "kind": "Service", "metadata": {"name": "db"}},
+        {
+            "apiVersion": "apps/v1",
+            "kind": "Deployment",
+            "metadata": {
+                "name": "app",
+                "annotations": {"argocd-dependency-cmp/depends-on": "Service:db"},
+            },
+        },
+    ]
+
+    with pytest.raises(SystemExit):
+        process_dag(manifests)
+
+    assert "Ambiguous dependency 'Service:db'" in caplog.text
+
+
+def manifest(kind, name, namespace=None, labels=None, depends_on=None):
+    metadata = {"name": name}
+    if namespace:
+        metadata["namespace"] = namespace
+    if labels:
+        metadata["labels"] = labels
+    if depends_on:
+        metadata["annotations"] = {"argocd-dependency-cmp/depends-on": depends_on}
+    return {"apiVersion": "v1", "kind": kind, "metadata": metadata}
+
+
+def waves_by_id(processed):
+    return {
+        (m["metadata"].get("namespace"), m["metadata"]["name"]): m["metadata"]["annotations"][
+            "argocd.argoproj.io/sync-wave"
+        ]
+        for m in processed
+    }
+
+
+def test_same_name_in_other_namespaces_resolves_locally():
+    manifests = [
+        manifest("Service", "db", "prod"),
+        manifest("Service", "db", "dev"),
+        manifest("Deployment", "app", "dev", depends_on="Service:db"),
+        manifest("Deployment", "report", "prod", depends_on="Service:dev/db"),
+    ]
+    waves = waves_by_id(process_dag(manifests))
+
+    assert waves[("dev", "app")] == "1"
+    assert waves[("prod", "report")] == "1"
+    assert waves[("prod", "db")] == waves[("dev", "db")] == "0"
+
+
+def test_selector_depends_on_every_match_but_itself():
+    manifests = [
+        manifest("ConfigMap", "settings", "prod", labels={"tier": "config"}),
+        manifest("Job", "migrate", "prod", labels={"tier": "config"}, depends_on="*:*[tier=config]"),
+        manifest("Deployment", "web", "prod", depends_on="Job:migrate, *:*[tier=config]"),
+        manifest("Deployment", "worker", "prod", depends_on="*:*[tier=none]"),
+    ]
+    waves = waves_by_id(process_dag(manifests))
+
+    assert waves[("prod", "settings")] == "0"
+    assert waves[("prod", "migrate")] == "1"
+    assert waves[("prod", "web")] == "2"
+    assert waves[("prod", "worker")] == "0"
+
+
+def test_dependency_graph_matches_topological_sorter():
+    """Single-pass waves equal the get_ready()/done() layering of graphlib."""
+    rng = random.Random(42)
+    graph = DependencyGraph()
+    predecessors = {}
+    for node in range(300):
+        graph.add_node(f"n{node}")
+        deps = set(rng.sample(range(node), min(node, rng.randint(0, 4))))
+        predecessors[f"n{node}"] = {f"n{d}" for d in deps}
+        for dep in deps:
+            graph.add_edge(node, dep)
+
+    expected = {}
+    sorter = TopologicalSorter(predecessors)
+    sorter.prepare()
+    wave = 0
+    while sorter.is_active():
+        ready = sorter.get_ready()
+        for node in ready:
+            expected[node] = wave
+        sorter.done(*ready)
+        wave += 1
+
+    assert dict(zip(graph.ids, graph.waves())) == expected
+
+
+def test_dependency_graph_reports_cycle():
+    graph = DependencyGraph()
+    a, b, c = (graph.add_node(n) for n in "abc")
+    graph.add_edge(b, a)
+    graph.add_edge(c, b)
+    graph.add_edge(b, c)
+
+    with pytest.raises(ValueError) as excinfo:
+        graph.waves()
+
+    message, cycle = excinfo.value.args
+    assert message == "nodes are in a cycle"
+    assert cycle[0] == cycle[-1]
+    assert sorted(cycle[:-1]) == ["b", "c"]
+
+
+def random_graph(seed=7, size=300):
+    rng = random.Random(seed)
+    graph = DependencyGraph()
+    edges = []
+    for node in range(size):
+        graph.add_node(f"n{node}")
+        for dep in rng.sample(range(node), min(node, rng.randint(0, 3))):
+            graph.add_edge(node, dep)
+            edges.append((node, dep))
+    return graph, edges
+
+
+@pytest.mark.parametrize("strategy", ["asap", "alap", "balanced"])
+def test_wave_strategies_respect_dependencies(strategy):
+    graph, edges = random_graph()
+    waves = graph.waves(strategy)
+
+    assert all(waves[dependent] > waves[dependency] for dependent, dependency in edges)
+    assert max(waves) == max(graph.waves("asap"))
+
+
+def test_alap_syncs_independent_resources_last():
+    graph = DependencyGraph()
+    db, app, web, standalone = (graph.add_node(n) for n in ["db", "app", "web", "standalone"])
+    graph.add_edge(app, db)
+    graph.add_edge(web, app)
+
+    assert list(graph.waves("asap")) == [0, 1, 2, 0]
+    assert list(graph.waves("alap")) == [0, 1, 2, 2]
+
+
+def test_balanced_evens_out_wave_sizes():
+    graph, _ = random_graph()
+
+    def widest(waves):
+        return max(list(waves).count(w) for w in set(waves))
+
+    assert widest(graph.waves("balanced")) < widest(graph.waves("asap"))
+
+
+def test_wave_report_is_logged(caplog):
+    manifests = [
+        {"kind": "Service", "metadata": {"name": "db"}},
+        {"kind": "ConfigMap", "metadata": {"name": "flags"}},
+        {
+            "kind": "Deployment",
+            "metadata": {"name": "web", "annotations": {"argocd-dependency-cmp/depends-on": "Service:db"}},
+        },
+    ]
+    caplog.set_level("INFO", logger="dependency_cmp")
+    process_dag(manifests, strategy="alap")
+
+    assert "2 waves (alap), critical path: v1:Service:db -> v1:Deployment:web" in caplog.text
+    assert "widest wave 1 (2 resources), narrowest wave 0 (1 resources)" in caplog.text
@@ -0,0 +1,172 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+import yaml
+
+from dependency_cmp import discovery
+from dependency_cmp.kustomize import diff_builds, native_build
+from dependency_cmp.rawdoc import load_passthrough
+
+FIXTURES = Path(__file__).parent / "kustomize-fixtures"
+CASES = ["labels", "prefix", "ordering", "mixed-scope", "overlay/prod"]
+
+
+def write(path: Path, text: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def by_kind(docs):
+    return {doc["kind"]: doc for doc in docs}
+
+
+def test_labels_annotations_and_namespace():
+    docs = by_kind(native_build(FIXTURES / "labels"))
+    label = {"app.kubernetes.io/part-of": "shop"}
+
+    api = docs["Deployment"]
+    assert api["metadata"]["namespace"] == "shop"
+    assert api["metadata"]["labels"] == label
+    assert api["metadata"]["annotations"]["team"] == "payments"
+    assert api["spec"]["selector"]["matchLabels"] == {"app": "api", **label}
+    assert api["spec"]["template"]["metadata"]["labels"] == {"app": "api", **label}
+    assert api["spec"]["template"]["metadata"]["annotations"] == {"team": "payments"}
+
+    assert docs["Service"]["spec"]["selector"] == {"app": "db", **label}
+    job_template = docs["CronJob"]["spec"]["jobTemplate"]
+    assert job_template["metadata"]["labels"] == label
+    assert job_template["spec"]["template"]["metadata"]["labels"] == label
+    assert "selector" not in job_template["spec"]
+
+
+def test_label_selectors_are_only_updated_where_present():
+    docs = by_kind(native_build(FIXTURES / "labels"))
+    policy = docs["NetworkPolicy"]
+    assert policy["spec"]["ingress"][0]["from"] == [
+        {"podSelector": {"matchLabels": {"app": "web", "app.kubernetes.io/part-of": "shop"}}},
+        {"namespaceSelector": {}},
+    ]
+    assert docs["Widget"]["spec"] == {"size": 3}
+
+
+def test_name_prefix_and_suffix():
+    docs = native_build(FIXTURES / "prefix")
+    assert [doc["metadata"]["name"] for doc in docs] == ["team-gadget-v2", "team-default-deny-v2"]
+    assert docs[0]["metadata"]["namespace"] == "tools"
+
+
+def test_legacy_order():
+    docs = native_build(FIXTURES / "ordering")
+    assert [(doc["kind"], doc["apiVersion"], doc["metadata"]["name"]) for doc in docs] == [
+        ("Namespace", "v1", "shop"),
+        ("ClusterRole", "rbac.authorization.k8s.io/v1", "reader"),
+        ("ConfigMap", "v1", "settings"),
+        ("Deployment", "apps/v1", "web"),
+        ("Widget", "example.com/v1", "a"),
+        ("Widget", "example.com/v1", "b"),
+        ("Widget", "example.com/v1alpha1", "a"),
+        ("ValidatingWebhookConfiguration", "admissionregistration.k8s.io/v1", "hook"),
+    ]
+
+
+def test_legacy_order_of_namespaced_and_cluster_scoped_resources():
+    # Within a GVK, ids without a namespace sort with kustomize's "~X" placeholder
+    docs = native_build(FIXTURES / "mixed-scope")
+    assert [(doc["metadata"].get("namespace"), doc["metadata"]["name"]) for doc in docs] == [
+        ("default", "beta"),
+        ("mid", "alpha"),
+        ("mid", "zeta"),
+        (None, "alpha"),
+        (None, "zeta"),
+    ]
+
+
+def test_nested_kustomizations():
+    docs = native_build(FIXTURES / "overlay" / "prod")
+    assert [(doc["kind"], doc["metadata"]["namespace"]) for doc in docs] == [
+        ("ConfigMap", "prod"),
+        ("Service", "prod"),
+    ]
+    service = docs[1]
+    assert service["metadata"]["labels"] == {"layer": "base"}
+    assert service["metadata"]["annotations"] == {"stage": "prod"}
+    assert service["spec"]["selector"] == {"app": "web", "layer": "base"}
+
+
+@pytest.mark.parametrize(
+    "kustomization,resources",
+    [
+        ("configMapGenerator: [{name: a, literals: [a=b]}]\n", ""),
+        ("resources: [https://example.com/app.yaml]\n", ""),
+        ("resources: [missing.yaml]\n", ""),
+        ("resources: [../outside.yaml]\n", ""),
+        ("namespace: a\n", "apiVersion: v1\nkind: Namespace\nmetadata: {name: a}\n"),
+        ("namePrefix: a-\n", "apiVersion: v1\nkind: ConfigMap\nmetadata: {name: a}\n"),
+        ("commonLabels: {a: b}\n", "apiVersion: example.com/v1\nkind: Deployment\nmetadata: {name: a}\n"),
+        ("commonLabels: {a: 1}\n", "apiVersion: v1\nkind: ConfigMap\nmetadata: {name: a}\n"),
+        (
+            "commonLabels: {a: b}\n",
+            (
+                "apiVersion: apps/v1\nkind: StatefulSet\nmetadata: {name: a}\n"
+                "spec: {volumeClaimTemplates: [{metadata: {name: data}}]}\n"
+            ),
+        ),
+        ("", "apiVersion: v1\nkind: List\nmetadata: {name: a}\nitems: []\n"),
+        ("", "apiVersion: v1\nkind: ConfigMap\ndata: {}\n"),
+        (
+            "",
+            (
+                "apiVersion: v1\nkind: ConfigMap\nmetadata: {name: a}\n"
+                "---\napiVersion: v1\nkind: ConfigMap\nmetadata: {name: a, namespace: default}\n"
+            ),
+        ),
+    ],
+)
+def test_unsupported_kustomizations_fall_back(tmp_path, kustomization, resources):
+    app = tmp_path / "app"
+    write(app / "kustomization.yaml", kustomization + ("resources: [r.yaml]\n" if resources else ""))
+    write(app / "r.yaml", resources)
+    write(tmp_path / "outside.yaml", "apiVersion: v1\nkind: ConfigMap\nmetadata: {name: a}\n")
+    assert native_build(app) is None
+
+
+def test_resource_cycles_fall_back(tmp_path):
+    write(tmp_path / "a" / "kustomization.yaml", "resources: [../b]\n")
+    write(tmp_path / "b" / "kustomization.yaml", "resources: [../a]\n")
+    assert native_build(tmp_path / "a") is None
+
+
+def test_diff_builds_normalises_raw_documents():
+    native = [{"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": "a"}}]
+    binary = load_passthrough("kind: ConfigMap\napiVersion: v1\nmetadata:\n  name: a\n---\n")
+    assert diff_builds(native, binary) == ""
+    assert "+  name: b" in diff_builds([{**native[0], "metadata": {"name": "b"}}], binary)
+
+
+@pytest.mark.parametrize("mode", ["on", "verify"])
+def test_build_kustomization_native_modes(mocker, mode):
+    kustomize_docs = [{"kind": "FromKustomize"}]
+    run = mocker.patch("dependency_cmp.discovery.run_kustomize", return_value=kustomize_docs)
+    warning = mocker.patch.object(discovery.logger, "warning")
+
+    docs = discovery.build_kustomization(FIXTURES / "prefix", native=mode)
+
+    if mode == "on":
+        assert run.call_count == 0
+        assert docs[0]["metadata"]["name"] == "team-gadget-v2"
+    else:
+        run.assert_called_once()
+        assert docs == kustomize_docs
+        assert "differs from kustomize" in warning.call_args.args[0]
+
+
+@pytest.mark.skipif(shutil.which("kustomize") is None, reason="kustomize is not installed")
+@pytest.mark.parametrize("case", CASES)
+def test_conformance_with_kustomize(case):
+    """The native build matches `kustomize build` on every fixture."""
+    path = FIXTURES / case
+    result = subprocess.run(["kustomize", "build", str(path)], capture_output=True, check=True, text=True)
+    binary = [doc for doc in yaml.safe_load_all(result.stdout) if doc is not None]
+    assert diff_builds(native_build(path), binary) == ""
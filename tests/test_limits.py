@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+from dependency_cmp import discovery
+from dependency_cmp.limits import Budget, LimitExceeded
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = tmp_path / "app"
+    (app / "b").mkdir(parents=True)
+    (app / "a.yaml").write_text(
+        "kind: ConfigMap\nmetadata: {name: a}\n---\nkind: Secret\nmetadata: {name: s}\n"
+    )
+    (app / "b" / "b.yaml").write_text("kind: ConfigMap\nmetadata: {name: b}\n")
+    (app / "b" / "notes.txt").write_text("not a manifest\n")
+    return app
+
+
+def test_renders_within_limits(app, render_app):
+    limits = {"max_files": 3, "max_bytes": 1000, "max_docs": 3, "render_timeout_seconds": 60}
+    assert render_app(app, **limits) == render_app(app)
+
+
+@pytest.mark.parametrize(
+    "limit,message",
+    [
+        ({"max_files": 2}, "more than 2 files (CMP_MAX_FILES) at {app}/b"),
+        ({"max_bytes": 80}, "more than 80 bytes (CMP_MAX_BYTES) at {app}/b/b.yaml"),
+        ({"max_docs": 2}, "more than 2 docs (CMP_MAX_DOCS) at {app}/b/b.yaml"),
+    ],
+)
+def test_limits_abort_the_render(app, render_app, caplog, mocker, limit, message):
+    parse = mocker.spy(discovery, "parse_file")
+    with pytest.raises(SystemExit):
+        render_app(app, **limit)
+    assert f"Render aborted: {message.format(app=app)}" in caplog.text
+    if "max_files" in limit:
+        # Hit while listing the directories, before any file is parsed
+        assert parse.call_count == 0
+
+
+def test_render_cache_fingerprinting_is_limited(app, render_app, tmp_path, caplog, mocker):
+    limits = {"max_files": 3, "max_bytes": 1000, "render_timeout_seconds": 60}
+    cache = {"cache_dir": str(tmp_path / "cache"), "render_cache_max_bytes": 10**6}
+    # Fingerprinting does not use up the budget discovery needs on a miss
+    assert render_app(app, **limits, **cache) == render_app(app, **limits, **cache) == render_app(app)
+
+    parse = mocker.spy(discovery, "parse_file")
+    (app / "b" / "big.txt").write_text("x" * 2000)
+    with pytest.raises(SystemExit):
+        render_app(app, max_bytes=1000, **cache)
+    assert f"Render aborted: more than 1000 bytes (CMP_MAX_BYTES) at {app}/b/big.txt" in caplog.text
+    assert parse.call_count == 0
+
+    budget = Budget(render_timeout=1)
+    budget.deadline = time.monotonic() - 1
+    mocker.patch("dependency_cmp.limits.Budget", return_value=budget)
+    with pytest.raises(SystemExit):
+        render_app(app, render_timeout_seconds=1, **cache)
+    assert f"render took longer than 1s (CMP_RENDER_TIMEOUT_SECONDS) at {app}" in caplog.text
+    assert parse.call_count == 0
+
+
+def test_render_deadline(app, render_app, caplog, mocker):
+    budget = Budget(render_timeout=1)
+    budget.deadline = time.monotonic() - 1
+    mocker.patch("dependency_cmp.limits.Budget", return_value=budget)
+    with pytest.raises(SystemExit):
+        render_app(app, render_timeout_seconds=1)
+    assert "render took longer than 1s (CMP_RENDER_TIMEOUT_SECONDS)" in caplog.text
+
+
+def test_kustomize_timeout_is_capped_by_the_deadline():
+    assert Budget().timeout() is None
+    assert Budget(kustomize_timeout=30).timeout() == 30
+    assert Budget(kustomize_timeout=30, render_timeout=10).timeout() <= 10
+    budget = Budget(render_timeout=10)
+    budget.deadline = time.monotonic() - 1
+    assert budget.timeout() == 0
+
+
+def test_budget_is_shared_across_charges():
+    budget = Budget(max_docs=3)
+    budget.charge("docs", 2, "a")
+    with pytest.raises(LimitExceeded, match="more than 3 docs .* at b"):
+        budget.charge("docs", 2, "b")
+    Budget().charge("docs", 10**9, "unlimited")
@@ -1,4 +1,4 @@
-from dependency_cmp.models import ResourceKey
+from dependency_cmp.models import ResourceIndex, ResourceKey, parse_dependency, split_dependencies
 
 
 def test_resource_key_properties():
@@ -43,3 +43,91 @@ def test_match_invalid_format():
     # Missing parts
     assert rk.matches("db") is False
     assert rk.matches("") is False
+
+
+def test_index_lookup_matches_resource_key_semantics():
+    keys = [
+        ResourceKey("apps/v1", "Deployment", "backend"),
+        ResourceKey("v1", "Service", "backend"),
+        ResourceKey("example.com/v1:beta", "Widget", "backend"),
+    ]
+    index = ResourceIndex(keys)
+
+    for dep in [
+        "Deployment:backend",
+        "deployment:backend",
+        "apps/v1:DEPLOYMENT:backend",
+        "v2:Service:backend",
+        "example.com/v1:beta:widget:backend",
+        "Service:frontend",
+        "backend",
+        "",
+    ]:
+        assert index.lookup(dep) == [k for k in keys if k.matches(dep)]
+
+
+def test_index_keeps_duplicates_for_ambiguity():
+    first = ResourceKey("v1", "ConfigMap", "cfg")
+    second = ResourceKey("example.com/v1", "configmap", "cfg")
+    index = ResourceIndex([first, second])
+
+    assert index.lookup("ConfigMap:cfg") == [first, second]
+    assert index.lookup("v1:ConfigMap:cfg") == [first]
+
+
+def test_resource_key_is_compact_hashable_value():
+    a = ResourceKey("apps/v1", "Deployment", "backend")
+    b = ResourceKey("apps/" + "v1", "Deploy" + "ment", "backend")
+
+    assert not hasattr(a, "__dict__")
+    assert a == b
+    assert {a: "doc"}[b] == "doc"
+    # Repeated apiVersion/Kind strings are shared, normalized Kind is cached
+    assert a.api_version is b.api_version
+    assert a.kind is b.kind
+    assert a.kind_lower == "deployment"
+    assert a.kind_lower is b.kind_lower
+
+
+def test_namespaced_keys_and_qualified_dependencies():
+    prod = ResourceKey("v1", "Service", "db", namespace="prod")
+    dev = ResourceKey("v1", "Service", "db", namespace="dev")
+    cluster = ResourceKey("v1", "Namespace", "prod")
+    index = ResourceIndex([prod, dev, cluster])
+
+    assert prod.id == "v1:Service:prod/db"
+    assert cluster.id == "v1:Namespace:prod"
+    assert index.lookup("Service:db") == [prod, dev]
+    assert index.lookup("Service:dev/db") == [dev]
+    assert index.lookup("v1:Service:prod/db") == [prod]
+    assert index.lookup("Namespace:/prod") == [cluster]
+    assert index.lookup("Namespace:dev/prod") == []
+
+
+def test_globs_and_label_selectors():
+    keys = [
+        ResourceKey("apiextensions.k8s.io/v1", "CustomResourceDefinition", "widgets.example.com"),
+        ResourceKey("apps/v1", "StatefulSet", "db-main", "prod", {"tier": "db"}),
+        ResourceKey("v1", "Service", "db-main", "prod", {"tier": "db", "expose": "yes"}),
+        ResourceKey("apps/v1", "Deployment", "web", "prod", {"tier": "web"}),
+    ]
+    index = ResourceIndex(keys)
+
+    assert parse_dependency("CustomResourceDefinition:*").selector
+    assert not parse_dependency("Service:prod/db-main").selector
+    assert index.lookup("CustomResourceDefinition:*") == keys[:1]
+    assert index.lookup("*:*[tier=db]") == keys[1:3]
+    assert index.lookup("*:prod/db-*[tier=db,expose]") == keys[2:3]
+    assert index.lookup("apps/v1:*:*[tier!=db]") == keys[3:]
+    assert index.lookup("*:*[!tier]") == keys[:1]
+    for dep in ["*:*[tier=db]", "Service:db-?ain", "*:web"]:
+        assert index.lookup(dep) == [k for k in keys if k.matches(dep)]
+
+
+def test_split_dependencies_keeps_selectors_together():
+    value = "Service:db, *:*[tier=db,app=x]\n  CustomResourceDefinition:*"
+    assert split_dependencies(value) == [
+        "Service:db",
+        "*:*[tier=db,app=x]",
+        "CustomResourceDefinition:*",
+    ]
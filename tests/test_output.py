@@ -0,0 +1,95 @@
+import datetime
+import io
+import json
+
+import pytest
+from yaml import CDumper as Dumper
+from yaml import dump_all
+
+from dependency_cmp.output import TeeWriter, write_json_stream, write_yaml_stream
+from dependency_cmp.rawdoc import load_passthrough
+
+DOCS = [
+    {"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": "cfg"}, "data": {"k": "ü"}},
+    {"kind": "Secret", "data": {"raw": b"\x00\x01"}, "stamp": datetime.date(2024, 1, 2)},
+    {"kind": "Job", "script": "line1\nline2\n", "list": [1, 2.5, None, True]},
+]
+
+
+@pytest.mark.parametrize("docs", [[], DOCS[:1], DOCS])
+def test_stream_is_identical_to_dump_all(docs):
+    out = io.BytesIO()
+    write_yaml_stream(docs, out)
+
+    expected = dump_all(docs, Dumper=Dumper) + "\n"
+    assert out.getvalue() == expected.encode()
+
+
+def test_mixed_stream_matches_dump_all_layout():
+    docs = [*load_passthrough("kind: Service\n"), {}, "text", DOCS[0]]
+    out = io.BytesIO()
+    write_yaml_stream(docs, out)
+
+    expected = dump_all([{"kind": "Service"}, *docs[1:]], Dumper=Dumper) + "\n"
+    assert out.getvalue() == expected.encode()
+
+
+def test_documents_are_written_one_at_a_time():
+    writes = []
+
+    class Recorder(io.BytesIO):
+        def write(self, data):
+            writes.append(bytes(data))
+            return super().write(data)
+
+    write_yaml_stream(DOCS, Recorder())
+
+    # One write per document plus the trailing newline
+    assert len(writes) == len(DOCS) + 1
+
+
+def json_lines(docs) -> list[str]:
+    out = io.BytesIO()
+    write_json_stream(docs, out)
+    return out.getvalue().decode().splitlines()
+
+
+def test_json_stream_writes_one_object_per_line():
+    lines = json_lines([DOCS[0], DOCS[2], *load_passthrough("kind: Job # comment\nspec: {a: 1}\n")])
+
+    assert [json.loads(line) for line in lines] == [DOCS[0], DOCS[2], {"kind": "Job", "spec": {"a": 1}}]
+    assert lines[0] == '{"apiVersion":"v1","data":{"k":"ü"},"kind":"ConfigMap","metadata":{"name":"cfg"}}'
+
+
+def test_json_stream_converts_yaml_only_types():
+    utc = datetime.timezone.utc
+    doc = {
+        "binary": b"\x00\x01",
+        "date": datetime.date(2024, 1, 2),
+        "time": datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=utc),
+        "set": {"b", "a"},
+        "nan": float("nan"),
+        "inf": [float("inf"), -float("inf")],
+        "keys": {2: "x", 10: "y"},
+        "mixed": {"z": 1, 1: 2, datetime.date(2024, 1, 1): 3},
+    }
+
+    assert json.loads(json_lines([doc])[0]) == {
+        "binary": "AAE=",
+        "date": "2024-01-02",
+        "time": "2024-01-02 03:04:05+00:00",
+        "set": {"a": None, "b": None},
+        "nan": ".nan",
+        "inf": [".inf", "-.inf"],
+        "keys": {"2": "x", "10": "y"},
+        "mixed": {"z": 1, "1": 2, "2024-01-01": 3},
+    }
+    # Keys are sorted like the YAML dumper sorts them, mixed keys keep their order
+    assert '"keys":{"2":"x","10":"y"}' in json_lines([doc])[0]
+    assert '"mixed":{"z":1,"1":2,"2024-01-01":3}' in json_lines([doc])[0]
+
+
+def test_tee_writer():
+    first, second = io.BytesIO(), io.BytesIO()
+    TeeWriter(first, second).write(b"data")
+    assert first.getvalue() == second.getvalue() == b"data"
@@ -0,0 +1,81 @@
+import logging
+
+import pytest
+
+from dependency_cmp import parallel
+from dependency_cmp.cache import DiskCache
+from dependency_cmp.discovery import collect_manifests_recursive
+from dependency_cmp.filecache import ParsedFileCache
+from dependency_cmp.parallel import split_ranges, start_parser
+from dependency_cmp.rawdoc import RawDocument
+
+
+def doc(i: int) -> str:
+    return f"apiVersion: v1\nkind: ConfigMap\nmetadata:\n  name: cm-{i}\ndata:\n  key: value-{i}\n"
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # Small tasks, so even this app is split into several tasks and ranges
+    monkeypatch.setattr(parallel, "PARSE_TASK_BYTES", 200)
+    app = tmp_path / "app"
+    (app / "sub").mkdir(parents=True)
+    (app / "big.yaml").write_text("---\n".join(doc(i) for i in range(20)))
+    crlf = "---\n".join(doc(i) for i in range(20, 25)).replace("\n", "\r\n")
+    (app / "crlf.yaml").write_bytes(crlf.encode())
+    (app / "sub" / "dates.yaml").write_text("kind: Event\nmetadata: {name: e}\nlastTimestamp: 2024-01-01\n")
+    (app / "sub" / "empty.yaml").write_text("")
+    return app
+
+
+def collect(app, **kwargs):
+    return collect_manifests_recursive(app, recurse=True, include=[], exclude=[], **kwargs)
+
+
+@pytest.mark.parametrize("passthrough", [False, True])
+def test_parallel_parse_matches_serial(app, passthrough):
+    serial = collect(app, passthrough=passthrough)
+    parallel_docs = collect(app, passthrough=passthrough, parse_workers=2, parse_parallel_min_bytes=0)
+    assert parallel_docs == serial
+    assert len(serial) == 26
+    if passthrough:
+        assert [d.text for d in parallel_docs if isinstance(d, RawDocument)] == [
+            d.text for d in serial if isinstance(d, RawDocument)
+        ]
+
+
+def test_split_ranges():
+    data = b"".join(doc(i).encode() + b"---\n" for i in range(10))
+    ranges = split_ranges(data, 150)
+    assert len(ranges) > 2
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(data[start:].startswith(b"---\n") for start, _ in ranges[1:])
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+
+    # Not split where that changes the documents, or at lines that are no markers
+    assert split_ranges(b"%YAML 1.2\n" + data, 150) == [(0, len(data) + 10)]
+    assert split_ranges(data + b"--- |\n  text\n", 150) == [(0, len(data) + 13)]
+    assert split_ranges(data.replace(b"---\n", b"----\n"), 150) == [(0, len(data) + 10)]
+
+
+def test_small_apps_are_parsed_serially(app, mocker):
+    pool = mocker.patch("dependency_cmp.parallel.ParallelParser")
+    assert start_parser([app / "big.yaml"], False, None, 2, 1024 * 1024) is None
+    assert start_parser([app / "big.yaml"], False, None, 1, 0) is None
+    pool.assert_not_called()
+
+
+def test_cached_files_are_not_submitted(app, tmp_path, mocker):
+    file_cache = ParsedFileCache(DiskCache(tmp_path / "cache", 1024 * 1024))
+    collect(app, file_cache=file_cache.cache)
+    pool = mocker.patch("dependency_cmp.parallel.ParallelParser")
+    assert start_parser(sorted(app.rglob("*.yaml")), False, file_cache, 2, 0) is None
+    pool.assert_not_called()
+
+
+def test_parse_errors_are_reported_for_the_whole_file(app, caplog):
+    (app / "sub" / "broken.yaml").write_text(doc(1) + "---\n" + doc(2) + "---\nkey: [unclosed\n")
+    with pytest.raises(SystemExit), caplog.at_level(logging.ERROR):
+        collect(app, parse_workers=2, parse_parallel_min_bytes=0)
+    assert f"Failed to read file {app / 'sub' / 'broken.yaml'}" in caplog.text
+    assert "line 16" in caplog.text
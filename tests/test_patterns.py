@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import pytest
+
+from dependency_cmp.patterns import GlobMatcher, compile_patterns
+
+PATHS = [
+    Path("/app/deployment.yaml"),
+    Path("/app/.git/config"),
+    Path("/app/charts/db/tests/test.yaml"),
+    Path("/app/values.yml"),
+    Path("relative/file.json"),
+    Path("/app/[literal].yaml"),
+]
+
+PATTERNS = [
+    "*.yaml",
+    ".git",
+    ".git/*",
+    "charts/*/tests/*",
+    "/app/*.yml",
+    "file.js?",
+    "[[]literal].yaml",
+    "[!a-z]*.yaml",
+    "**/*.yaml",
+]
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_matches_like_path_match(pattern):
+    matcher = GlobMatcher([pattern])
+    for path in PATHS:
+        assert matcher.match(path) is path.match(pattern), path
+
+
+def test_combined_patterns():
+    matcher = GlobMatcher(PATTERNS)
+    for path in PATHS:
+        assert matcher.match(path) is any(path.match(p) for p in PATTERNS)
+
+
+def test_empty_pattern_is_rejected():
+    with pytest.raises(ValueError):
+        GlobMatcher(["."])
+
+
+def test_could_match_below():
+    # Relative patterns match from the right, so they can match at any depth
+    assert GlobMatcher(["*.yaml"]).could_match_below(Path("/anything/here"))
+
+    absolute = GlobMatcher(["/app/overlays/*/kustomization.yaml"])
+    assert absolute.could_match_below(Path("/app"))
+    assert absolute.could_match_below(Path("/app/overlays/prod"))
+    assert not absolute.could_match_below(Path("/app/base"))
+    assert not absolute.could_match_below(Path("/app/overlays/prod/nested"))
+
+
+def test_compile_patterns_reuses_matchers():
+    assert compile_patterns(["*.yaml"]) is compile_patterns(["*.yaml"])
+    assert not compile_patterns([])
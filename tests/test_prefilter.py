@@ -0,0 +1,50 @@
+import logging
+
+import pytest
+
+from dependency_cmp.discovery import collect_manifests_recursive
+from dependency_cmp.prefilter import might_contain_objects
+
+MANIFEST = "apiVersion: v1\nkind: ConfigMap\nmetadata:\n  name: a\n"
+CASES = {
+    "manifest": (MANIFEST, True, True),
+    "bom_crlf": ("\ufeffkind: ConfigMap\r\napiVersion: v1\r\n", True, True),
+    "later_document": ("# values\nfoo: 1\n---\n" + MANIFEST, True, True),
+    "quoted_keys": ("'apiVersion': v1\n\"kind\": ConfigMap\n", True, True),
+    "json": ('{\n  "apiVersion": "v1",\n  "kind": "ConfigMap"\n}\n', True, True),
+    "flow": ("---\n{apiVersion: v1, kind: ConfigMap, metadata: {name: a}}\n", True, True),
+    "helm_values": ("replicaCount: 1\nimage:\n  repository: nginx\n", False, False),
+    "nested_keys": ("jobs:\n  build:\n    kind: docker\n    apiVersion: 2\n", True, False),
+    "only_kind": ("kind: Kustomization\nresources: []\n", True, False),
+    "empty": ("", False, False),
+}
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_modes(tmp_path, name):
+    text, lenient, strict = CASES[name]
+    path = tmp_path / "file.yaml"
+    path.write_bytes(text.encode())
+    assert might_contain_objects(path, "off")
+    assert might_contain_objects(path, "lenient") == lenient
+    assert might_contain_objects(path, "strict") == strict
+
+
+def test_unreadable_files_are_kept(tmp_path):
+    assert might_contain_objects(tmp_path / "missing.yaml", "strict")
+
+
+def test_discovery_skips_filtered_files(tmp_path, caplog):
+    (tmp_path / "deploy.yaml").write_text(MANIFEST)
+    (tmp_path / "values.yaml").write_text(CASES["helm_values"][0])
+    (tmp_path / "ci.yaml").write_text(CASES["nested_keys"][0])
+
+    def names(prefilter):
+        docs = collect_manifests_recursive(tmp_path, False, [], [], prefilter=prefilter)
+        return [doc["metadata"]["name"] if "metadata" in doc else next(iter(doc)) for doc in docs]
+
+    assert names("off") == ["jobs", "a", "replicaCount"]
+    assert names("lenient") == ["jobs", "a"]
+    with caplog.at_level(logging.DEBUG, logger="dependency_cmp"):
+        assert names("strict") == ["a"]
+    assert f"Prefilter skipped 2 of 3 files in {tmp_path}" in caplog.text
@@ -0,0 +1,115 @@
+import io
+
+import pytest
+import yaml
+
+from dependency_cmp.graph import process_dag
+from dependency_cmp.output import write_yaml_stream
+from dependency_cmp.rawdoc import RawDocument, full_load, load_passthrough, load_passthrough_stream
+
+STREAM = """\
+# Database config
+apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: db-config # inline comment
+data:
+  init.sql: |
+    ---
+    kind: NotAResource
+  list:
+  - a
+---
+apiVersion: apps/v1
+kind: Deployment
+metadata: {name: app, annotations: {argocd-dependency-cmp/depends-on: "ConfigMap:db-config"}}
+spec:
+  replicas: 2
+---
+apiVersion: v1
+kind: Secret
+stringData:
+  key: value
+"""
+
+
+def test_documents_are_kept_as_raw_text():
+    docs = load_passthrough(STREAM)
+
+    assert all(isinstance(doc, RawDocument) for doc in docs)
+    assert [doc["kind"] for doc in docs] == ["ConfigMap", "Deployment", "Secret"]
+    # Only header fields are loaded
+    assert "data" not in docs[0]
+    assert docs[0]["metadata"] == {"name": "db-config"}
+    assert "init.sql: |\n    ---\n    kind: NotAResource\n" in docs[0].to_yaml()
+
+
+def test_passthrough_output_equals_full_round_trip():
+    expected = process_dag(full_load(STREAM))
+    raw = process_dag(load_passthrough(STREAM))
+
+    out = io.BytesIO()
+    write_yaml_stream(raw, out)
+
+    assert list(yaml.safe_load_all(out.getvalue())) == expected
+    # Untouched parts keep their formatting and comments
+    assert b"# Database config" in out.getvalue()
+
+
+def test_unsupported_documents_fall_back_to_full_load():
+    stream = "kind: A\n---\n{kind: B}\n---\n- item\n"
+    docs = load_passthrough(stream)
+
+    assert isinstance(docs[0], RawDocument)
+    assert docs[1:] == [{"kind": "B"}, ["item"]]
+
+    # Directives and content after a marker apply to the whole stream
+    assert load_passthrough("%YAML 1.1\n---\nkind: A\n") == [{"kind": "A"}]
+    assert load_passthrough("--- !!map\nkind: A\n") == [{"kind": "A"}]
+
+
+def test_documents_with_anchors_are_fully_loaded():
+    stream = (
+        "kind: Deployment\nmetadata:\n  name: web\n  labels: &l {app: web}\n"
+        "spec:\n  selector:\n    matchLabels: *l\n---\nkind: Service\nmetadata: {name: web}\n"
+    )
+    docs = load_passthrough(stream)
+    assert not isinstance(docs[0], RawDocument)
+    assert isinstance(docs[1], RawDocument)
+
+    out = io.BytesIO()
+    write_yaml_stream(process_dag(docs), out)
+    assert list(yaml.safe_load_all(out.getvalue())) == process_dag(full_load(stream))
+
+
+@pytest.mark.parametrize(
+    "stream",
+    [
+        'kind: A\ndescription: "first\nsecond: line"\n',
+        # Escaped closing quotes continue the value on the next line
+        "kind: A\ndesc: 'it''\nmetadata: x'\n",
+        'kind: A\ndesc: "it\\"\nmetadata: x"\n',
+    ],
+)
+def test_multiline_values_are_not_split(stream):
+    assert load_passthrough(stream) == full_load(stream)
+    assert not isinstance(load_passthrough(stream)[0], RawDocument)
+
+
+def test_quoted_values_with_escapes():
+    stream = "kind: A\ndesc: 'it''s' # it's\npath: \"C:\\\\\" # \"\nmetadata: {name: a}\n"
+    docs = load_passthrough(stream)
+    assert isinstance(docs[0], RawDocument)
+    assert yaml.safe_load(docs[0].to_yaml()) == full_load(stream)[0]
+
+
+def test_empty_documents_are_skipped():
+    assert load_passthrough("---\n# only a comment\n---\n") == []
+
+
+def test_stream_split_matches_whole_text():
+    for text in [STREAM, "--- |\n  text\n---\na: 1\n", "%YAML 1.1\n---\na: 1\n---\nb: 2\n"]:
+        docs = load_passthrough_stream(io.BytesIO(text.encode()))
+        expected = load_passthrough(text)
+        assert docs == expected
+        assert [getattr(d, "text", None) for d in docs] == [getattr(d, "text", None) for d in expected]
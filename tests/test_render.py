@@ -0,0 +1,99 @@
+import errno
+import logging
+import sys
+from unittest import mock
+
+import pytest
+
+from dependency_cmp.cache import _HashingWriter
+from dependency_cmp.main import main
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return {"cache_dir": str(tmp_path / "cache")}
+
+
+def test_render_output_format(app, render_app):
+    output = render_app(app)
+    assert output.endswith(b"\n\n")
+    assert b"argocd.argoproj.io/sync-wave: '0'" in output
+    assert b"argocd.argoproj.io/sync-wave: '1'" in output
+
+
+def test_render_json_output(app, render_app):
+    output = render_app(app, output_format="json")
+    assert output == (
+        b'{"apiVersion":"v1","kind":"Service","metadata":{"annotations":'
+        b'{"argocd.argoproj.io/sync-wave":"0"},"name":"db"}}\n'
+        b'{"apiVersion":"apps/v1","kind":"Deployment","metadata":{"annotations":'
+        b'{"argocd-dependency-cmp/depends-on":"Service:db","argocd.argoproj.io/sync-wave":"1"},"name":"web"}}\n'
+    )
+
+
+def test_render_cache_replays_output(app, render_app, cache, mocker):
+    first = render_app(app, **cache)
+
+    spy = mocker.patch("dependency_cmp.render.render_manifests")
+    assert render_app(app, **cache) == first
+    spy.assert_not_called()
+
+
+def test_render_cache_hits_on_same_content_with_new_mtime(app, render_app, cache, mocker):
+    first = render_app(app, **cache)
+
+    # Rewriting identical content changes the stat key, the content key still hits
+    (app / "db.yaml").write_text((app / "db.yaml").read_text())
+    spy = mocker.patch("dependency_cmp.render.render_manifests")
+    assert render_app(app, **cache) == first
+    spy.assert_not_called()
+
+
+def test_render_cache_misses_on_changes(app, render_app, cache):
+    first = render_app(app, **cache)
+
+    (app / "db.yaml").write_text("apiVersion: v1\nkind: Service\nmetadata: {name: cache}\n")
+    second = render_app(app, **cache)
+    assert second != first
+    assert b"name: cache" in second
+
+    # Settings are part of the key as well
+    assert render_app(app, include_patterns=["*.json"], **cache) == b"\n"
+
+
+class FullDisk:
+    def write(self, data):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+
+def fill_disk(monkeypatch, cache_dir, target):
+    if target == "entry":
+        # Writes of the entry fail while the output streams
+        monkeypatch.setattr("dependency_cmp.cache._HashingWriter", lambda f: _HashingWriter(FullDisk()))
+    elif target == "cache_dir":
+        cache_dir.write_text("not a directory")
+    else:
+        monkeypatch.setattr(target, mock.Mock(side_effect=OSError(errno.ENOSPC, "No space left on device")))
+
+
+@pytest.mark.parametrize(
+    "target",
+    ["entry", "cache_dir", "tempfile.mkstemp", "os.replace", "dependency_cmp.cache.DiskCache.evict"],
+)
+def test_failing_cache_does_not_fail_the_render(app, render_app, tmp_path, monkeypatch, capfd, caplog, target):
+    expected = render_app(app)
+    capfd.readouterr()
+
+    cache_dir = tmp_path / "cache"
+    fill_disk(monkeypatch, cache_dir, target)
+    monkeypatch.chdir(app)
+    monkeypatch.setenv("CMP_CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(sys, "argv", ["dependency_cmp"])
+    with caplog.at_level(logging.WARNING, logger="dependency_cmp"):
+        main()  # Exits only on errors
+
+    assert capfd.readouterr().out.encode() == expected
+    assert "Unexpected Error" not in caplog.text
+    assert "cache" in caplog.text
+    if cache_dir.is_dir():
+        assert not list(cache_dir.rglob(".tmp-*"))
@@ -1,5 +1,16 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from pydantic import ValidationError
+
+from dependency_cmp.config import FIELDS, EnvSettings, load_settings
 from dependency_cmp.settings import PluginSettings, parse_argo_glob_list
 
+# Packages startup must not import: loaded by the render itself, or not at all
+HEAVY_MODULES = ("pydantic", "pydantic_core", "yaml", "_yaml", "multiprocessing", "concurrent")
+
 # --- Unit Tests for the Helper Function ---
 
 
@@ -40,3 +51,69 @@ def test_settings_complex_glob_parsing(monkeypatch):
 
     settings = PluginSettings()
     assert settings.exclude_patterns == ["foo.yaml", ".git/*"]
+
+
+def test_settings_kustomize_workers(monkeypatch):
+    monkeypatch.delenv("CMP_KUSTOMIZE_WORKERS", raising=False)
+    assert PluginSettings().kustomize_workers == 1
+
+    monkeypatch.setenv("CMP_KUSTOMIZE_WORKERS", "4")
+    assert PluginSettings().kustomize_workers == 4
+
+
+# --- Startup Path Without Pydantic ---
+
+
+def test_env_settings_mirror_plugin_settings():
+    assert list(FIELDS) == list(PluginSettings.model_fields)
+    for name, field in PluginSettings.model_fields.items():
+        variable, _, default, excluded = FIELDS[name]
+        assert field.validation_alias == variable
+        assert field.default == default
+        assert bool(field.exclude) == excluded
+
+
+@pytest.mark.parametrize(
+    "env",
+    [
+        {},
+        {"PARAM_DIRECTORY_RECURSE": "Yes", "PARAM_DIRECTORY_EXCLUDE": "{foo.yaml, .git/*}"},
+        {"param_directory_include": "a,b", "CMP_KUSTOMIZE_WORKERS": "007"},
+        {"PARAM_DIRECTORY_EXCLUDE": '["x", "y"]', "CMP_CACHE_DIR": "/tmp/cäche"},
+        {"CMP_KUSTOMIZE_WORKERS": " 5", "CMP_RAW_PASSTHROUGH": "off", "CMP_PROFILE": "cprofile"},
+    ],
+)
+def test_load_settings_matches_plugin_settings(monkeypatch, env):
+    for name in os.environ:
+        if name.upper().startswith(("PARAM_DIRECTORY_", "CMP_")):
+            monkeypatch.delenv(name)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+
+    expected = PluginSettings()
+    settings = load_settings()
+    for name in FIELDS:
+        assert getattr(settings, name) == getattr(expected, name)
+    assert settings.model_dump_json() == expected.model_dump_json()
+
+
+def test_env_settings_defers_unusual_values():
+    assert EnvSettings.from_env({"CMP_KUSTOMIZE_WORKERS": "3"}).kustomize_workers == 3
+    with pytest.raises(ValueError):
+        EnvSettings.from_env({"CMP_KUSTOMIZE_WORKERS": "0"})
+
+
+def test_invalid_settings_raise_validation_error(monkeypatch):
+    monkeypatch.setenv("CMP_KUSTOMIZE_WORKERS", "many")
+    with pytest.raises(ValidationError):
+        load_settings()
+
+
+def test_startup_does_not_import_heavy_modules():
+    env = {k: v for k, v in os.environ.items() if not k.upper().startswith(("PARAM_", "CMP_"))}
+    code = "import sys, dependency_cmp.main as m; m.load_settings(); print(*sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+    loaded = {name.partition(".")[0] for name in result.stdout.split()}
+    assert "dependency_cmp" in loaded
+    assert loaded.isdisjoint(HEAVY_MODULES)
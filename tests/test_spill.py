@@ -0,0 +1,73 @@
+import pytest
+import yaml
+
+from dependency_cmp import spill
+from dependency_cmp.discovery import collect_manifests_recursive
+from dependency_cmp.spill import DocumentSpill, SpilledDocument
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = tmp_path / "app"
+    (app / "nested").mkdir(parents=True)
+    (app / "db.yaml").write_text(
+        "apiVersion: v1\nkind: Service\nmetadata:\n  name: db\n  namespace: prod\n"
+        "  labels: {tier: db}\n  annotations: {owner: team-a}\n"
+        "# Comment after metadata\nspec:\n  ports: [{port: 5432}]\n"
+        "---\nkind: Secret\nstringData: {password: x}\n---\n{}\n"
+    )
+    (app / "nested" / "web.yaml").write_text(
+        "apiVersion: apps/v1\nkind: Deployment\nmetadata:\n  name: web\n  namespace: prod\n"
+        "  annotations:\n    argocd-dependency-cmp/depends-on: '*:*[tier=db]'\n"
+        "    description: |\n      multi\n      line\nspec: {replicas: 2}\n"
+        "---\napiVersion: v1\nkind: ConfigMap\nmetadata: null\ndata: {a: b}\n"
+    )
+    return app
+
+
+@pytest.mark.parametrize("passthrough", [False, True])
+def test_low_memory_output_is_unchanged(app, render_app, passthrough):
+    # Labels shared with the selector through an anchor
+    (app / "nested" / "shared.yaml").write_text(
+        "apiVersion: apps/v1\nkind: Deployment\nmetadata:\n  name: api\n  labels: &l {app: api}\n"
+        "spec:\n  selector:\n    matchLabels: *l\n"
+    )
+    expected = render_app(app, passthrough=passthrough)
+    assert render_app(app, passthrough=passthrough, low_memory=True) == expected
+    assert len(list(yaml.safe_load_all(expected))) == 6
+
+
+def test_spilled_documents_keep_only_the_header(app):
+    docs = collect_manifests_recursive(
+        app, recurse=True, include=[], exclude=[], spill=DocumentSpill(0)
+    )
+
+    assert [type(doc) for doc in docs] == [SpilledDocument, SpilledDocument, dict, SpilledDocument, SpilledDocument]
+    assert docs[0] == {
+        "apiVersion": "v1",
+        "kind": "Service",
+        "metadata": {"name": "db", "namespace": "prod", "labels": {"tier": "db"}},
+    }
+    assert docs[3]["metadata"]["annotations"] == {
+        "argocd-dependency-cmp/depends-on": "*:*[tier=db]"
+    }
+    assert "ports" in docs[0].text
+
+
+def test_threshold_switches_over_and_moves_collected_documents(monkeypatch):
+    resident = [100]
+    monkeypatch.setattr(spill, "resident_bytes", lambda: resident[0])
+    monkeypatch.setattr(spill, "CHECK_INTERVAL", 0)
+    collected = DocumentSpill(threshold=1000)
+
+    collected.extend([{"kind": "Service", "metadata": {"name": "a"}}])
+    assert collected.file is None
+
+    resident[0] = 2000
+    collected.extend([{"kind": "Service", "metadata": {"name": "b"}}])
+    assert [type(doc) for doc in collected.docs] == [SpilledDocument, SpilledDocument]
+    assert [doc.to_yaml() for doc in collected.docs] == [
+        "kind: Service\nmetadata:\n  name: a\n",
+        "kind: Service\nmetadata:\n  name: b\n",
+    ]
+    collected.close()
@@ -0,0 +1,55 @@
+import io
+import json
+import pstats
+
+from dependency_cmp import stats
+from dependency_cmp.render import render
+from dependency_cmp.settings import PluginSettings
+
+
+def stats_lines(stderr: str) -> list[dict]:
+    return [json.loads(line)["dependency_cmp_stats"] for line in stderr.splitlines() if "dependency_cmp_stats" in line]
+
+
+def test_disabled_by_default(app, capsys, monkeypatch):
+    monkeypatch.delenv("CMP_STATS", raising=False)
+    with stats.instrumented(PluginSettings()):
+        with stats.stage("anything"):
+            stats.count("files")
+    assert stats_lines(capsys.readouterr().err) == []
+
+
+def test_summary_is_written_to_stderr(app, capsys, monkeypatch):
+    monkeypatch.setenv("CMP_STATS", "true")
+    settings = PluginSettings()
+    out = io.BytesIO()
+    with stats.instrumented(settings):
+        render(app, settings, out)
+
+    captured = capsys.readouterr()
+    assert "dependency_cmp_stats" not in captured.out
+    [summary] = stats_lines(captured.err)
+    assert summary["status"] == "ok"
+    assert {"walk", "parse", "collect", "graph", "emit"} <= summary["stages"].keys()
+    assert summary["counters"]["files"] == 2
+    assert summary["counters"]["docs"] == 2
+    assert summary["counters"]["edges"] == 1
+    assert summary["counters"]["waves"] == 2
+
+
+def test_stats_do_not_change_settings_dump(monkeypatch):
+    before = PluginSettings().model_dump_json()
+    monkeypatch.setenv("CMP_STATS", "true")
+    monkeypatch.setenv("CMP_PROFILE", "cprofile")
+    assert PluginSettings().model_dump_json() == before
+
+
+def test_cprofile_capture(app, tmp_path, monkeypatch):
+    profile = tmp_path / "render.prof"
+    monkeypatch.setenv("CMP_PROFILE", "cprofile")
+    monkeypatch.setenv("CMP_PROFILE_FILE", str(profile))
+    settings = PluginSettings()
+    with stats.instrumented(settings):
+        render(app, settings, io.BytesIO())
+
+    assert pstats.Stats(str(profile)).total_calls > 0